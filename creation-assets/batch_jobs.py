@@ -0,0 +1,142 @@
+import os
+import json
+import uuid
+import logging
+from typing import Callable
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_MAX_REQUESTS = 50000 # Provider limit on requests per batch input file
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+LOCAL_BATCH_DIR = ".link-batches/local" # Where the local stand-in keeps its batches
+
+def batch_request(custom_id: str, body: dict) -> dict:
+    """One line of a batch input file."""
+    return {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+
+def write_batch_files(requests: list[dict], directory: str, prefix: str) -> list[str]:
+    """Writes the requests as batch input JSONL, split at BATCH_MAX_REQUESTS per file. Returns the paths."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for start in range(0, len(requests), BATCH_MAX_REQUESTS):
+        path = os.path.join(directory, f"{prefix}-{start // BATCH_MAX_REQUESTS + 1}.jsonl")
+        with open(path, 'w', encoding='utf-8') as f:
+            for request in requests[start:start + BATCH_MAX_REQUESTS]:
+                f.write(json.dumps(request, ensure_ascii=False) + '\n')
+        paths.append(path)
+    return paths
+
+def parse_batch_output(lines: list[str]) -> dict:
+    """
+    Maps each custom_id in batch output (and error) lines to (content, usage, error):
+    the assistant message content and token usage on success, or an error message.
+    """
+    results = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        response = entry.get("response") or {}
+        body = response.get("body") or {}
+        if entry.get("error") or response.get("status_code") != 200:
+            error = entry.get("error") or body.get("error") or {"message": f"HTTP {response.get('status_code')}"}
+            results[entry["custom_id"]] = (None, None, error.get("message", str(error)))
+            continue
+        try:
+            content = body["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            results[entry["custom_id"]] = (None, None, "response has no message content")
+            continue
+        results[entry["custom_id"]] = (content, body.get("usage") or {}, None)
+    return results
+
+class OpenAIBatchBackend:
+    """Submits batch input files to the OpenAI Batch API."""
+
+    name = "openai"
+
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, input_path: str) -> str:
+        with open(input_path, 'rb') as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(input_file_id=input_file.id, endpoint=BATCH_ENDPOINT,
+                                           completion_window=BATCH_COMPLETION_WINDOW)
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> list[str]:
+        batch = self.client.batches.retrieve(batch_id)
+        lines = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                lines.extend(self.client.files.content(file_id).text.splitlines())
+        return lines
+
+class LocalBatchBackend:
+    """
+    File-based stand-in for the batch API, so the submit/poll/apply flow runs without a network.
+    Each batch is a directory holding the input, a status file and, once complete, an output file
+    in the provider's format. Requests are answered by `responder(body) -> str` after
+    `polls_until_complete` status checks.
+    """
+
+    name = "local"
+
+    def __init__(self, responder: Callable[[dict], str], directory: str = LOCAL_BATCH_DIR, polls_until_complete: int = 1):
+        self.responder = responder
+        self.directory = directory
+        self.polls_until_complete = polls_until_complete
+
+    def _path(self, batch_id: str, name: str) -> str:
+        return os.path.join(self.directory, batch_id, name)
+
+    def _write_status(self, batch_id: str, status: dict):
+        with open(self._path(batch_id, "status.json"), 'w', encoding='utf-8') as f:
+            json.dump(status, f)
+
+    def submit(self, input_path: str) -> str:
+        batch_id = f"batch_local_{uuid.uuid4().hex[:16]}"
+        os.makedirs(os.path.join(self.directory, batch_id))
+        with open(input_path, 'r', encoding='utf-8') as src, open(self._path(batch_id, "input.jsonl"), 'w', encoding='utf-8') as dst:
+            dst.write(src.read())
+        self._write_status(batch_id, {"status": "validating", "polls": 0})
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        with open(self._path(batch_id, "status.json"), 'r', encoding='utf-8') as f:
+            status = json.load(f)
+        if status["status"] not in TERMINAL_STATUSES:
+            status["polls"] += 1
+            status["status"] = "in_progress"
+            if status["polls"] >= self.polls_until_complete:
+                self._run(batch_id)
+                status["status"] = "completed"
+            self._write_status(batch_id, status)
+        return status["status"]
+
+    def _run(self, batch_id: str):
+        with open(self._path(batch_id, "input.jsonl"), 'r', encoding='utf-8') as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        with open(self._path(batch_id, "output.jsonl"), 'w', encoding='utf-8') as out:
+            for index, request in enumerate(requests):
+                entry = {"id": f"batch_req_{index}", "custom_id": request["custom_id"], "response": None, "error": None}
+                try:
+                    content = self.responder(request["body"])
+                    entry["response"] = {"status_code": 200, "body": {
+                        "object": "chat.completion",
+                        "model": request["body"].get("model"),
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                    }}
+                except Exception as e:
+                    logging.warning(f"Local batch responder failed for {request['custom_id']}: {e}")
+                    entry["error"] = {"code": "responder_error", "message": str(e)}
+                out.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def results(self, batch_id: str) -> list[str]:
+        with open(self._path(batch_id, "output.jsonl"), 'r', encoding='utf-8') as f:
+            return f.read().splitlines()
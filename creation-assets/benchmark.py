@@ -0,0 +1,226 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import subprocess
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from catalog import DOCUMENT_FILES_GLOB, PRODUCT_FILES_GLOB, catalog_files, iter_documents, iter_products
+from metrics import Histogram
+from search_client import MODES, SearchClient, add_search_cache_arguments, client_from_args
+
+RESULTS_DIR = ".benchmarks" # Where result files are written; relative to creation-assets
+DEFAULT_K = 10
+DEFAULT_MAX_QUERIES = 100 # Per query kind, sampled with the seed
+DEFAULT_SEED = 42
+DEFAULT_CONCURRENCY = (1, 4, 16)
+PERCENTILES = (50, 95, 99)
+
+# Golden query kinds: name -> (collection searched, description)
+QUERY_KINDS = {
+    "product_name": ("products", "product name -> that product"),
+    "tag": ("products", "tag -> products carrying the tag"),
+    "doc_title": ("documents", "document title -> that document"),
+    "product_docs": ("documents", "product name -> its documentation_ids"),
+}
+
+def golden_queries(root: str = ".", max_queries: int = DEFAULT_MAX_QUERIES, seed: int = DEFAULT_SEED) -> list[dict]:
+    """
+    Builds labelled queries from the catalog itself: {"kind", "collection", "query", "relevant": [_id, ...]}.
+    At most `max_queries` per kind are kept, sampled deterministically with `seed`.
+    """
+    by_kind = {kind: [] for kind in QUERY_KINDS}
+    products_by_tag = {}
+    for file_path in catalog_files(PRODUCT_FILES_GLOB, root):
+        for _, product in iter_products(file_path):
+            row = product.to_dict()
+            if row.get('name'):
+                by_kind["product_name"].append((row['name'], [row['_id']]))
+                if row.get('documentation_ids'):
+                    by_kind["product_docs"].append((row['name'], list(row['documentation_ids'])))
+            for tag in row.get('tags') or []:
+                products_by_tag.setdefault(tag, []).append(row['_id'])
+    by_kind["tag"] = sorted(products_by_tag.items())
+    for file_path in catalog_files(DOCUMENT_FILES_GLOB, root):
+        for _, document in iter_documents(file_path):
+            row = document.to_dict()
+            if row.get('title'):
+                by_kind["doc_title"].append((row['title'], [row['_id']]))
+
+    rng = random.Random(seed)
+    queries = []
+    for kind, items in by_kind.items():
+        if len(items) > max_queries:
+            items = rng.sample(items, max_queries)
+        queries.extend({"kind": kind, "collection": QUERY_KINDS[kind][0], "query": query, "relevant": relevant}
+                       for query, relevant in items)
+    return queries
+
+def recall_at_k(result_ids: list, relevant: list, k: int) -> float:
+    """Share of the relevant IDs in the top k, out of at most k, so a broad tag can still reach 1.0."""
+    relevant = set(relevant)
+    return len(relevant.intersection(result_ids[:k])) / min(len(relevant), k) if relevant else 0.0
+
+def reciprocal_rank(result_ids: list, relevant: list) -> float:
+    relevant = set(relevant)
+    return next((1.0 / rank for rank, doc_id in enumerate(result_ids, 1) if doc_id in relevant), 0.0)
+
+def latency_summary(histogram: Histogram) -> dict:
+    """Latency percentiles and mean in milliseconds."""
+    summary = {f"p{pct}": histogram.percentile(pct) * 1000 for pct in PERCENTILES}
+    summary["mean"] = histogram.total / histogram.count * 1000 if histogram.count else 0.0
+    return summary
+
+def timed_search(client: SearchClient, query: dict, mode: str, k: int) -> tuple[float, list]:
+    started = time.perf_counter()
+    results = client.search(query["query"], collection=query["collection"], mode=mode, limit=k)
+    return time.perf_counter() - started, [document["_id"] for document in results]
+
+def run_quality(client: SearchClient, queries: list[dict], modes, k: int, repeat: int) -> list[dict]:
+    """Latency percentiles, recall@k and MRR per query kind and mode, one query at a time."""
+    rows = []
+    for mode in modes:
+        for kind in QUERY_KINDS:
+            kind_queries = [query for query in queries if query["kind"] == kind]
+            if not kind_queries:
+                continue
+            latencies = Histogram()
+            recall = mrr = 0.0
+            for query in kind_queries:
+                timed_search(client, query, mode, k) # Warm-up: query embedding, lazily built indexes
+                for attempt in range(repeat):
+                    elapsed, result_ids = timed_search(client, query, mode, k)
+                    latencies.observe(elapsed)
+                recall += recall_at_k(result_ids, query["relevant"], k)
+                mrr += reciprocal_rank(result_ids, query["relevant"])
+            rows.append({"kind": kind, "mode": mode, "collection": QUERY_KINDS[kind][0], "queries": len(kind_queries),
+                         f"recall@{k}": recall / len(kind_queries), "mrr": mrr / len(kind_queries),
+                         "latency_ms": latency_summary(latencies)})
+    return rows
+
+def run_throughput(client: SearchClient, queries: list[dict], modes, k: int, levels) -> list[dict]:
+    """Queries per second and latency with `level` searches in flight, over the whole golden set."""
+    rows = []
+    for mode in modes:
+        for level in levels:
+            latencies = Histogram()
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=level) as executor:
+                for elapsed, _ in executor.map(lambda query: timed_search(client, query, mode, k), queries):
+                    latencies.observe(elapsed)
+            wall = time.perf_counter() - started
+            rows.append({"mode": mode, "concurrency": level, "queries": len(queries),
+                         "qps": len(queries) / wall if wall else 0.0, "latency_ms": latency_summary(latencies)})
+    return rows
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def print_report(report: dict, previous: dict | None = None, stream=sys.stdout):
+    """Prints the quality and throughput tables, with deltas against a previous result file when given."""
+    k = report["settings"]["k"]
+
+    def delta(value, old, fmt):
+        return f" ({value - old:+{fmt}})" if old is not None else ""
+
+    old_quality = {(row["kind"], row["mode"]): row for row in (previous or {}).get("quality", [])}
+    print(f"\nQuality and latency ({report['backend']}, commit {report['commit']}, k={k}):", file=stream)
+    for row in report["quality"]:
+        old = old_quality.get((row["kind"], row["mode"]), {})
+        latency = row["latency_ms"]
+        print(f"  {row['kind']:<13} {row['mode']:<8} n={row['queries']:<4} "
+              f"recall@{k} {row[f'recall@{k}']:.3f}{delta(row[f'recall@{k}'], old.get(f'recall@{k}'), '.3f')}  "
+              f"MRR {row['mrr']:.3f}{delta(row['mrr'], old.get('mrr'), '.3f')}  "
+              f"p50 {latency['p50']:.2f} p95 {latency['p95']:.2f} p99 {latency['p99']:.2f} ms"
+              f"{delta(latency['p95'], old.get('latency_ms', {}).get('p95'), '.2f')}", file=stream)
+
+    old_throughput = {(row["mode"], row["concurrency"]): row for row in (previous or {}).get("throughput", [])}
+    if report["throughput"]:
+        print("\nThroughput:", file=stream)
+    for row in report["throughput"]:
+        old = old_throughput.get((row["mode"], row["concurrency"]), {})
+        print(f"  {row['mode']:<8} concurrency {row['concurrency']:<3} {row['qps']:8.1f} q/s"
+              f"{delta(row['qps'], old.get('qps'), '.1f')}  p95 {row['latency_ms']['p95']:.2f} ms", file=stream)
+
+def save_report(report: dict, output: str | None) -> str:
+    """Writes the report (temp file + os.replace) to `output`, or to RESULTS_DIR/<time>-<commit>-<backend>.json."""
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{report['commit']}-{report['backend']}.json")
+    tmp_path = f"{output}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+    os.replace(tmp_path, output)
+    return output
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark search latency, throughput and recall@k/MRR on golden queries built from the catalog.")
+    parser.add_argument("--backend", choices=["astra", "local"], default="local",
+                        help="Benchmark Astra DB or an in-memory index of the JSONL files (default: local).")
+    parser.add_argument("--modes",
+                        help=f"Comma-separated ranking modes to compare (default: {','.join(MODES)}; only lexical "
+                             "for --backend local without real --embeddings).")
+    parser.add_argument("--kinds", default=",".join(QUERY_KINDS),
+                        help=f"Comma-separated golden query kinds (default: {','.join(QUERY_KINDS)}).")
+    parser.add_argument("-k", type=int, default=DEFAULT_K, help=f"Results per query scored for recall and MRR (default: {DEFAULT_K}).")
+    parser.add_argument("--max-queries", type=int, default=DEFAULT_MAX_QUERIES,
+                        help=f"Queries sampled per kind (default: {DEFAULT_MAX_QUERIES}).")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help=f"Sampling seed (default: {DEFAULT_SEED}).")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs of each query in the latency pass (default: 3).")
+    parser.add_argument("--concurrency", default=",".join(map(str, DEFAULT_CONCURRENCY)),
+                        help=f"Comma-separated in-flight search counts for the throughput pass (default: "
+                             f"{','.join(map(str, DEFAULT_CONCURRENCY))}; empty skips it).")
+    parser.add_argument("--output", help=f"Result file (default: {RESULTS_DIR}/<time>-<commit>-<backend>.json).")
+    parser.add_argument("--compare", help="Earlier result file to print deltas against.")
+    add_search_cache_arguments(parser)
+    parser.set_defaults(result_cache_size=0) # Measure the backend, not the result cache
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1.")
+
+    # Locally, the vector side is either missing or fake vectors with no semantics: vector and hybrid numbers would be noise
+    meaningful_vectors = args.backend == "astra" or args.embeddings not in (None, "fake")
+    if args.modes is None:
+        modes = list(MODES) if meaningful_vectors else ["lexical"]
+    else:
+        modes = [mode for mode in args.modes.split(',') if mode]
+    kinds = [kind for kind in args.kinds.split(',') if kind]
+    unknown = [mode for mode in modes if mode not in MODES] + [kind for kind in kinds if kind not in QUERY_KINDS]
+    if unknown:
+        parser.error(f"Unknown mode(s)/kind(s): {', '.join(unknown)}")
+    if not meaningful_vectors and set(modes) - {"lexical"}:
+        parser.error("The vector and hybrid modes of --backend local need real embeddings (e.g. --embeddings openai).")
+    levels = [int(level) for level in args.concurrency.split(',') if level]
+
+    queries = [query for query in golden_queries(max_queries=args.max_queries, seed=args.seed) if query["kind"] in kinds]
+    print(f"{len(queries)} golden queries: " + ", ".join(
+        f"{sum(1 for q in queries if q['kind'] == kind)} {kind}" for kind in kinds))
+    started = time.perf_counter()
+    client = client_from_args(args)
+    setup_seconds = time.perf_counter() - started
+    print(f"Backend '{args.backend}' ready in {setup_seconds:.2f}s")
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "backend": args.backend,
+        "settings": {"k": args.k, "modes": modes, "kinds": kinds, "max_queries": args.max_queries, "seed": args.seed,
+                     "repeat": args.repeat, "concurrency": levels,
+                     "embeddings": client.provider.model if client.provider else ("vectorize" if args.backend == "astra" else None),
+                     "result_cache_size": args.result_cache_size},
+        "setup_seconds": setup_seconds,
+        "quality": run_quality(client, queries, modes, args.k, args.repeat),
+        "throughput": run_throughput(client, queries, modes, args.k, levels),
+    }
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    print_report(report, previous)
+    print(f"\nResults written to {save_report(report, args.output)}")
@@ -0,0 +1,92 @@
+import argparse
+from dataclasses import dataclass, field
+from astrapy import Collection
+from astrapy.exceptions import CollectionInsertManyException
+from metrics import count, family_of, timer
+
+DEFAULT_CHUNK_SIZE = 50 # Documents per insertMany request (astrapy's default insert_many chunk size)
+DEFAULT_CONCURRENCY = 8 # Parallel insertMany requests per file
+
+@dataclass
+class InsertReport:
+    """Outcome of a bulk insert for a single source file."""
+    file_path: str
+    inserted_ids: list = field(default_factory=list)
+    failed_ids: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+
+    @property
+    def inserted_count(self) -> int:
+        return len(self.inserted_ids)
+
+    @property
+    def failed_count(self) -> int:
+        return len(self.failed_ids)
+
+def insert_documents(
+    collection: Collection,
+    documents: list[dict],
+    file_path: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    ordered: bool = False,
+) -> InsertReport:
+    """
+    Inserts a list of prepared documents with insert_many, splitting them into
+    chunks that are sent concurrently (unordered mode) or one after another,
+    stopping at the first failure (ordered mode).
+    Returns an InsertReport listing the inserted and failed `_id`s.
+    """
+    report = InsertReport(file_path=file_path)
+    if not documents:
+        return report
+
+    attempted_ids = [doc.get('_id') for doc in documents]
+    family = family_of(file_path)
+    # Network wait plus server-side vectorize time (unless $vector was computed client-side)
+    with timer("stage_seconds", stage="insert", family=family):
+        try:
+            result = collection.insert_many(
+                documents,
+                ordered=ordered,
+                chunk_size=chunk_size,
+                concurrency=1 if ordered else concurrency,
+            )
+            report.inserted_ids = list(result.inserted_ids)
+        except CollectionInsertManyException as e:
+            report.inserted_ids = list(e.inserted_ids)
+            report.errors = [str(exc) for exc in e.exceptions]
+        except Exception as e:
+            report.errors = [str(e)]
+
+    inserted = set(report.inserted_ids)
+    report.failed_ids = [doc_id for doc_id in attempted_ids if doc_id not in inserted]
+    count("documents", report.inserted_count, stage="insert", family=family, outcome="inserted")
+    count("documents", report.failed_count, stage="insert", family=family, outcome="failed")
+    return report
+
+def print_insert_report(report: InsertReport):
+    """Prints the per-file summary of inserted versus failed `_id`s."""
+    print(f"  Successfully inserted {report.inserted_count} documents from {report.file_path}.")
+    if report.failed_ids:
+        print(f"  Failed to insert {report.failed_count} documents from {report.file_path}:")
+        for doc_id in report.failed_ids:
+            print(f"    - {doc_id}")
+    for error in report.errors:
+        print(f"  Error: {error}")
+
+def positive_int(value: str) -> int:
+    """argparse type for counts that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+def add_bulk_insert_arguments(parser: argparse.ArgumentParser):
+    """Adds the shared --chunk-size / --concurrency / --ordered options to a loader CLI."""
+    parser.add_argument("--chunk-size", type=positive_int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"Documents per insert_many request (default: {DEFAULT_CHUNK_SIZE}).")
+    parser.add_argument("--concurrency", type=positive_int, default=DEFAULT_CONCURRENCY,
+                        help=f"Concurrent insert_many requests in unordered mode (default: {DEFAULT_CONCURRENCY}).")
+    parser.add_argument("--ordered", action="store_true",
+                        help="Insert in file order and stop at the first failure in each file.")
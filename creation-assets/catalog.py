@@ -0,0 +1,231 @@
+import os
+import sys
+import json
+import glob
+import logging
+from typing import Callable, Iterator
+
+try:
+    import orjson
+    _loads = orjson.loads # Parses bytes directly, several times faster than json.loads
+except ImportError:
+    orjson = None
+    _loads = json.loads
+
+PRODUCT_FILES_GLOB = "products/*/products.jsonl"
+DOCUMENT_FILES_GLOB = "products/*/documents.jsonl"
+
+# field -> (expected type, required); the single definition of the catalog schema
+PRODUCT_SCHEMA = {
+    '_id': (str, True),
+    'sku': (str, True),
+    'name': (str, True),
+    'family': (str, True),
+    'documentation_ids': (list, True),
+    'description': (str, False),
+    'product_type': (str, False),
+    'price': (dict, False),
+    'tags': (list, False),
+    'attributes': (dict, False),
+    'image_url': (str, False),
+}
+DOCUMENT_SCHEMA = {
+    '_id': (str, True),
+    'product_id': (str, True),
+    'title': (str, True),
+    'text': (str, True),
+    'product_name': (str, False),
+    'doc_type': (str, False),
+    'version': (str, False),
+    'language': (str, False),
+    'format': (str, False),
+}
+
+# Low-cardinality string fields whose values are shared between records
+INTERNED_FIELDS = {'family', 'product_type', 'doc_type', 'version', 'language', 'format', 'product_name'}
+
+# --- Vocabulary ---
+
+class Vocabulary:
+    """
+    Interns the repeated strings of the catalog (tags, attribute keys and values, families, ...)
+    so every record shares one copy of each.
+    """
+
+    @staticmethod
+    def intern(value):
+        return sys.intern(value) if isinstance(value, str) else value
+
+    def tags(self, tags) -> tuple:
+        return tuple(self.intern(tag) for tag in tags if isinstance(tag, str))
+
+    def attributes(self, attributes: dict) -> dict:
+        interned = {}
+        for key, value in attributes.items():
+            key = self.intern(key)
+            if isinstance(value, list):
+                value = tuple(self.intern(item) for item in value)
+            else:
+                value = self.intern(value)
+            interned[key] = value
+        return interned
+
+DEFAULT_VOCABULARY = Vocabulary()
+
+# --- Records ---
+
+def _plain(value):
+    """Converts interned tuples back to JSON lists."""
+    if isinstance(value, tuple):
+        return list(value)
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    return value
+
+class _Record:
+    """
+    Base for the compact catalog records. Schema fields live in `__slots__` (`_id` is exposed
+    as `id`), fields outside the schema are kept in `extra` so `to_dict()` round-trips the row,
+    and fields that were not loaded (see `fields=` on the readers) read as None.
+    """
+    __slots__ = ()
+    SCHEMA = {}
+
+    def __init__(self, data: dict, vocabulary: Vocabulary = DEFAULT_VOCABULARY, fields=None):
+        for field_name in self.SCHEMA:
+            value = data.get(field_name) if fields is None or field_name in fields else None
+            if value is not None:
+                if field_name == 'tags' and isinstance(value, list):
+                    value = vocabulary.tags(value)
+                elif field_name == 'attributes' and isinstance(value, dict):
+                    value = vocabulary.attributes(value)
+                elif field_name in INTERNED_FIELDS:
+                    value = vocabulary.intern(value)
+            setattr(self, _slot(field_name), value)
+        self.extra = {k: v for k, v in data.items() if k not in self.SCHEMA} if fields is None else None
+
+    def to_dict(self) -> dict:
+        """Returns the row as a plain JSON-ready dict (schema fields first, then any extra fields)."""
+        row = {}
+        for field_name in self.SCHEMA:
+            value = getattr(self, _slot(field_name))
+            if value is not None:
+                row[field_name] = _plain(value)
+        if self.extra:
+            row.update(self.extra)
+        return row
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.id!r})"
+
+def _slot(field_name: str) -> str:
+    return 'id' if field_name == '_id' else field_name
+
+class Product(_Record):
+    __slots__ = tuple(_slot(name) for name in PRODUCT_SCHEMA) + ('extra',)
+    SCHEMA = PRODUCT_SCHEMA
+
+class Document(_Record):
+    __slots__ = tuple(_slot(name) for name in DOCUMENT_SCHEMA) + ('extra',)
+    SCHEMA = DOCUMENT_SCHEMA
+
+# --- Text ---
+
+def as_markdown(product_doc: dict) -> str | None:
+    """
+    Generates a markdown representation of a product document, including its
+    name, description, attributes, and tags.
+    Returns None if the description is missing or empty.
+    """
+    if 'description' not in product_doc or not product_doc['description']:
+        return None
+
+    markdown_elements = []
+    
+    # Product Name
+    product_name = product_doc.get('name')
+    if product_name:
+        markdown_elements.append(f"# {product_name}")
+    
+    # Product Description (guaranteed to exist and be non-empty by the initial check)
+    markdown_elements.append(product_doc['description'])
+    
+    # Product Attributes
+    product_attributes = product_doc.get('attributes')
+    if product_attributes:
+        attribute_strings = []
+        if isinstance(product_attributes, dict):
+            for key, value in product_attributes.items():
+                if value is not None: # Only include attributes with a value
+                    attribute_strings.append(f"* **{key}**: {value}")
+        elif isinstance(product_attributes, list):
+            for attr in product_attributes:
+                if isinstance(attr, dict):
+                    name = attr.get('name', attr.get('key'))
+                    val = attr.get('value')
+                    if name and val is not None:
+                        attribute_strings.append(f"* **{name}**: {val}")
+                    elif name: # Attribute with name but no value
+                        attribute_strings.append(f"* {name}")
+                    # else: skip malformed dict attributes
+                elif isinstance(attr, str) and attr.strip():
+                    attribute_strings.append(f"* {attr.strip()}")
+                # else: skip non-string/non-dict attributes in list
+        if attribute_strings:
+            markdown_elements.append("\n## Attributes")
+            markdown_elements.extend(attribute_strings)
+    
+    # Product Tags
+    product_tags = product_doc.get('tags')
+    if product_tags:
+        tag_list = []
+        if isinstance(product_tags, list):
+            tag_list = [str(tag).strip() for tag in product_tags if tag and str(tag).strip()]
+        elif isinstance(product_tags, str) and product_tags.strip():
+            tag_list = [product_tags.strip()]
+        
+        if tag_list:
+            markdown_elements.append("\n## Tags")
+            markdown_elements.append(", ".join(tag_list))
+
+    return "\n\n".join(markdown_elements)
+
+# --- Readers ---
+
+def _warn_invalid_line(file_path: str, line_num: int, error: Exception):
+    logging.warning(f"Skipping invalid JSON line in {file_path} (line {line_num}): {error}")
+
+def iter_jsonl(file_path: str, on_error: Callable[[str, int, Exception], None] = _warn_invalid_line) -> Iterator[tuple[int, object]]:
+    """
+    Streams (line_num, value) for each non-empty line of a JSONL file, using orjson when it is
+    installed. Lines that fail to parse are passed to `on_error` and skipped.
+    """
+    with open(file_path, 'rb') as f:
+        for line_num, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_num, _loads(line)
+            except ValueError as e: # json and orjson decode errors are both ValueErrors
+                on_error(file_path, line_num, e)
+
+def _iter_records(record_type, file_path, fields, vocabulary, on_error):
+    for line_num, data in iter_jsonl(file_path, on_error):
+        if not isinstance(data, dict):
+            on_error(file_path, line_num, ValueError("line is not a JSON object"))
+            continue
+        yield line_num, record_type(data, vocabulary, fields)
+
+def iter_products(file_path: str, fields=None, vocabulary: Vocabulary = DEFAULT_VOCABULARY,
+                  on_error=_warn_invalid_line) -> Iterator[tuple[int, Product]]:
+    """Streams (line_num, Product) from a products.jsonl file; `fields` limits which schema fields are kept."""
+    return _iter_records(Product, file_path, fields, vocabulary, on_error)
+
+def iter_documents(file_path: str, fields=None, vocabulary: Vocabulary = DEFAULT_VOCABULARY,
+                   on_error=_warn_invalid_line) -> Iterator[tuple[int, Document]]:
+    """Streams (line_num, Document) from a documents.jsonl file; `fields` limits which schema fields are kept."""
+    return _iter_records(Document, file_path, fields, vocabulary, on_error)
+
+def catalog_files(pattern: str, root: str = ".") -> list[str]:
+    """Sorted catalog files matching a glob such as PRODUCT_FILES_GLOB, relative to `root`."""
+    return sorted(glob.glob(os.path.join(root, pattern)))
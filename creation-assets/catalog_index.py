@@ -0,0 +1,86 @@
+import os
+import json
+import hashlib
+from collections import Counter
+from catalog import DOCUMENT_FILES_GLOB, PRODUCT_FILES_GLOB, catalog_files, iter_documents, iter_products
+from metrics import timer
+
+CATALOG_INDEX_PATH = "catalog-index.json" # Read by server.js at boot (see CATALOG_INDEX_PATH there)
+CATALOG_INDEX_FORMAT = 1 # Bump when the artifact's structure changes
+NON_BROWSABLE_TYPES = {'Consumables', 'Accessory'} # Left out of the hierarchy and tag counts, as in server.js
+
+def build_catalog_index(root: str = ".") -> dict:
+    """
+    Builds the compact index the web server needs at boot from the JSONL catalog:
+    the family -> product_type hierarchy, tags by frequency, product -> documentation map,
+    and the ID -> title/name maps. `version` is a hash of the content, so it only changes
+    when the catalog does.
+    """
+    hierarchy = {}
+    tag_counts = Counter()
+    product_docs = {}
+    product_names = {}
+    product_skus = {}
+    for file_path in catalog_files(PRODUCT_FILES_GLOB, root):
+        for _, product in iter_products(file_path, fields=('_id', 'sku', 'name', 'family', 'product_type', 'tags', 'documentation_ids')):
+            if not product.id:
+                continue
+            product_names[product.id] = product.name
+            product_docs[product.id] = list(product.documentation_ids or [])
+            if product.sku:
+                product_skus[product.sku] = product.id
+            if not product.family or not product.product_type or product.product_type in NON_BROWSABLE_TYPES:
+                continue
+            hierarchy.setdefault(product.family, set()).add(product.product_type)
+            tag_counts.update(product.tags or ())
+
+    doc_titles = {}
+    for file_path in catalog_files(DOCUMENT_FILES_GLOB, root):
+        for _, document in iter_documents(file_path, fields=('_id', 'title')):
+            if document.id and document.title:
+                doc_titles[document.id] = document.title
+
+    content = {
+        "hierarchy": {family: sorted(types) for family, types in sorted(hierarchy.items())},
+        # Most frequent first, then alphabetical (case-insensitive, close to the server's localeCompare)
+        "tags": [[tag, count] for tag, count in sorted(tag_counts.items(), key=lambda item: (-item[1], item[0].casefold(), item[0]))],
+        "product_docs": dict(sorted(product_docs.items())),
+        "product_names": dict(sorted(product_names.items())),
+        "product_skus": dict(sorted(product_skus.items())),
+        "doc_titles": dict(sorted(doc_titles.items())),
+    }
+    canonical = json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return {
+        "format": CATALOG_INDEX_FORMAT,
+        "version": hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16],
+        **content,
+    }
+
+def write_catalog_index(index: dict, path: str = CATALOG_INDEX_PATH) -> bool:
+    """
+    Atomically writes the index (temp file + os.replace). Returns False without touching
+    the file when the version on disk is already current, so the server sees no change.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if json.load(f).get('version') == index['version']:
+                return False
+    except (FileNotFoundError, ValueError):
+        pass
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    return True
+
+def update_catalog_index(root: str = ".", path: str = CATALOG_INDEX_PATH):
+    """Rebuilds the index from the catalog and rewrites it if it changed; called at the end of each load."""
+    with timer("stage_seconds", stage="catalog_index"):
+        index = build_catalog_index(root)
+    if write_catalog_index(index, path):
+        print(f"Catalog index written to {path} (version {index['version']}).")
+    else:
+        print(f"Catalog index {path} is up to date (version {index['version']}).")
+
+if __name__ == "__main__":
+    update_catalog_index()
@@ -0,0 +1,129 @@
+import argparse
+from typing import Callable
+from concurrent.futures import Executor, ThreadPoolExecutor
+from astrapy import Collection
+from bulk_insert import insert_documents, print_insert_report
+from metrics import family_of, timer
+from delta_sync import (
+    delete_removed,
+    load_manifest,
+    manifest_path,
+    print_sync_report,
+    save_manifest,
+    sync_documents,
+)
+
+DEFAULT_PARALLEL_FILES = 4 # Files loaded at once (each with its own insert/sync concurrency)
+
+def _load_file(collection, file_path, read_file, text_field_name, chunk_size, concurrency, ordered, sync, manifest, embedder):
+    """
+    Reads and writes one file. Returns (report, document ids, messages); `report` is None when
+    the file couldn't be read or embedded. Messages are returned instead of printed so that
+    files loaded in parallel don't interleave their output.
+    """
+    with timer("stage_seconds", stage="load_file", family=family_of(file_path)):
+        try:
+            documents = read_file(file_path, text_field_name)
+        except FileNotFoundError:
+            return None, None, [f"  Error: File not found {file_path}"]
+        except Exception as e:
+            return None, None, [f"  Error processing file {file_path}: {e}"]
+
+        doc_ids = [doc.get('_id') for doc in documents]
+        if sync:
+            return sync_documents(collection, documents, manifest, text_field_name, file_path, concurrency,
+                                  embedder=embedder), doc_ids, []
+        if embedder:
+            try:
+                documents = embedder(documents, text_field_name)
+            except Exception as e:
+                return None, doc_ids, [f"  Error computing embeddings for {file_path}: {e}"]
+        return insert_documents(collection, documents, file_path,
+                                chunk_size=chunk_size, concurrency=concurrency, ordered=ordered), doc_ids, []
+
+def load_files(
+    collection: Collection,
+    api_endpoint: str,
+    file_paths: list[str],
+    read_file: Callable[[str, str], list[dict]],
+    text_field_name: str,
+    chunk_size: int,
+    concurrency: int,
+    ordered: bool = False,
+    sync: bool = False,
+    delete_missing: bool = False,
+    embedder: Callable[[list[dict], str], list[dict]] | None = None,
+    parallel_files: int = 1,
+    executor: Executor | None = None,
+) -> tuple[int, int]:
+    """
+    Loads every file into the collection, either as a blind bulk insert or,
+    with `sync`, as a manifest-driven delta sync that only touches new or changed documents.
+    `read_file(file_path, text_field_name)` returns the prepared documents for one file.
+    An optional `embedder` (see embedding_cache.ClientEmbedder) swaps the server-side
+    vectorize text for a client-computed `$vector` before documents are written.
+    Up to `parallel_files` files are loaded at once, or the files are submitted to a shared
+    `executor` so several collections can load under one global cap.
+    Returns (documents written, documents failed).
+    """
+    manifest_file = manifest_path(api_endpoint, collection.name) if sync else None
+    manifest = load_manifest(manifest_file) if sync else {}
+    seen_ids = set()
+    all_files_read = True
+
+    total_written = 0
+    total_failed = 0
+    own_executor = ThreadPoolExecutor(max_workers=max(1, parallel_files)) if executor is None else None
+    try:
+        futures = []
+        for file_path in file_paths:
+            print(f"Processing {file_path} into '{collection.name}'...")
+            futures.append((executor or own_executor).submit(
+                _load_file, collection, file_path, read_file, text_field_name,
+                chunk_size, concurrency, ordered, sync, manifest, embedder,
+            ))
+
+        for future in futures:
+            report, doc_ids, messages = future.result()
+            for message in messages:
+                print(message)
+            if doc_ids is None:
+                all_files_read = False
+                continue
+            if report is None:
+                total_failed += len(doc_ids)
+                continue
+            if sync:
+                seen_ids.update(doc_ids)
+                print_sync_report(report)
+                total_written += len(report.upserted_ids) + len(report.updated_ids)
+            else:
+                print_insert_report(report)
+                total_written += report.inserted_count
+            total_failed += len(report.failed_ids)
+    finally:
+        if own_executor:
+            own_executor.shutdown()
+
+    if sync:
+        if delete_missing and all_files_read:
+            deleted = delete_removed(collection, manifest, seen_ids)
+            print(f"Deleted {len(deleted)} documents no longer present in the JSONL files.")
+            for doc_id in deleted:
+                print(f"    - {doc_id}")
+        elif delete_missing:
+            print("Skipping --delete-missing because not every file could be read.")
+        save_manifest(manifest_file, manifest)
+        print(f"Manifest saved to {manifest_file}")
+
+    if embedder:
+        print(f"Embedding cache: {embedder.cache.hits} hits, {embedder.cache.misses} misses ({embedder.provider.model}).")
+
+    action = "synced" if sync else "inserted"
+    print(f"\nFinished loading '{collection.name}'. Total documents {action}: {total_written}, failed: {total_failed}")
+    return total_written, total_failed
+
+def add_parallel_arguments(parser: argparse.ArgumentParser):
+    """Adds the shared --parallel-files option to a loader CLI."""
+    parser.add_argument("--parallel-files", type=int, default=DEFAULT_PARALLEL_FILES,
+                        help=f"JSONL files loaded at the same time (default: {DEFAULT_PARALLEL_FILES}).")
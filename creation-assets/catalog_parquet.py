@@ -0,0 +1,283 @@
+import os
+import json
+import logging
+import argparse
+from catalog import (
+    DOCUMENT_FILES_GLOB, DOCUMENT_SCHEMA, PRODUCT_FILES_GLOB, PRODUCT_SCHEMA,
+    as_markdown, catalog_files, iter_documents, iter_products,
+)
+from embedding_cache import DEFAULT_CACHE_PATH, EmbeddingCache, embed_texts, get_provider, PROVIDERS
+from metrics import add_metrics_arguments, count, report_metrics, timer
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError: # pyarrow is only needed to export or read the columnar files
+    pa = pc = pq = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+PARQUET_DIR = "catalog-parquet" # Relative to creation-assets
+PRODUCTS_PARQUET = "products.parquet"
+DOCUMENTS_PARQUET = "documents.parquet"
+CATALOG_PARQUET_FORMAT = "1" # Stored in the schema metadata
+DEFAULT_BATCH_SIZE = 10000 # Rows per record batch (and row group) written or read
+ATTRIBUTE_PREFIX = "attr_" # attributes.focus_area -> attr_focus_area
+VECTOR_COLUMN = "vector"
+# Text the loaders embed for each kind of record (see load_products_astra / load_documents_astra)
+EMBEDDING_TEXT = {
+    "products": as_markdown,
+    "documents": lambda row: row.get('text'),
+}
+
+def require_pyarrow():
+    if pa is None:
+        raise RuntimeError("pyarrow is required for the Parquet export: pip install pyarrow")
+
+# --- Schema ---
+
+def _attribute_kind(value) -> str:
+    if isinstance(value, list):
+        return "list"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "number"
+    return "string"
+
+def infer_attribute_kinds(rows) -> dict:
+    """Maps every attribute name to list / bool / number / string; names whose values disagree become string."""
+    kinds = {}
+    for row in rows:
+        for name, value in (row.get('attributes') or {}).items():
+            kind = _attribute_kind(value)
+            kinds[name] = kind if kinds.get(name, kind) == kind else "string"
+    return dict(sorted(kinds.items()))
+
+ATTRIBUTE_TYPES = {"list": lambda: pa.list_(pa.string()), "bool": pa.bool_, "number": pa.float64, "string": pa.string}
+
+def products_schema(attribute_kinds: dict, dimension: int | None = None, embedding_model: str | None = None) -> "pa.Schema":
+    """Products with nested `price` and `attributes` flattened into typed columns."""
+    fields = [
+        pa.field('_id', pa.string(), nullable=False),
+        pa.field('sku', pa.string()),
+        pa.field('name', pa.string()),
+        pa.field('family', pa.dictionary(pa.int32(), pa.string())),
+        pa.field('product_type', pa.dictionary(pa.int32(), pa.string())),
+        pa.field('description', pa.string()),
+        pa.field('price_amount', pa.float64()),
+        pa.field('price_currency', pa.dictionary(pa.int32(), pa.string())),
+        pa.field('tags', pa.list_(pa.string())),
+        pa.field('image_url', pa.string()),
+        pa.field('documentation_ids', pa.list_(pa.string())),
+    ]
+    fields += [pa.field(ATTRIBUTE_PREFIX + name, ATTRIBUTE_TYPES[kind]()) for name, kind in attribute_kinds.items()]
+    return _finish_schema(fields, dimension, embedding_model, {"attribute_kinds": json.dumps(attribute_kinds)})
+
+def documents_schema(dimension: int | None = None, embedding_model: str | None = None) -> "pa.Schema":
+    fields = [pa.field('_id', pa.string(), nullable=False)]
+    fields += [pa.field(name, pa.dictionary(pa.int32(), pa.string()) if name in ('doc_type', 'version', 'language', 'format') else pa.string())
+               for name in DOCUMENT_SCHEMA if name != '_id']
+    return _finish_schema(fields, dimension, embedding_model)
+
+def _finish_schema(fields: list, dimension: int | None, embedding_model: str | None = None,
+                   metadata: dict | None = None) -> "pa.Schema":
+    """
+    Adds the optional fixed-size embedding column (its model goes in the `embedding_model`
+    metadata), the `extra` column (JSON of non-schema fields) and metadata.
+    """
+    metadata = dict(metadata or {})
+    if dimension:
+        fields.append(pa.field(VECTOR_COLUMN, pa.list_(pa.float32(), dimension)))
+        metadata["embedding_model"] = embedding_model or "unknown"
+    fields.append(pa.field('extra', pa.string()))
+    return pa.schema(fields, metadata={"catalog_parquet_format": CATALOG_PARQUET_FORMAT, **metadata})
+
+# --- Rows <-> columns ---
+
+def flatten_product(row: dict, attribute_kinds: dict) -> dict:
+    price = row.get('price') if isinstance(row.get('price'), dict) else {}
+    flat = {name: row.get(name) for name in ('_id', 'sku', 'name', 'family', 'product_type', 'description',
+                                             'tags', 'image_url', 'documentation_ids')}
+    flat['price_amount'] = price.get('amount')
+    flat['price_currency'] = price.get('currency')
+    attributes = row.get('attributes') or {}
+    for name, kind in attribute_kinds.items():
+        value = attributes.get(name)
+        if value is not None and kind == "string" and not isinstance(value, str):
+            value = json.dumps(value)
+        elif value is not None and kind == "list":
+            value = [str(item) for item in value]
+        flat[ATTRIBUTE_PREFIX + name] = value
+    extra = {k: v for k, v in row.items() if k not in PRODUCT_SCHEMA}
+    flat['extra'] = json.dumps(extra, ensure_ascii=False) if extra else None
+    return flat
+
+def unflatten_product(flat: dict, attribute_kinds: dict) -> dict:
+    """Inverse of flatten_product: the nested product row as found in products.jsonl (null columns are dropped)."""
+    row = {name: flat[name] for name in ('_id', 'sku', 'name', 'family', 'product_type', 'description',
+                                         'tags', 'image_url', 'documentation_ids') if flat.get(name) is not None}
+    if flat.get('price_amount') is not None or flat.get('price_currency') is not None:
+        row['price'] = {k: v for k, v in (('amount', flat.get('price_amount')), ('currency', flat.get('price_currency'))) if v is not None}
+    attributes = {name: flat[ATTRIBUTE_PREFIX + name] for name in attribute_kinds if flat.get(ATTRIBUTE_PREFIX + name) is not None}
+    if attributes:
+        row['attributes'] = attributes
+    if flat.get('extra'):
+        row.update(json.loads(flat['extra']))
+    return row
+
+def flatten_document(row: dict) -> dict:
+    flat = {name: row.get(name) for name in DOCUMENT_SCHEMA}
+    extra = {k: v for k, v in row.items() if k not in DOCUMENT_SCHEMA}
+    flat['extra'] = json.dumps(extra, ensure_ascii=False) if extra else None
+    return flat
+
+def unflatten_document(flat: dict) -> dict:
+    row = {name: flat[name] for name in DOCUMENT_SCHEMA if flat.get(name) is not None}
+    if flat.get('extra'):
+        row.update(json.loads(flat['extra']))
+    return row
+
+# --- Export ---
+
+def _batches(rows, size: int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _write_table(path: str, schema, flat_rows, kind: str, provider, cache, batch_size: int, texts) -> int:
+    """Streams flattened rows into a Parquet file in record batches, embedding each batch if a provider is given."""
+    tmp_path = f"{path}.tmp"
+    written = 0
+    with pq.ParquetWriter(tmp_path, schema, compression='zstd') as writer:
+        for batch in _batches(zip(flat_rows, texts), batch_size):
+            rows = [row for row, _ in batch]
+            if provider:
+                with timer("stage_seconds", stage="embed", kind=kind):
+                    vectors = embed_texts([text or "" for _, text in batch], provider, cache)
+                for row, (_, text), vector in zip(rows, batch, vectors):
+                    row[VECTOR_COLUMN] = vector if text else None
+            writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+            written += len(rows)
+    os.replace(tmp_path, path)
+    count("parquet_rows", written, kind=kind)
+    return written
+
+def export_catalog(output_dir: str = PARQUET_DIR, root: str = ".", embeddings: str | None = None,
+                   embedding_cache: str = DEFAULT_CACHE_PATH, batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    """
+    Writes products and documents from the JSONL catalog under `root` to Parquet. With `embeddings`
+    (a provider name), each file also gets a fixed-size float32 `vector` column computed through the
+    embedding cache from the same text the loaders send to Astra.
+    Returns {file path: rows written}.
+    """
+    require_pyarrow()
+    os.makedirs(output_dir, exist_ok=True)
+    provider = get_provider(embeddings) if embeddings else None
+    cache = EmbeddingCache(embedding_cache) if provider else None
+    dimension = provider.dimension if provider else None
+    model = provider.model if provider else None
+    product_files = catalog_files(PRODUCT_FILES_GLOB, root)
+    document_files = catalog_files(DOCUMENT_FILES_GLOB, root)
+
+    def product_rows():
+        for file_path in product_files:
+            for _, product in iter_products(file_path):
+                yield product.to_dict()
+
+    def document_rows():
+        for file_path in document_files:
+            for _, document in iter_documents(file_path):
+                yield document.to_dict()
+
+    results = {}
+    with timer("stage_seconds", stage="export", kind="products"):
+        # Attribute columns have to be known before the first batch is written, hence a first pass
+        attribute_kinds = infer_attribute_kinds(product_rows())
+        schema = products_schema(attribute_kinds, dimension, model)
+        path = os.path.join(output_dir, PRODUCTS_PARQUET)
+        texts = (EMBEDDING_TEXT["products"](row) for row in product_rows()) if provider else iter(lambda: None, 0)
+        results[path] = _write_table(path, schema, (flatten_product(row, attribute_kinds) for row in product_rows()),
+                                     "products", provider, cache, batch_size, texts)
+    with timer("stage_seconds", stage="export", kind="documents"):
+        path = os.path.join(output_dir, DOCUMENTS_PARQUET)
+        texts = (EMBEDDING_TEXT["documents"](row) for row in document_rows()) if provider else iter(lambda: None, 0)
+        results[path] = _write_table(path, documents_schema(dimension, model), (flatten_document(row) for row in document_rows()),
+                                     "documents", provider, cache, batch_size, texts)
+    for path, rows in results.items():
+        logging.info(f"Wrote {rows} rows to {path} ({os.path.getsize(path)} bytes)")
+    return results
+
+# --- Reading ---
+
+def iter_parquet_rows(path: str, batch_size: int = DEFAULT_BATCH_SIZE, columns: list[str] | None = None):
+    """
+    Yields lists of catalog rows, one list per record batch, rebuilt into the nested JSONL shape.
+    The embedding, when present, comes back as `$vector`.
+    """
+    require_pyarrow()
+    parquet_file = pq.ParquetFile(path)
+    metadata = parquet_file.schema_arrow.metadata or {}
+    attribute_kinds = json.loads(metadata[b"attribute_kinds"]) if b"attribute_kinds" in metadata else None
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        rows = []
+        for flat in batch.to_pylist():
+            row = unflatten_product(flat, attribute_kinds) if attribute_kinds is not None else unflatten_document(flat)
+            if flat.get(VECTOR_COLUMN) is not None:
+                row['$vector'] = flat[VECTOR_COLUMN]
+            rows.append(row)
+        yield rows
+
+def stored_embedding_model(path: str) -> str | None:
+    """Model recorded for an export's vector column ("unknown" if the export predates it), or None without one."""
+    require_pyarrow()
+    schema = pq.read_schema(path)
+    if VECTOR_COLUMN not in schema.names:
+        return None
+    return (schema.metadata or {}).get(b"embedding_model", b"unknown").decode('utf-8')
+
+def catalog_summary(output_dir: str = PARQUET_DIR) -> dict:
+    """Aggregates computed from just the columns they need: tag frequencies, price range per family, docs per doc_type."""
+    require_pyarrow()
+    products = pq.read_table(os.path.join(output_dir, PRODUCTS_PARQUET), columns=['family', 'price_amount', 'tags'])
+    documents = pq.read_table(os.path.join(output_dir, DOCUMENTS_PARQUET), columns=['doc_type'])
+    # Each row group carries its own dictionary; group_by needs them merged
+    products, documents = products.unify_dictionaries(), documents.unify_dictionaries()
+    tags = pc.value_counts(pc.list_flatten(products['tags'])).to_pylist()
+    prices = (products.group_by('family')
+              .aggregate([('price_amount', 'min'), ('price_amount', 'max'), ('price_amount', 'mean')]).to_pylist())
+    doc_types = pc.value_counts(documents['doc_type'].combine_chunks()).to_pylist()
+    return {
+        "tag_counts": {item['values']: item['counts'] for item in sorted(tags, key=lambda item: (-item['counts'], item['values']))},
+        "price_by_family": {str(item['family']): {"min": item['price_amount_min'], "max": item['price_amount_max'],
+                                                  "mean": item['price_amount_mean']} for item in prices},
+        "documents_by_type": {item['values']: item['counts'] for item in sorted(doc_types, key=lambda item: -item['counts'])},
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the JSONL catalog to Parquet (flattened, typed columns), or summarize an export.")
+    parser.add_argument("--output-dir", default=PARQUET_DIR, help=f"Directory for the Parquet files (default: {PARQUET_DIR}).")
+    parser.add_argument("--root", default=".", help="Catalog root holding products/*/ (default: .).")
+    parser.add_argument("--embeddings", choices=sorted(PROVIDERS),
+                        help="Also store each record's embedding in a fixed-size vector column, computed with this provider.")
+    parser.add_argument("--embedding-cache", default=DEFAULT_CACHE_PATH,
+                        help=f"SQLite embedding cache used with --embeddings (default: {DEFAULT_CACHE_PATH}).")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Rows per record batch / row group (default: {DEFAULT_BATCH_SIZE}).")
+    parser.add_argument("--summary", action="store_true",
+                        help="Print tag frequencies, price ranges per family and documents per doc_type from an existing export instead.")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    if args.summary:
+        print(json.dumps(catalog_summary(args.output_dir), indent=1))
+    else:
+        export_catalog(args.output_dir, root=args.root, embeddings=args.embeddings,
+                       embedding_cache=args.embedding_cache, batch_size=args.batch_size)
+        report_metrics(args)
@@ -1,111 +1,198 @@
+import os
+import sys
 import json
-from pathlib import Path
-
-def load_jsonl(file_path):
-    """Load a JSONL file and return a list of dictionaries."""
-    items = []
-    with open(file_path, 'r') as f:
-        for line_num, line in enumerate(f, 1):
-            line = line.strip()
-            if not line:  # Skip empty lines
+import glob
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from catalog import PRODUCT_SCHEMA, DOCUMENT_SCHEMA, iter_jsonl
+from metrics import add_metrics_arguments, count, report_metrics, timer
+
+CATALOG_GLOB = "products/*/*.jsonl"
+
+SCHEMAS = {
+    "products.jsonl": ('product', PRODUCT_SCHEMA),
+    "documents.jsonl": ('document', DOCUMENT_SCHEMA),
+}
+
+def problem(severity, kind, file_path, message, line=None, record_id=None):
+    """Builds one machine-readable problem entry."""
+    entry = {"severity": severity, "type": kind, "file": file_path, "message": message}
+    if line is not None:
+        entry["line"] = line
+    if record_id is not None:
+        entry["id"] = record_id
+    return entry
+
+def _type_name(expected):
+    return {str: "string", list: "array", dict: "object"}[expected]
+
+def check_schema(record, schema, file_path, line_num):
+    """Checks required fields and field types of one record against a schema."""
+    problems = []
+    record_id = record.get('_id') if isinstance(record.get('_id'), str) else None
+    for field_name, (expected, required) in schema.items():
+        if field_name not in record:
+            if required:
+                problems.append(problem("error", "missing_field", file_path, f"Missing required field '{field_name}'", line_num, record_id))
+            continue
+        value = record[field_name]
+        if not isinstance(value, expected):
+            problems.append(problem("error", "wrong_type", file_path,
+                                    f"Field '{field_name}' should be {_type_name(expected)}, got {type(value).__name__}",
+                                    line_num, record_id))
+    if isinstance(record.get('documentation_ids'), list) and not all(isinstance(i, str) for i in record['documentation_ids']):
+        problems.append(problem("error", "wrong_type", file_path, "Field 'documentation_ids' should only contain strings", line_num, record_id))
+    if isinstance(record.get('tags'), list) and not all(isinstance(t, str) for t in record['tags']):
+        problems.append(problem("error", "wrong_type", file_path, "Field 'tags' should only contain strings", line_num, record_id))
+    price = record.get('price')
+    if isinstance(price, dict):
+        if not isinstance(price.get('amount'), (int, float)) or isinstance(price.get('amount'), bool):
+            problems.append(problem("error", "wrong_type", file_path, "Field 'price.amount' should be a number", line_num, record_id))
+        if not isinstance(price.get('currency'), str):
+            problems.append(problem("error", "wrong_type", file_path, "Field 'price.currency' should be a string", line_num, record_id))
+    return problems
+
+def scan_file(file_path):
+    """
+    Parses one JSONL file once (runs in a worker process). Returns the file's kind, compact
+    per-record summaries for the global index, and the file-local problems.
+    """
+    kind, schema = SCHEMAS.get(os.path.basename(file_path), (None, None))
+    if kind is None:
+        return {"file": file_path, "kind": None, "records": [],
+                "problems": [problem("warning", "unknown_file", file_path, "Not a products.jsonl or documents.jsonl file; skipped")]}
+
+    records = []
+    problems = []
+
+    def on_error(file_path, line_num, error):
+        problems.append(problem("error", "invalid_json", file_path, str(error), line_num))
+
+    for line_num, record in iter_jsonl(file_path, on_error):
+        if not isinstance(record, dict):
+            problems.append(problem("error", "invalid_json", file_path, "Line is not a JSON object", line_num))
+            continue
+        problems.extend(check_schema(record, schema, file_path, line_num))
+        if not isinstance(record.get('_id'), str):
+            continue
+        summary = {"_id": record['_id'], "line": line_num}
+        if kind == 'product':
+            summary["sku"] = record.get('sku') if isinstance(record.get('sku'), str) else None
+            doc_ids = record.get('documentation_ids')
+            summary["documentation_ids"] = [i for i in doc_ids if isinstance(i, str)] if isinstance(doc_ids, list) else []
+        else:
+            summary["product_id"] = record.get('product_id') if isinstance(record.get('product_id'), str) else None
+        records.append(summary)
+    return {"file": file_path, "kind": kind, "records": records, "problems": problems}
+
+def _family_dir(file_path):
+    return os.path.basename(os.path.dirname(file_path))
+
+def check_catalog(file_paths, workers=None):
+    """
+    Validates the whole catalog: every file is parsed once in a process pool, then a global
+    ID index is built to find duplicates, broken cross-references and orphaned documents.
+    Returns the JSON-serializable report.
+    """
+    with timer("stage_seconds", stage="scan"), ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(scan_file, file_paths))
+
+    problems = []
+    products = {} # _id -> (file, summary)
+    documents = {}
+    skus = {}
+    for result in results:
+        problems.extend(result["problems"])
+        if result["kind"] is None:
+            continue
+        index = products if result["kind"] == 'product' else documents
+        for summary in result["records"]:
+            location = (result["file"], summary)
+            if summary["_id"] in index:
+                first_file, first = index[summary["_id"]]
+                problems.append(problem("error", f"duplicate_{result['kind']}_id", result["file"],
+                                        f"_id also defined at {first_file}:{first['line']}", summary["line"], summary["_id"]))
                 continue
-            try:
-                items.append(json.loads(line))
-            except json.JSONDecodeError as e:
-                print(f"\nError in {file_path} at line {line_num}:")
-                print(f"Line content: {line}")
-                print(f"Error message: {str(e)}")
-                print(f"Position: {e.pos}")
-                if e.lineno:
-                    print(f"Line number: {e.lineno}")
-                if e.colno:
-                    print(f"Column number: {e.colno}")
-                print("-" * 80)
-                raise
-    return items
-
-def validate_jsonl(file_path):
-    """Validate JSONL file format and content."""
-    print(f"\nValidating {file_path}...")
-    try:
-        items = load_jsonl(file_path)
-        print(f"Successfully loaded {len(items)} items")
-        
-        # Check for required fields based on file type
-        if "products.jsonl" in str(file_path):
-            required_fields = {'id', 'name', 'documentation_ids'}
-        else:  # documents.jsonl
-            required_fields = {'doc_id', 'title', 'text', 'product_id'}
-            
-        # Validate each item
-        for i, item in enumerate(items, 1):
-            missing_fields = required_fields - set(item.keys())
-            if missing_fields:
-                print(f"\nError in {file_path} at item {i}:")
-                print(f"Missing required fields: {missing_fields}")
-                print(f"Item content: {item}")
-                print("-" * 80)
-                
-        return True
-    except Exception as e:
-        print(f"\nFailed to validate {file_path}: {str(e)}")
-        return False
-
-def check_missing_docs(directory):
-    """Check for missing documentation in the specified directory."""
-    # Construct paths
-    products_path = Path(directory) / "products.jsonl"
-    docs_path = Path(directory) / "documents.jsonl"
-    
-    # Validate files first
-    if not validate_jsonl(products_path) or not validate_jsonl(docs_path):
-        print("\nValidation failed. Please fix the JSON formatting issues before proceeding.")
-        return
-    
-    # Load products and documents
-    products = load_jsonl(products_path)
-    documents = load_jsonl(docs_path)
-    
-    # Create set of existing document IDs
-    existing_doc_ids = {doc['doc_id'] for doc in documents}
-    
-    # Check each product's documentation
-    missing_docs = []
-    for product in products:
-        product_id = product['id']
-        required_docs = product.get('documentation_ids', [])
-        
-        for doc_id in required_docs:
-            if doc_id not in existing_doc_ids:
-                missing_docs.append({
-                    'product_id': product_id,
-                    'product_name': product['name'],
-                    'missing_doc_id': doc_id
-                })
-    
-    # Print results
-    if missing_docs:
-        print(f"\nMissing documentation in {directory}:")
-        print("-" * 80)
-        for item in missing_docs:
-            print(f"Product: {item['product_name']} ({item['product_id']})")
-            print(f"Missing: {item['missing_doc_id']}")
-            print("-" * 80)
-        print(f"\nTotal missing documents: {len(missing_docs)}")
-    else:
-        print(f"\nAll documentation present in {directory}!")
+            index[summary["_id"]] = location
+            sku = summary.get("sku")
+            if sku:
+                if sku in skus:
+                    first_file, first = skus[sku]
+                    problems.append(problem("error", "duplicate_sku", result["file"],
+                                            f"SKU '{sku}' also used by {first['_id']} at {first_file}:{first['line']}",
+                                            summary["line"], summary["_id"]))
+                else:
+                    skus[sku] = location
+
+    referenced = set()
+    for product_id, (file_path, summary) in products.items():
+        for doc_id in summary["documentation_ids"]:
+            referenced.add((product_id, doc_id))
+            if doc_id not in documents:
+                problems.append(problem("error", "missing_document", file_path,
+                                        f"documentation_ids references unknown document '{doc_id}'", summary["line"], product_id))
+                continue
+            # Bundles may list other products' documents; only the owner is expected in the same family
+            doc_file, doc = documents[doc_id]
+            if doc["product_id"] == product_id and _family_dir(doc_file) != _family_dir(file_path):
+                problems.append(problem("warning", "cross_family_document", doc_file,
+                                        f"Document is stored outside its product's family directory ({_family_dir(file_path)})",
+                                        doc["line"], doc_id))
+
+    for doc_id, (file_path, summary) in documents.items():
+        owner_id = summary["product_id"]
+        if owner_id and owner_id not in products:
+            problems.append(problem("error", "unknown_product", file_path,
+                                    f"product_id references unknown product '{owner_id}'", summary["line"], doc_id))
+        elif owner_id and (owner_id, doc_id) not in referenced:
+            problems.append(problem("warning", "orphan_document", file_path,
+                                    f"Document is not listed in the documentation_ids of its product '{owner_id}'",
+                                    summary["line"], doc_id))
+
+    severities = Counter(p["severity"] for p in problems)
+    for (severity, problem_type), problem_count in Counter((p["severity"], p["type"]) for p in problems).items():
+        count("problems", problem_count, severity=severity, type=problem_type)
+    return {
+        "files": len(file_paths),
+        "products": len(products),
+        "documents": len(documents),
+        "errors": severities["error"],
+        "warnings": severities["warning"],
+        "problem_counts": dict(sorted(Counter(p["type"] for p in problems).items())),
+        "problems": problems,
+    }
 
 if __name__ == "__main__":
-    import sys
-    
-    if len(sys.argv) != 2:
-        print("Usage: python check_docs.py <directory>")
-        print("Example: python check_docs.py products/constructobots")
-        sys.exit(1)
-    
-    directory = sys.argv[1]
-    if not Path(directory).exists():
-        print(f"Error: Directory '{directory}' does not exist")
-        sys.exit(1)
-    
-    check_missing_docs(directory) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Validate every products/*/*.jsonl file and the references between them.")
+    parser.add_argument("paths", nargs="*",
+                        help=f"JSONL files or family directories to check (default: {CATALOG_GLOB}).")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes used to parse files (default: CPU count).")
+    parser.add_argument("--strict", action="store_true",
+                        help="Exit non-zero on warnings as well as errors.")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout.")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    file_paths = []
+    for path in args.paths or [CATALOG_GLOB]:
+        if os.path.isdir(path):
+            file_paths.extend(sorted(glob.glob(os.path.join(path, "*.jsonl"))))
+        else:
+            file_paths.extend(sorted(glob.glob(path)))
+    if not file_paths:
+        print(f"Error: no JSONL files found for {args.paths or [CATALOG_GLOB]}", file=sys.stderr)
+        sys.exit(2)
+
+    with timer("stage_seconds", stage="check"):
+        report = check_catalog(file_paths, workers=args.workers)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    report_metrics(args, stream=sys.stderr) # stdout carries the JSON report
+    failed = report["errors"] > 0 or (args.strict and report["warnings"] > 0)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,172 @@
+import re
+from typing import Iterator
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base") # Tokenizer used by text-embedding-3-small
+except Exception: # tiktoken missing or its encoding can't be downloaded
+    _ENCODING = None
+
+DEFAULT_MAX_TOKENS = 512 # Token budget per chunk
+DEFAULT_OVERLAP_TOKENS = 64 # Trailing tokens of the previous chunk repeated at the start of the next
+CHUNK_METADATA_FIELDS = ('product_id', 'product_name', 'doc_type', 'version', 'title', 'language', 'format')
+
+HEADING_REGEX = re.compile(r'^#{1,6}\s+\S')
+SENTENCE_SPLIT_REGEX = re.compile(r'(?<=[.!?])\s+')
+APPROX_TOKEN_REGEX = re.compile(r'\w+|[^\w\s]')
+
+def count_tokens(text: str) -> int:
+    """Counts tokens with tiktoken when available, otherwise approximates with words and punctuation."""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return len(APPROX_TOKEN_REGEX.findall(text))
+
+def _split_words(text: str, max_tokens: int) -> Iterator[str]:
+    """Greedily packs whole words into pieces of at most `max_tokens` (a single huge word stands alone)."""
+    words = []
+    words_tokens = 0
+    for word in text.split():
+        word_tokens = count_tokens(word)
+        if words and words_tokens + word_tokens > max_tokens:
+            yield " ".join(words)
+            words, words_tokens = [], 0
+        words.append(word)
+        words_tokens += word_tokens
+    if words:
+        yield " ".join(words)
+
+def _split_oversized(block: str, max_tokens: int) -> Iterator[str]:
+    """Splits a block that exceeds the budget on lines, then sentences, then words as a last resort."""
+    current = []
+    current_tokens = 0
+    for line in block.split('\n'):
+        pieces = [line]
+        if count_tokens(line) > max_tokens:
+            pieces = SENTENCE_SPLIT_REGEX.split(line)
+        for piece in pieces:
+            sub_pieces = [piece] if count_tokens(piece) <= max_tokens else list(_split_words(piece, max_tokens))
+            for sub_piece in sub_pieces:
+                piece_tokens = count_tokens(sub_piece)
+                if current and current_tokens + piece_tokens > max_tokens:
+                    yield "\n".join(current)
+                    current, current_tokens = [], 0
+                current.append(sub_piece)
+                current_tokens += piece_tokens
+    if current:
+        yield "\n".join(current)
+
+def iter_blocks(markdown: str) -> Iterator[tuple[str, str | None]]:
+    """
+    Yields (block, heading) pairs: headings and blank-line separated paragraphs,
+    each paired with the heading of the section it belongs to.
+    """
+    heading = None
+    for raw_block in re.split(r'\n\s*\n', markdown):
+        block = raw_block.strip()
+        if not block:
+            continue
+        lines = block.split('\n')
+        # A heading directly followed by text (no blank line) starts its own block
+        if HEADING_REGEX.match(lines[0]):
+            heading = lines[0].strip()
+            yield heading, heading
+            rest = "\n".join(lines[1:]).strip()
+            if rest:
+                yield rest, heading
+        else:
+            yield block, heading
+
+def _overlap(previous: list[tuple[str, int]], heading: str | None, next_tokens: int, max_tokens: int, overlap_tokens: int) -> list[tuple[str, int]]:
+    """
+    Picks the trailing blocks of the previous chunk to repeat at the start of the next one,
+    led by the section heading, without pushing the next chunk over its budget.
+    """
+    budget = min(overlap_tokens, max_tokens - next_tokens)
+    overlap = []
+    total = 0
+    for block, tokens in reversed(previous):
+        if block == heading or total + tokens > budget:
+            break
+        overlap.insert(0, (block, tokens))
+        total += tokens
+    if heading:
+        heading_tokens = count_tokens(heading)
+        if total + heading_tokens + next_tokens <= max_tokens:
+            overlap.insert(0, (heading, heading_tokens))
+    return overlap
+
+def chunk_markdown(markdown: str, max_tokens: int = DEFAULT_MAX_TOKENS, overlap_tokens: int = DEFAULT_OVERLAP_TOKENS) -> Iterator[str]:
+    """
+    Streams token-budgeted chunks of a markdown text, splitting on headings and paragraphs.
+    A heading starts a new chunk once the current one holds a quarter of the budget, so small
+    sections are packed together; otherwise paragraphs are packed up to `max_tokens`, and a chunk
+    that continues a section starts with its heading plus up to `overlap_tokens` worth of trailing
+    paragraphs from the previous chunk.
+    """
+    min_tokens = max_tokens // 4
+    current = [] # (block, tokens)
+    current_tokens = 0
+    has_content = False # True once the chunk holds something beyond heading/overlap
+    unyielded = False # True once the chunk holds something not yet part of a yielded chunk
+
+    for block, heading in iter_blocks(markdown):
+        is_heading = block == heading
+        if not is_heading and not has_content and current and max_tokens - current_tokens < min_tokens:
+            # Back-to-back headings (or a long overlap) leave too little room for the body: emit the
+            # headings on their own and start over with just the section heading
+            if unyielded:
+                yield "\n\n".join(text for text, _ in current)
+            heading_tokens = count_tokens(heading) if heading else 0
+            current = [(heading, heading_tokens)] if heading and heading_tokens <= max_tokens - min_tokens else []
+            current_tokens = sum(tokens for _, tokens in current)
+            unyielded = False
+        # Leave room for the headings that lead (or may lead) the chunk the piece lands in
+        if is_heading:
+            piece_budget = max_tokens
+        elif has_content:
+            piece_budget = max_tokens - (count_tokens(heading) if heading else 0)
+        else:
+            piece_budget = max_tokens - current_tokens
+        piece_budget = max(1, piece_budget)
+        pieces = [block] if count_tokens(block) <= piece_budget else list(_split_oversized(block, piece_budget))
+        for piece in pieces:
+            piece_tokens = count_tokens(piece)
+            starts_section = is_heading and current_tokens >= min_tokens
+            if has_content and (starts_section or current_tokens + piece_tokens > max_tokens):
+                yield "\n\n".join(text for text, _ in current)
+                current = [] if is_heading else _overlap(current, heading, piece_tokens, max_tokens, overlap_tokens)
+                current_tokens = sum(tokens for _, tokens in current)
+                has_content = unyielded = False
+            elif current and current_tokens + piece_tokens > max_tokens:
+                # Only headings so far and the next one doesn't fit: they make a chunk of their own
+                if unyielded:
+                    yield "\n\n".join(text for text, _ in current)
+                current, current_tokens, unyielded = [], 0, False
+            current.append((piece, piece_tokens))
+            current_tokens += piece_tokens
+            has_content = has_content or not is_heading
+            unyielded = True
+
+    if current and unyielded:
+        yield "\n\n".join(text for text, _ in current)
+
+def iter_chunk_records(doc_data: dict, max_tokens: int = DEFAULT_MAX_TOKENS, overlap_tokens: int = DEFAULT_OVERLAP_TOKENS) -> Iterator[dict]:
+    """
+    Yields child records for one document: one per chunk of its `text`, carrying the
+    parent's metadata plus `parent_id` and `chunk_index`. `_id` is `<parent_id>#<chunk_index>`.
+    """
+    parent_id = doc_data.get('_id')
+    text = doc_data.get('text')
+    if not parent_id or not text:
+        return
+    for chunk_index, chunk_text in enumerate(chunk_markdown(text, max_tokens, overlap_tokens)):
+        record = {
+            '_id': f"{parent_id}#{chunk_index:03d}",
+            'parent_id': parent_id,
+            'chunk_index': chunk_index,
+        }
+        for field_name in CHUNK_METADATA_FIELDS:
+            if field_name in doc_data:
+                record[field_name] = doc_data[field_name]
+        record['text'] = chunk_text
+        yield record
@@ -1,17 +1,36 @@
 import os
 import logging
+import threading
+from typing import Callable
 from astrapy.info import CollectionDefinition
 from astrapy.constants import VectorMetric
 from astrapy.database import Database
 
-def create_collection_if_not_exists(db: Database, collection_name: str) -> tuple[bool, str]:
+def find_reranking_providers(db: Database) -> bool:
+    """Returns True if the database offers reranking providers (our proxy for lexical indexing support)."""
+    original_log_level = logging.getLogger().getEffectiveLevel()
+    try:
+        # Store original logging level and temporarily disable logging
+        logging.getLogger().setLevel(logging.ERROR)
+        db_admin = db.get_database_admin()
+        reranking_providers_result = db_admin.find_reranking_providers()
+        return bool(reranking_providers_result and reranking_providers_result.reranking_providers)
+    except Exception:
+        return False
+    finally:
+        logging.getLogger().setLevel(original_log_level)
+
+def create_collection_if_not_exists(db: Database, collection_name: str, collection_names: list[str] | None = None,
+                                    reranking_lookup: Callable[[], bool] | None = None) -> tuple[bool, str]:
     """
     Creates a collection if it doesn't exist.
     Checks for reranking provider availability as a proxy for attempting lexical indexing.
     Inspects existing collections for their lexical configuration.
+    `collection_names` and `reranking_lookup` let a caller reuse lookups it already made.
     Returns a tuple of (lexical_indexing_active, collection_name).
     """
-    collection_names = db.list_collection_names()
+    if collection_names is None:
+        collection_names = db.list_collection_names()
 
     if collection_name in collection_names:
         print(f"Collection '{collection_name}' already exists. Inspecting its configuration...")
@@ -33,18 +52,7 @@ def create_collection_if_not_exists(db: Database, collection_name: str) -> tuple
         print("Error: ASTRA_DB_INTEGRATION_OPENAI_KEY_NAME must be set for collection creation.")
         exit(1)
 
-    has_reranking_providers = False # Initialize
-    original_log_level = logging.getLogger().getEffectiveLevel()
-    try:
-        # Store original logging level and temporarily disable logging
-        logging.getLogger().setLevel(logging.ERROR)
-        db_admin = db.get_database_admin()
-        reranking_providers_result = db_admin.find_reranking_providers()
-        has_reranking_providers = bool(reranking_providers_result and reranking_providers_result.reranking_providers)
-    except Exception:
-        has_reranking_providers = False
-    finally:
-        logging.getLogger().setLevel(original_log_level)
+    has_reranking_providers = reranking_lookup() if reranking_lookup else find_reranking_providers(db)
 
     collection_definition = (
         CollectionDefinition.builder()
@@ -81,3 +89,34 @@ def create_collection_if_not_exists(db: Database, collection_name: str) -> tuple
     )    
     print(f"Collection '{collection_name}' created successfully with {'lexical' if has_reranking_providers else 'vector'} indexing and OpenAI embeddings.")
     return has_reranking_providers, collection_name
+
+class CollectionMetadataCache:
+    """
+    Shares collection setup across the loaders of one run: the collection list and the
+    reranking-provider lookup are fetched at most once, and each collection is inspected
+    (or created) only the first time it is requested. Safe to use from several threads.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self.lock = threading.Lock()
+        self.collection_names = None
+        self.reranking = None
+        self.collections = {} # requested name -> (lexical_indexing_active, collection_name)
+
+    def _has_reranking_providers(self) -> bool:
+        if self.reranking is None:
+            self.reranking = find_reranking_providers(self.db)
+        return self.reranking
+
+    def ensure(self, collection_name: str) -> tuple[bool, str]:
+        """Same result as create_collection_if_not_exists(), computed once per collection."""
+        with self.lock:
+            if collection_name not in self.collections:
+                if self.collection_names is None:
+                    self.collection_names = self.db.list_collection_names()
+                result = create_collection_if_not_exists(self.db, collection_name, self.collection_names,
+                                                         self._has_reranking_providers)
+                self.collection_names.append(result[1])
+                self.collections[collection_name] = result
+            return self.collections[collection_name]
@@ -0,0 +1,185 @@
+import os
+import json
+import hashlib
+import argparse
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from astrapy import Collection
+from metrics import count, family_of, timer
+
+MANIFEST_DIR = ".sync-manifests"
+DELETE_BATCH_SIZE = 100 # _ids per delete_many request
+
+@dataclass
+class SyncReport:
+    """Outcome of a delta sync for a single source file."""
+    file_path: str
+    upserted_ids: list = field(default_factory=list) # New or re-embedded documents
+    updated_ids: list = field(default_factory=list) # Metadata-only changes, no embedding call
+    unchanged_count: int = 0
+    failed_ids: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+
+def manifest_path(api_endpoint: str, collection_name: str) -> str:
+    """Returns the manifest file for a collection, keyed by endpoint so databases never share state."""
+    endpoint_key = hashlib.sha256(api_endpoint.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(MANIFEST_DIR, f"{collection_name}-{endpoint_key}.json")
+
+def load_manifest(path: str) -> dict:
+    """Loads the `_id` -> hashes manifest, returning an empty one if it doesn't exist yet."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_manifest(path: str, manifest: dict):
+    """Atomically writes the manifest (temp file + os.replace)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def _sha256(value) -> str:
+    canonical = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def content_hashes(document: dict, text_field_name: str) -> dict:
+    """
+    Hashes a prepared document twice: once over the text that gets embedded
+    (the as_markdown() output or the document `text`), and once over every field.
+    The field names are kept so removed fields can be unset on metadata-only updates.
+    """
+    return {
+        "text": _sha256(document.get(text_field_name)),
+        "doc": _sha256(document),
+        "fields": sorted(k for k in document if k not in ('_id', text_field_name)),
+    }
+
+def _upsert_one(collection: Collection, document: dict):
+    """Replaces (or creates) a document; the embedded text is recomputed server-side unless `$vector` is supplied."""
+    replacement = {k: v for k, v in document.items() if k != '_id'}
+    with timer("request_seconds", op="find_one_and_replace"):
+        collection.find_one_and_replace({"_id": document['_id']}, replacement, upsert=True)
+
+def _update_one(collection: Collection, document: dict, entry: dict, hashes: dict, text_field_name: str,
+                embedder: Callable[[list[dict], str], list[dict]] | None = None) -> bool:
+    """
+    Updates the non-embedded fields in place so no embedding is recomputed. If the document is
+    no longer in the collection (deleted outside the loader, collection recreated), it is
+    upserted in full instead. Returns True if it was updated in place, False if it was upserted.
+    """
+    update = {"$set": {k: v for k, v in document.items() if k not in ('_id', text_field_name)}}
+    removed_fields = set(entry.get('fields', [])) - set(hashes['fields'])
+    if removed_fields:
+        update["$unset"] = {k: "" for k in removed_fields}
+    with timer("request_seconds", op="update_one"):
+        result = collection.update_one({"_id": document['_id']}, update)
+    if result.update_info.get("n", 0):
+        return True
+    _upsert_one(collection, embedder([document], text_field_name)[0] if embedder else document)
+    return False
+
+def sync_documents(
+    collection: Collection,
+    documents: list[dict],
+    manifest: dict,
+    text_field_name: str,
+    file_path: str,
+    concurrency: int,
+    embedder: Callable[[list[dict], str], list[dict]] | None = None,
+) -> SyncReport:
+    """
+    Upserts only the documents whose hashes differ from the manifest, in parallel.
+    Documents whose embedded text is unchanged get a metadata-only update.
+    When an `embedder` is given, only the documents being upserted are passed through it.
+    The manifest is updated in place for every document that synced successfully.
+    """
+    report = SyncReport(file_path=file_path)
+    family = family_of(file_path)
+    upserts = []
+    updates = []
+    for document in documents:
+        doc_id = document.get('_id')
+        if doc_id is None:
+            report.errors.append(f"Document without '_id' cannot be synced: {str(document)[:100]}")
+            continue
+        hashes = content_hashes(document, text_field_name)
+        entry = manifest.get(doc_id)
+        if entry and entry.get('doc') == hashes['doc']:
+            report.unchanged_count += 1
+        elif entry is None or entry.get('text') != hashes['text']:
+            upserts.append((document, hashes))
+        else:
+            updates.append((document, entry, hashes))
+
+    to_upsert = [document for document, _ in upserts]
+    if embedder and to_upsert:
+        try:
+            to_upsert = embedder(to_upsert, text_field_name)
+        except Exception as e:
+            report.failed_ids.extend(document['_id'] for document, _ in upserts)
+            report.errors.append(f"Embedding failed: {e}")
+            upserts, to_upsert = [], []
+
+    with timer("stage_seconds", stage="sync", family=family), ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {}
+        for document, (_, hashes) in zip(to_upsert, upserts):
+            futures[executor.submit(_upsert_one, collection, document)] = (document['_id'], hashes, report.upserted_ids)
+        for document, entry, hashes in updates:
+            future = executor.submit(_update_one, collection, document, entry, hashes, text_field_name, embedder)
+            futures[future] = (document['_id'], hashes, report.updated_ids)
+
+        for future, (doc_id, hashes, succeeded) in futures.items():
+            try:
+                if future.result() is False: # Missing from the collection, so upserted rather than updated
+                    succeeded = report.upserted_ids
+            except Exception as e:
+                report.failed_ids.append(doc_id)
+                report.errors.append(f"{doc_id}: {e}")
+                continue
+            manifest[doc_id] = hashes
+            succeeded.append(doc_id)
+    count("documents", len(report.upserted_ids), stage="sync", family=family, outcome="upserted")
+    count("documents", len(report.updated_ids), stage="sync", family=family, outcome="updated")
+    count("documents", report.unchanged_count, stage="sync", family=family, outcome="unchanged")
+    count("documents", len(report.failed_ids), stage="sync", family=family, outcome="failed")
+    return report
+
+def delete_removed(collection: Collection, manifest: dict, seen_ids: set) -> list:
+    """Deletes documents recorded in the manifest whose `_id` no longer appears in any JSONL file."""
+    missing_ids = sorted(doc_id for doc_id in manifest if doc_id not in seen_ids)
+    deleted = []
+    for start in range(0, len(missing_ids), DELETE_BATCH_SIZE):
+        batch = missing_ids[start:start + DELETE_BATCH_SIZE]
+        try:
+            with timer("request_seconds", op="delete_many"):
+                collection.delete_many({"_id": {"$in": batch}})
+        except Exception as e:
+            print(f"  Error deleting {len(batch)} removed documents: {e}")
+            continue
+        for doc_id in batch:
+            del manifest[doc_id]
+        deleted.extend(batch)
+    return deleted
+
+def print_sync_report(report: SyncReport):
+    """Prints the per-file summary of a delta sync."""
+    print(f"  Synced {report.file_path}: {len(report.upserted_ids)} upserted, "
+          f"{len(report.updated_ids)} metadata-only updates, {report.unchanged_count} unchanged, "
+          f"{len(report.failed_ids)} failed.")
+    for doc_id in report.upserted_ids:
+        print(f"    + {doc_id}")
+    for doc_id in report.updated_ids:
+        print(f"    ~ {doc_id}")
+    for error in report.errors:
+        print(f"  Error: {error}")
+
+def add_sync_arguments(parser: argparse.ArgumentParser):
+    """Adds the shared --sync / --delete-missing options to a loader CLI."""
+    parser.add_argument("--sync", action="store_true",
+                        help=f"Upsert only new or changed documents, tracked in a local manifest under {MANIFEST_DIR}/.")
+    parser.add_argument("--delete-missing", action="store_true",
+                        help="With --sync, delete documents whose _id no longer appears in the JSONL files.")
@@ -0,0 +1,186 @@
+import os
+import math
+import hashlib
+import sqlite3
+import argparse
+import threading
+from array import array
+from metrics import count, timer
+
+DEFAULT_CACHE_PATH = ".embedding-cache.sqlite"
+DEFAULT_MODEL = "text-embedding-3-small" # Must match the collection's vectorize model
+DEFAULT_DIMENSION = 1536 # Must match the collection's vector dimension
+EMBEDDING_BATCH_SIZE = 64 # Texts per embedding request
+
+# --- Providers ---
+
+class OpenAIEmbeddingProvider:
+    """Embeds texts with the OpenAI embeddings API (reads OPENAI_API_KEY)."""
+
+    def __init__(self, model: str = DEFAULT_MODEL, dimension: int = DEFAULT_DIMENSION):
+        from openai import OpenAI
+        self.model = model
+        self.dimension = dimension
+        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        response = self.client.embeddings.create(model=self.model, input=texts, dimensions=self.dimension)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+FAKE_MODEL = "fake-sha256" # FakeEmbeddingProvider's model name, as recorded alongside stored vectors
+
+class FakeEmbeddingProvider:
+    """
+    Deterministic offline provider: derives a unit-length vector from the sha256 of the text.
+    Useful for tests and dry runs; the vectors carry no semantic meaning.
+    """
+
+    def __init__(self, model: str = FAKE_MODEL, dimension: int = DEFAULT_DIMENSION):
+        self.model = model
+        self.dimension = dimension
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        vectors = []
+        for text in texts:
+            values = []
+            counter = 0
+            while len(values) < self.dimension:
+                digest = hashlib.sha256(f"{counter}:{text}".encode('utf-8')).digest()
+                values.extend((byte - 127.5) / 127.5 for byte in digest)
+                counter += 1
+            values = values[:self.dimension]
+            norm = math.sqrt(sum(v * v for v in values)) or 1.0
+            vectors.append([v / norm for v in values])
+        return vectors
+
+PROVIDERS = {
+    "openai": OpenAIEmbeddingProvider,
+    "fake": FakeEmbeddingProvider,
+}
+
+def get_provider(name: str):
+    """Instantiates an embedding provider by name (see PROVIDERS)."""
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown embedding provider '{name}'. Choose from: {', '.join(PROVIDERS)}")
+    return PROVIDERS[name]()
+
+# --- Cache ---
+
+def cache_key(model: str, text: str) -> str:
+    """sha256 over the model name and text, so different models never share vectors."""
+    return hashlib.sha256(f"{model}\0{text}".encode('utf-8')).hexdigest()
+
+class EmbeddingCache:
+    """Persistent SQLite store of float32 embeddings keyed by cache_key(model, text)."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT NOT NULL, dimension INTEGER NOT NULL, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: list[str]) -> dict:
+        """Returns {key: vector} for the keys present in the cache."""
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500): # Stay under SQLite's bound-parameter limit
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch)
+                for key, blob in rows:
+                    found[key] = array('f', blob).tolist()
+        return found
+
+    def put_many(self, model: str, items: dict):
+        """Stores {key: vector} entries as float32 blobs."""
+        rows = [(key, model, len(vector), array('f', vector).tobytes()) for key, vector in items.items()]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def record_lookups(self, hits: int, misses: int):
+        """Adds to the hit/miss counters; embedders share one cache across threads."""
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def close(self):
+        self._conn.close()
+
+def embed_texts(texts: list[str], provider, cache: EmbeddingCache, batch_size: int = EMBEDDING_BATCH_SIZE) -> list[list[float]]:
+    """
+    Returns one vector per text. Cached vectors are read from disk; only the
+    distinct cache misses are sent to the provider, in batches, and then stored.
+    """
+    keys = [cache_key(provider.model, text) for text in texts]
+    vectors = cache.get_many(list(set(keys)))
+
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in vectors:
+            missing.setdefault(key, text)
+    hits = sum(1 for key in keys if key not in missing)
+    cache.record_lookups(hits, len(missing))
+    count("embedding_cache", hits, result="hit")
+    count("embedding_cache", len(missing), result="miss")
+
+    missing_items = list(missing.items())
+    for start in range(0, len(missing_items), batch_size):
+        batch = missing_items[start:start + batch_size]
+        with timer("request_seconds", op="embeddings", model=provider.model):
+            embedded = provider.embed([text for _, text in batch])
+        new_vectors = {key: vector for (key, _), vector in zip(batch, embedded)}
+        cache.put_many(provider.model, new_vectors)
+        vectors.update(new_vectors)
+
+    return [vectors[key] for key in keys]
+
+class ClientEmbedder:
+    """
+    Replaces server-side `$vectorize`/`$hybrid` text with a client-computed `$vector`
+    (plus `$lexical` for hybrid collections) before documents are written.
+    """
+
+    def __init__(self, provider, cache: EmbeddingCache):
+        self.provider = provider
+        self.cache = cache
+
+    @staticmethod
+    def _texts(value) -> tuple[str | None, str | None]:
+        """(text to embed, lexical text) of a `$vectorize`/`$hybrid` value; `$hybrid` may also be {"$vectorize", "$lexical"}."""
+        if isinstance(value, dict):
+            return value.get('$vectorize'), value.get('$lexical')
+        return value, value
+
+    def __call__(self, documents: list[dict], text_field_name: str) -> list[dict]:
+        texts = [self._texts(doc.get(text_field_name))[0] for doc in documents]
+        with timer("stage_seconds", stage="embed"):
+            vectors = iter(embed_texts([text for text in texts if text], self.provider, self.cache))
+        prepared = []
+        for doc in documents:
+            doc = doc.copy()
+            text, lexical = self._texts(doc.pop(text_field_name, None))
+            if text:
+                doc['$vector'] = next(vectors)
+            if lexical and text_field_name == '$hybrid':
+                doc['$lexical'] = lexical
+            prepared.append(doc)
+        return prepared
+
+def add_embedding_arguments(parser: argparse.ArgumentParser):
+    """Adds the shared --client-embeddings / --embedding-cache options to a loader CLI."""
+    parser.add_argument("--client-embeddings", choices=sorted(PROVIDERS),
+                        help="Compute $vector client-side with this provider instead of server-side vectorize.")
+    parser.add_argument("--embedding-cache", default=DEFAULT_CACHE_PATH,
+                        help=f"SQLite embedding cache used with --client-embeddings (default: {DEFAULT_CACHE_PATH}).")
+
+def embedder_from_args(args: argparse.Namespace) -> ClientEmbedder | None:
+    """Builds the ClientEmbedder requested on the command line, or None for server-side vectorize."""
+    if not args.client_embeddings:
+        return None
+    return ClientEmbedder(get_provider(args.client_embeddings), EmbeddingCache(args.embedding_cache))
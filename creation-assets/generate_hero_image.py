@@ -5,6 +5,8 @@ from dotenv import load_dotenv
 import logging
 import time
 import re
+import argparse
+from metrics import add_metrics_arguments, count, report_metrics, timer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -85,14 +87,17 @@ def call_dalle_api(client: OpenAI, prompt: str, retries: int = MAX_RETRIES):
     while attempt <= retries:
         try:
             logging.info(f"Requesting image generation from DALL-E with size {IMAGE_SIZE}...")
-            response = client.images.generate(
-                model=MODEL,
-                prompt=prompt,
-                size=IMAGE_SIZE,
-                quality=IMAGE_QUALITY,
-                n=1,
-                response_format="url"
-            )
+            if attempt:
+                count("retries", op="images.generate")
+            with timer("request_seconds", op="images.generate"):
+                response = client.images.generate(
+                    model=MODEL,
+                    prompt=prompt,
+                    size=IMAGE_SIZE,
+                    quality=IMAGE_QUALITY,
+                    n=1,
+                    response_format="url"
+                )
             image_url = response.data[0].url
             revised_prompt = response.data[0].revised_prompt # DALL-E 3 often revises prompts
             logging.info(f"API generated image URL: {image_url}")
@@ -166,7 +171,9 @@ def main():
 
     if image_url:
         logging.info(f"Attempting to download image to {save_path}")
-        if download_image(image_url, save_path):
+        with timer("stage_seconds", stage="download"):
+            downloaded = download_image(image_url, save_path)
+        if downloaded:
             logging.info("--- Hero Image Generation Complete ---")
         else:
             logging.error("Failed to download the generated hero image.")
@@ -174,4 +181,8 @@ def main():
         logging.error("Failed to get image URL from DALL-E API after retries.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the home page hero image with DALL-E.")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
     main()
+    report_metrics(args)
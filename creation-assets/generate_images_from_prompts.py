@@ -1,11 +1,18 @@
 import os
-import json
-import requests
-from openai import OpenAI
+import httpx
+import openai
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
 import logging
+import asyncio
+import argparse
+import random
 import time
 import re
+import shutil
+from catalog import iter_jsonl
+from prompt_manifest import PROMPT_MANIFEST_PATH, PromptManifest, prompt_hash
+from metrics import add_metrics_arguments, count, report_metrics, timer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -20,9 +27,59 @@ PRODUCTS_ROOT_DIR = "products"
 MODEL = "dall-e-3"
 IMAGE_SIZE = "1024x1024"
 IMAGE_QUALITY = "standard" # Options: "standard" or "hd"
-REQUEST_DELAY_SECONDS = 5 # Delay between API requests to avoid rate limits
-MAX_RETRIES = 2 # Number of retries for API call or download failures
-RETRY_DELAY_SECONDS = 10 # Delay before retrying a failed request
+IMAGES_PER_MINUTE = 5 # Provider rate limit for image generations (check your account tier)
+MAX_CONCURRENT_REQUESTS = 4 # Generations in flight at once
+MAX_RETRIES = 4 # Number of retries for API call or download failures
+BACKOFF_BASE_SECONDS = 2 # First retry waits up to this long, doubling each attempt
+BACKOFF_MAX_SECONDS = 60 # Upper bound for a single backoff wait
+
+# --- Rate Limiting & Retries ---
+
+class TokenBucket:
+    """Async token bucket: allows `rate_per_minute` acquisitions per minute with bursts up to `capacity`."""
+
+    def __init__(self, rate_per_minute: float, capacity: int = 1):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate_per_second)
+
+def retry_after_seconds(error: Exception) -> float | None:
+    """Returns the server's Retry-After hint (in seconds) from an HTTP error, if it sent one."""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    value = response.headers.get('retry-after')
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+def backoff_delay(attempt: int, error: Exception | None = None) -> float:
+    """Exponential backoff with full jitter, overridden by Retry-After when the server provides it."""
+    hinted = retry_after_seconds(error) if error is not None else None
+    if hinted is not None:
+        return hinted
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+def is_retryable(error: Exception) -> bool:
+    """Content policy, auth and billing errors won't succeed on retry; rate limits, timeouts and 5xx might."""
+    if isinstance(error, (openai.BadRequestError, openai.AuthenticationError, openai.PermissionDeniedError)):
+        return False
+    message = str(error).lower()
+    return "billing" not in message and "content policy" not in message
 
 # --- Helper Functions ---
 
@@ -34,58 +91,183 @@ def sanitize_filename(name: str) -> str:
     sanitized = sanitized.replace(' ', '_')
     return sanitized.lower()
 
-def download_image(image_url: str, save_path: str, retries: int = MAX_RETRIES) -> bool:
-    """Downloads an image from a URL and saves it with retries."""
-    attempt = 0
-    while attempt <= retries:
+async def download_image(http_client: httpx.AsyncClient, image_url: str, save_path: str, retries: int = MAX_RETRIES) -> bool:
+    """Streams an image from a URL to disk with retries, writing to a temp file first so partial downloads never count as done."""
+    tmp_path = f"{save_path}.part"
+    for attempt in range(retries + 1):
+        if attempt:
+            count("retries", op="download")
         try:
-            response = requests.get(image_url, stream=True, timeout=60)
-            response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
-            with open(save_path, 'wb') as f:
-                for chunk in response.iter_content(8192):
-                    f.write(chunk)
+            async with http_client.stream("GET", image_url) as response:
+                response.raise_for_status()
+                with open(tmp_path, 'wb') as f:
+                    async for chunk in response.aiter_bytes(8192):
+                        f.write(chunk)
+            os.replace(tmp_path, save_path)
             logging.info(f"Successfully downloaded image to {save_path}")
             return True
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logging.warning(f"Attempt {attempt + 1}/{retries + 1}: Failed to download image from {image_url}: {e}")
             if attempt < retries:
-                logging.info(f"Retrying download in {RETRY_DELAY_SECONDS} seconds...")
-                time.sleep(RETRY_DELAY_SECONDS)
-            attempt += 1
+                delay = backoff_delay(attempt, e)
+                logging.info(f"Retrying download in {delay:.1f} seconds...")
+                await asyncio.sleep(delay)
         except IOError as e:
             logging.error(f"Failed to save image to {save_path}: {e}")
             return False # Don't retry IO errors
     logging.error(f"Failed to download image from {image_url} after {retries + 1} attempts.")
     return False
 
-def call_dalle_api(client: OpenAI, prompt: str, retries: int = MAX_RETRIES):
-    """Calls the DALL-E API with retries and returns the image URL."""
-    attempt = 0
-    while attempt <= retries:
+async def call_dalle_api(client: AsyncOpenAI, prompt: str, limiter: TokenBucket, retries: int = MAX_RETRIES):
+    """Calls the DALL-E API with rate limiting and backoff retries, and returns the image URL."""
+    for attempt in range(retries + 1):
+        if attempt:
+            count("retries", op="images.generate")
+        with timer("stage_seconds", stage="rate_limit_wait"):
+            await limiter.acquire()
         try:
-            response = client.images.generate(
-                model=MODEL,
-                prompt=prompt,
-                size=IMAGE_SIZE,
-                quality=IMAGE_QUALITY,
-                n=1,
-                response_format="url" # Request URL directly
-            )
+            with timer("request_seconds", op="images.generate"):
+                response = await client.images.generate(
+                    model=MODEL,
+                    prompt=prompt,
+                    size=IMAGE_SIZE,
+                    quality=IMAGE_QUALITY,
+                    n=1,
+                    response_format="url" # Request URL directly
+                )
             image_url = response.data[0].url
             logging.info(f"API generated image URL: {image_url}")
             return image_url
         except Exception as e:
             logging.warning(f"Attempt {attempt + 1}/{retries + 1}: DALL-E API call failed: {e}")
+            if not is_retryable(e):
+                break
             if attempt < retries:
-                logging.info(f"Retrying API call in {RETRY_DELAY_SECONDS} seconds...")
-                time.sleep(RETRY_DELAY_SECONDS)
-            attempt += 1
-    logging.error(f"Failed to generate image from DALL-E after {retries + 1} attempts for prompt: {prompt[:100]}...")
+                delay = backoff_delay(attempt, e)
+                logging.info(f"Retrying API call in {delay:.1f} seconds...")
+                await asyncio.sleep(delay)
+    logging.error(f"Failed to generate image from DALL-E after {attempt + 1} attempt(s) for prompt: {prompt[:100]}...")
     return None
 
+# --- Job Preparation ---
+
+def load_jobs(prompts_file_path: str, manifest: PromptManifest) -> tuple[list[dict], int, int]:
+    """
+    Reads the prompts file and returns (jobs, skipped_count, error_count), where each job
+    holds the product id, prompt and save path of an image that is missing or whose prompt
+    hash differs from the one recorded in the manifest. An image already produced by the same
+    prompt under another path (e.g. a renamed product) is copied instead of regenerated.
+    """
+    jobs = []
+    skipped_count = 0
+    error_count = 0
+    invalid_lines = []
+
+    def on_error(file_path, line_num, error):
+        logging.error(f"Skipping invalid JSON on line {line_num} of {file_path}: {error}")
+        invalid_lines.append(line_num)
+
+    for line_num, prompt_data in iter_jsonl(prompts_file_path, on_error):
+        if not isinstance(prompt_data, dict):
+            prompt_data = {}
+        product_id = prompt_data.get("id")
+        prompt = prompt_data.get("prompt")
+        family = prompt_data.get("family")
+        if not all([product_id, prompt, family]):
+            logging.warning(f"Skipping invalid prompt entry on line {line_num} (missing id, prompt, or family).")
+            error_count += 1
+            continue
+
+        # Sanitize family name for directory path and construct path
+        output_subdir = os.path.join(PRODUCTS_ROOT_DIR, sanitize_filename(family), "images")
+        save_path = os.path.join(output_subdir, f"{sanitize_filename(product_id)}.png")
+
+        # Create the directory if it doesn't exist
+        try:
+            os.makedirs(output_subdir, exist_ok=True)
+        except OSError as e:
+            logging.error(f"Failed to create directory {output_subdir}: {e}. Skipping product {product_id}.")
+            error_count += 1
+            continue
+
+        digest = prompt_hash(prompt)
+        if manifest.is_current(save_path, digest):
+            skipped_count += 1
+            continue
+
+        entry = manifest.get(save_path)
+        if entry is None and os.path.exists(save_path):
+            # Generated before prompt hashes were recorded: adopt it rather than paying for a new image
+            logging.info(f"Recording existing image {save_path} as generated from its current prompt.")
+            manifest.record(save_path, product_id, digest)
+            skipped_count += 1
+            continue
+
+        previous_image = None if os.path.exists(save_path) else manifest.find_image(digest)
+        if previous_image:
+            shutil.copyfile(previous_image, save_path)
+            manifest.record(save_path, product_id, digest)
+            logging.info(f"Copied {previous_image} to {save_path}; it was generated from the same prompt.")
+            skipped_count += 1
+            continue
+
+        if entry and os.path.exists(save_path):
+            logging.info(f"Prompt for {product_id} changed since {save_path} was generated; regenerating.")
+        jobs.append({"id": product_id, "prompt": prompt, "family": family, "save_path": save_path, "prompt_hash": digest})
+    error_count += len(invalid_lines)
+    return jobs, skipped_count, error_count
+
+async def process_job(job: dict, client: AsyncOpenAI, http_client: httpx.AsyncClient,
+                      limiter: TokenBucket, semaphore: asyncio.Semaphore, manifest: PromptManifest) -> bool:
+    """
+    Generates and downloads one image. Only the generation holds the semaphore, so the
+    download streams while the next prompt is already being generated. The prompt hash
+    is recorded (and the manifest saved) as soon as the image is on disk.
+    """
+    async with semaphore:
+        logging.info(f"Generating image for ID: {job['id']}, Family: {job['family']}")
+        # The whole retry chain, including rate-limit waits and backoff
+        with timer("stage_seconds", stage="generate", family=job['family']):
+            image_url = await call_dalle_api(client, job['prompt'], limiter)
+    if not image_url:
+        count("images", family=job['family'], outcome="failed")
+        return False # API call failed after retries
+    with timer("stage_seconds", stage="download", family=job['family']):
+        downloaded = await download_image(http_client, image_url, job['save_path'])
+    if not downloaded:
+        count("images", family=job['family'], outcome="failed")
+        return False
+    count("images", family=job['family'], outcome="generated")
+    manifest.record(job['save_path'], job['id'], job['prompt_hash'])
+    manifest.save()
+    return True
+
+async def run_jobs(jobs: list[dict], concurrency: int, images_per_minute: float, manifest: PromptManifest) -> tuple[int, int]:
+    """Runs all jobs concurrently and returns (processed_count, error_count)."""
+    client = AsyncOpenAI(api_key=API_KEY, max_retries=0) # Retries are handled here, with backoff
+    limiter = TokenBucket(images_per_minute)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(timeout=60, follow_redirects=True) as http_client:
+        results = await asyncio.gather(
+            *(process_job(job, client, http_client, limiter, semaphore, manifest) for job in jobs),
+            return_exceptions=True,
+        )
+    await client.close()
+
+    processed_count = 0
+    error_count = 0
+    for job, result in zip(jobs, results):
+        if result is True:
+            processed_count += 1
+        else:
+            if isinstance(result, Exception):
+                logging.error(f"Unexpected error processing {job['id']}: {result}")
+            error_count += 1
+    return processed_count, error_count
+
 # --- Main Execution ---
 
-def main():
+def main(concurrency: int = MAX_CONCURRENT_REQUESTS, images_per_minute: float = IMAGES_PER_MINUTE):
     if not API_KEY:
         logging.error("Error: OPENAI_API_KEY not found in .env file.")
         return
@@ -94,96 +276,41 @@ def main():
         logging.error(f"Error: Prompts file not found at {PROMPTS_FILE_PATH}")
         return
 
+    manifest = PromptManifest(PROMPT_MANIFEST_PATH)
     try:
-        client = OpenAI(api_key=API_KEY)
+        jobs, skipped_count, error_count = load_jobs(PROMPTS_FILE_PATH, manifest)
     except Exception as e:
-        logging.error(f"Failed to initialize OpenAI client: {e}")
+        logging.error(f"Failed to read prompts from {PROMPTS_FILE_PATH}: {e}")
         return
+    manifest.save()
 
+    logging.info(f"{len(jobs)} image(s) to generate with concurrency {concurrency} at {images_per_minute} images/minute.")
     processed_count = 0
-    skipped_count = 0
-    error_count = 0
-    total_prompts = 0
-
-    try:
-        with open(PROMPTS_FILE_PATH, 'r') as f:
-            prompts_to_process = list(f) # Read all lines into memory
-            total_prompts = len(prompts_to_process)
-            logging.info(f"Found {total_prompts} prompts in {PROMPTS_FILE_PATH}")
-
-            for i, line in enumerate(prompts_to_process):
-                current_prompt_num = i + 1
-                logging.info(f"--- Processing prompt {current_prompt_num}/{total_prompts} ---")
-                try:
-                    prompt_data = json.loads(line.strip())
-                    product_id = prompt_data.get("id")
-                    prompt = prompt_data.get("prompt")
-                    family = prompt_data.get("family")
-
-                    if not all([product_id, prompt, family]):
-                        logging.warning(f"Skipping invalid prompt entry (missing id, prompt, or family): {line.strip()}")
-                        error_count += 1
-                        continue
-
-                    # Sanitize family name for directory path and construct path
-                    sanitized_family = sanitize_filename(family)
-                    output_subdir = os.path.join(PRODUCTS_ROOT_DIR, sanitized_family, "images")
-                    save_filename = f"{sanitize_filename(product_id)}.png"
-                    save_path = os.path.join(output_subdir, save_filename)
-
-                    # Create the directory if it doesn't exist
-                    try:
-                        os.makedirs(output_subdir, exist_ok=True)
-                    except OSError as e:
-                        logging.error(f"Failed to create directory {output_subdir}: {e}. Skipping product {product_id}.")
-                        error_count += 1
-                        continue
-
-                    # Check if image already exists
-                    if os.path.exists(save_path):
-                        logging.info(f"Image already exists at {save_path}, skipping generation.")
-                        skipped_count += 1
-                        continue
-
-                    logging.info(f"Generating image for ID: {product_id}, Family: {family}")
-                    # logging.debug(f"Prompt: {prompt}") # Optional: Log full prompt if needed
-
-                    image_url = call_dalle_api(client, prompt)
-
-                    if image_url:
-                        if download_image(image_url, save_path):
-                            processed_count += 1
-                        else:
-                            error_count += 1 # Download failed after retries
-                    else:
-                        error_count += 1 # API call failed after retries
-
-                    # Add a delay before the next prompt, even if skipped or errored, to respect API limits
-                    if current_prompt_num < total_prompts: # Don't sleep after the last one
-                        logging.info(f"Waiting for {REQUEST_DELAY_SECONDS} seconds before next prompt...")
-                        time.sleep(REQUEST_DELAY_SECONDS)
-
-                except json.JSONDecodeError:
-                    logging.error(f"Skipping invalid JSON line: {line.strip()}")
-                    error_count += 1
-                except Exception as e:
-                    logging.error(f"Unexpected error processing prompt line: {line.strip()}. Error: {e}")
-                    error_count += 1
-                    # Optional: Add a small delay even on unexpected errors
-                    time.sleep(1)
-
-    except FileNotFoundError:
-        logging.error(f"Error: Prompts file not found at {PROMPTS_FILE_PATH}")
-        return
-    except Exception as e:
-        logging.error(f"An unexpected error occurred during the main processing loop: {e}")
-        return
+    if jobs:
+        try:
+            processed_count, job_errors = asyncio.run(run_jobs(jobs, concurrency, images_per_minute, manifest))
+            error_count += job_errors
+        except Exception as e:
+            logging.error(f"An unexpected error occurred during image generation: {e}")
+            return
 
     logging.info("--- Image Generation Complete ---")
     logging.info(f"Successfully generated images: {processed_count}")
-    logging.info(f"Skipped (already existing): {skipped_count}")
+    logging.info(f"Skipped (prompt unchanged): {skipped_count}")
     logging.info(f"Errors encountered: {error_count}")
     logging.info(f"Total prompts processed: {processed_count + skipped_count + error_count}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate product images from image-prompts.jsonl with DALL-E.")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENT_REQUESTS,
+                        help=f"Image generations in flight at once (default: {MAX_CONCURRENT_REQUESTS}).")
+    parser.add_argument("--images-per-minute", type=float, default=IMAGES_PER_MINUTE,
+                        help=f"Rate limit for generation requests (default: {IMAGES_PER_MINUTE}).")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1.")
+    if args.images_per_minute <= 0:
+        parser.error("--images-per-minute must be greater than 0.")
+    main(concurrency=args.concurrency, images_per_minute=args.images_per_minute)
+    report_metrics(args)
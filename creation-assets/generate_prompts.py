@@ -1,7 +1,11 @@
 import os
 import json
 import logging
-import glob
+import argparse
+from catalog import Product, catalog_files, iter_jsonl, iter_products
+from prompt_manifest import PROMPT_MANIFEST_PATH, PromptManifest, prompt_hash
+from metrics import add_metrics_arguments, count, report_metrics, timer
+from profiling import add_profile_arguments, profiled
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -9,17 +13,18 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # --- Configuration ---
 PRODUCTS_ROOT_DIR = "products"
 OUTPUT_PROMPTS_FILE = "image-prompts.jsonl"
+PROMPT_FIELDS = ('_id', 'name', 'description', 'tags', 'attributes', 'product_type', 'family')
 
 # --- Helper Function (from previous script, slightly adapted) ---
 
-def generate_prompt(product_data: dict) -> str:
+def generate_prompt(product: Product) -> str:
     """Generates a detailed prompt for DALL-E based on product data."""
-    name = product_data.get("name", "Unnamed Product")
-    description = product_data.get("description", "")
-    tags = product_data.get("tags", [])
-    attributes = product_data.get("attributes", {})
-    product_type = product_data.get("product_type", "product")
-    family = product_data.get("family", "General") # Use family in prompt if available
+    name = product.name or "Unnamed Product"
+    description = product.description or ""
+    tags = product.tags or ()
+    attributes = product.attributes or {}
+    product_type = product.product_type or "product"
+    family = product.family or "General" # Use family in prompt if available
 
     # Key elements for the prompt
     prompt_elements = [
@@ -56,6 +61,26 @@ def generate_prompt(product_data: dict) -> str:
 
     return " ".join(prompt_elements)
 
+def read_previous_prompts(file_path: str) -> dict:
+    """Returns {id: prompt entry} from an existing prompts file, or {} if there is none."""
+    if not os.path.exists(file_path):
+        return {}
+    return {entry.get("id"): entry for _, entry in iter_jsonl(file_path) if isinstance(entry, dict)}
+
+def diff_prompts(previous: dict, prompts_data: list[dict]) -> tuple[list[str], list[str], list[str]]:
+    """Returns the (new, changed, removed) product IDs between the previous and the current prompts."""
+    current_ids = {entry["id"] for entry in prompts_data}
+    new_ids = [entry["id"] for entry in prompts_data if entry["id"] not in previous]
+    changed_ids = [entry["id"] for entry in prompts_data if entry["id"] in previous and previous[entry["id"]] != entry]
+    removed_ids = [product_id for product_id in previous if product_id not in current_ids]
+    return new_ids, changed_ids, removed_ids
+
+def stale_images(prompts_data: list[dict], manifest: PromptManifest) -> list[str]:
+    """IDs whose recorded image hash differs from the current prompt (images generate_images_from_prompts.py will redo)."""
+    recorded = {image.get("id"): image.get("prompt_hash") for image in manifest.entries.values()}
+    return [entry["id"] for entry in prompts_data
+            if entry["id"] in recorded and recorded[entry["id"]] != prompt_hash(entry["prompt"])]
+
 # --- Main Execution ---
 
 def main():
@@ -65,7 +90,7 @@ def main():
     error_count = 0
 
     # Find all products.jsonl files recursively
-    product_files = glob.glob(os.path.join(PRODUCTS_ROOT_DIR, '**', 'products.jsonl'), recursive=True)
+    product_files = catalog_files(os.path.join('**', 'products.jsonl'), PRODUCTS_ROOT_DIR)
 
     if not product_files:
         logging.warning(f"No 'products.jsonl' files found under {PRODUCTS_ROOT_DIR}")
@@ -83,37 +108,35 @@ def main():
             logging.warning(f"Could not determine family name for {filepath}. Using 'unknown'.")
             family_name = "unknown"
 
-        try:
-            with open(filepath, 'r') as f:
-                for i, line in enumerate(f):
-                    line_num = i + 1
-                    try:
-                        product = json.loads(line.strip())
-                        product_id = product.get("id")
+        def on_error(file_path, line_num, error):
+            nonlocal error_count
+            logging.error(f"Skipping invalid JSON line in {file_path} (Line {line_num}): {error}")
+            error_count += 1
 
-                        if not product_id:
-                            logging.warning(f"Skipping product with missing 'id' in {filepath} (Line {line_num})")
-                            error_count += 1
-                            continue
+        try:
+            for line_num, product in iter_products(filepath, fields=PROMPT_FIELDS, on_error=on_error):
+                try:
+                    if not product.id:
+                        logging.warning(f"Skipping product with missing '_id' in {filepath} (Line {line_num})")
+                        error_count += 1
+                        continue
 
-                        # Use family from data if present, otherwise use directory-derived name
-                        final_family_name = product.get("family", family_name)
+                    # Use family from data if present, otherwise use directory-derived name
+                    final_family_name = product.family or family_name
 
+                    with timer("stage_seconds", stage="generate_prompt", family=final_family_name):
                         prompt = generate_prompt(product)
 
-                        prompts_data.append({
-                            "id": product_id,
-                            "prompt": prompt,
-                            "family": final_family_name
-                        })
-                        total_products += 1
+                    prompts_data.append({
+                        "id": product.id,
+                        "prompt": prompt,
+                        "family": final_family_name
+                    })
+                    total_products += 1
 
-                    except json.JSONDecodeError:
-                        logging.error(f"Skipping invalid JSON line in {filepath} (Line {line_num}): {line.strip()}")
-                        error_count += 1
-                    except Exception as e:
-                        logging.error(f"Error processing product line in {filepath} (Line {line_num}): {e}")
-                        error_count += 1
+                except Exception as e:
+                    logging.error(f"Error processing product line in {filepath} (Line {line_num}): {e}")
+                    error_count += 1
 
         except FileNotFoundError:
             logging.error(f"File not found during processing loop (should not happen): {filepath}")
@@ -122,15 +145,29 @@ def main():
             logging.error(f"Error reading file {filepath}: {e}")
             error_count += 1
 
-    # Write prompts to the output file
+    # Write prompts to the output file, only when they differ from the previous run
     if prompts_data:
         try:
-            with open(OUTPUT_PROMPTS_FILE, 'w') as outfile:
-                for entry in prompts_data:
-                    json.dump(entry, outfile)
-                    outfile.write('\n')
-            logging.info(f"Successfully generated {len(prompts_data)} prompts.")
-            logging.info(f"Output written to: {OUTPUT_PROMPTS_FILE}")
+            new_ids, changed_ids, removed_ids = diff_prompts(read_previous_prompts(OUTPUT_PROMPTS_FILE), prompts_data)
+            for change, ids in (("new", new_ids), ("changed", changed_ids), ("removed", removed_ids)):
+                count("prompts", len(ids), change=change)
+            logging.info(f"Successfully generated {len(prompts_data)} prompts: {len(new_ids)} new, {len(changed_ids)} changed, {len(removed_ids)} removed.")
+            for label, ids in (("New", new_ids), ("Changed", changed_ids), ("Removed", removed_ids)):
+                if ids:
+                    logging.info(f"{label}: {', '.join(ids)}")
+            if new_ids or changed_ids or removed_ids or not os.path.exists(OUTPUT_PROMPTS_FILE):
+                tmp_path = f"{OUTPUT_PROMPTS_FILE}.tmp"
+                with open(tmp_path, 'w') as outfile:
+                    for entry in prompts_data:
+                        json.dump(entry, outfile)
+                        outfile.write('\n')
+                os.replace(tmp_path, OUTPUT_PROMPTS_FILE)
+                logging.info(f"Output written to: {OUTPUT_PROMPTS_FILE}")
+            else:
+                logging.info(f"{OUTPUT_PROMPTS_FILE} is up to date; not rewritten.")
+            stale = stale_images(prompts_data, PromptManifest(PROMPT_MANIFEST_PATH))
+            if stale:
+                logging.info(f"{len(stale)} image(s) were generated from an older prompt and will be regenerated: {', '.join(stale)}")
         except IOError as e:
             logging.error(f"Failed to write prompts to {OUTPUT_PROMPTS_FILE}: {e}")
             error_count += 1
@@ -142,4 +179,10 @@ def main():
     logging.info(f"Errors encountered: {error_count}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate image-prompts.jsonl from products/*/products.jsonl.")
+    add_metrics_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    with profiled(args):
+        main()
+    report_metrics(args) 
\ No newline at end of file
@@ -0,0 +1,218 @@
+import os
+import io
+import glob
+import json
+import hashlib
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from metrics import add_metrics_arguments, count, report_metrics, timer
+
+try:
+    from PIL import Image, features
+except ImportError: # Pillow is only needed when derivatives actually have to be rendered
+    Image = None
+    features = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# --- Configuration ---
+PUBLIC_DIR = "../public" # Served as the web root by server.js; relative to creation-assets
+SOURCE_PATTERNS = ("images/*.png", "images/products/*.png") # Relative to PUBLIC_DIR
+DERIVED_DIR = "images/derived" # Relative to PUBLIC_DIR; file names are content-hashed, so they can be cached forever
+MANIFEST_PATH = "images/image-manifest.json" # Relative to PUBLIC_DIR; read by server.js
+MANIFEST_FORMAT = 1
+WIDTHS = (160, 320, 480, 640, 1024, 1280, 1792) # Only widths up to the source width are produced
+FORMATS = {
+    # MIME type -> (file extension, Pillow format, save options)
+    "image/avif": ("avif", "AVIF", {"quality": 55, "speed": 6}),
+    "image/webp": ("webp", "WEBP", {"quality": 80, "method": 6}),
+}
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+def file_sha256(path: str) -> str:
+    """sha256 of a file's bytes, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def settings_key(widths, formats) -> str:
+    """Hash of everything besides the source that affects the output, so changing it re-renders."""
+    settings = {"widths": list(widths), "formats": {mime: FORMATS[mime] for mime in formats}}
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+def available_formats() -> list[str]:
+    """MIME types from FORMATS that this Pillow build can encode (AVIF needs Pillow >= 11.2 or pillow-avif-plugin)."""
+    if Image is None:
+        return []
+    if not features.check('avif'):
+        try:
+            import pillow_avif # noqa: F401 - registers the AVIF plugin
+        except ImportError:
+            pass
+    Image.init()
+    return [mime for mime, (_, pil_format, _) in FORMATS.items() if pil_format in Image.SAVE]
+
+def source_url(public_dir: str, source_path: str) -> str:
+    """Maps a file under the web root to the URL the app uses for it (the `image_url` of a product)."""
+    return '/' + os.path.relpath(source_path, public_dir).replace(os.sep, '/')
+
+def render_derivatives(source_path: str, source_hash: str, public_dir: str, widths, formats) -> dict:
+    """
+    Renders every width/format variant of one image and returns its manifest entry.
+    Runs in a worker process. Each file is named after a hash of its own bytes.
+    """
+    out_dir = os.path.join(public_dir, DERIVED_DIR)
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    with Image.open(source_path) as image:
+        image.load()
+        width, height = image.size
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        targets = sorted({w for w in widths if w < width} | {min(width, max(widths))})
+
+        variants = {mime: [] for mime in formats}
+        for target_width in targets:
+            target_height = round(height * target_width / width)
+            resized = image if target_width == width else image.resize((target_width, target_height), Image.LANCZOS)
+            for mime in formats:
+                extension, pil_format, options = FORMATS[mime]
+                buffer = io.BytesIO()
+                resized.save(buffer, pil_format, **options)
+                data = buffer.getvalue()
+                name = f"{stem}-{target_width}w.{hashlib.sha256(data).hexdigest()[:12]}.{extension}"
+                path = os.path.join(out_dir, name)
+                if not os.path.exists(path):
+                    tmp_path = f"{path}.tmp"
+                    with open(tmp_path, 'wb') as f:
+                        f.write(data)
+                    os.replace(tmp_path, path)
+                variants[mime].append({"url": source_url(public_dir, path), "width": target_width, "bytes": len(data)})
+
+    return {
+        "source_hash": source_hash,
+        "width": width,
+        "height": height,
+        "source_bytes": os.path.getsize(source_path),
+        "variants": variants,
+        "srcset": {mime: ", ".join(f"{v['url']} {v['width']}w" for v in items) for mime, items in variants.items()},
+    }
+
+def load_manifest(path: str) -> dict:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("format") == MANIFEST_FORMAT:
+            return manifest
+        logging.warning(f"Ignoring {path}: unsupported manifest format {manifest.get('format')}.")
+    except FileNotFoundError:
+        pass
+    except ValueError as e:
+        logging.warning(f"Ignoring unreadable manifest {path}: {e}")
+    return {"format": MANIFEST_FORMAT, "images": {}}
+
+def save_manifest(path: str, manifest: dict):
+    """Atomically writes the manifest (temp file + os.replace)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def is_current(entry: dict | None, source_hash: str, settings: str, public_dir: str) -> bool:
+    """True if the manifest entry was rendered from this source with these settings and its files still exist."""
+    if not entry or entry.get("source_hash") != source_hash or entry.get("settings") != settings:
+        return False
+    return all(os.path.exists(os.path.join(public_dir, v["url"].lstrip('/')))
+               for items in entry["variants"].values() for v in items)
+
+def remove_unreferenced(public_dir: str, manifest: dict) -> int:
+    """Deletes derived files no manifest entry points to (left over from changed sources or settings)."""
+    referenced = {v["url"] for entry in manifest["images"].values() for items in entry["variants"].values() for v in items}
+    removed = 0
+    for path in glob.glob(os.path.join(public_dir, DERIVED_DIR, "*")):
+        if source_url(public_dir, path) not in referenced:
+            os.remove(path)
+            removed += 1
+    return removed
+
+def build_derivatives(public_dir: str = PUBLIC_DIR, widths=WIDTHS, workers: int = DEFAULT_WORKERS, force: bool = False) -> dict:
+    """
+    Renders responsive WebP/AVIF variants for every source image under `public_dir` in a
+    process pool and updates the manifest mapping each image URL to its srcset. Images whose
+    source hash (and the rendering settings) haven't changed are skipped.
+    Returns the manifest.
+    """
+    manifest_file = os.path.join(public_dir, MANIFEST_PATH)
+    manifest = load_manifest(manifest_file)
+    previous = manifest["images"]
+
+    sources = sorted({path for pattern in SOURCE_PATTERNS for path in glob.glob(os.path.join(public_dir, pattern))})
+    formats = available_formats()
+    settings = settings_key(widths, formats)
+
+    images = {}
+    jobs = {}
+    for path in sources:
+        url = source_url(public_dir, path)
+        source_hash = file_sha256(path)
+        if not force and is_current(previous.get(url), source_hash, settings, public_dir):
+            images[url] = previous[url]
+        else:
+            jobs[url] = (path, source_hash)
+    logging.info(f"{len(sources)} source image(s): {len(images)} unchanged, {len(jobs)} to render.")
+    count("images", len(images), outcome="unchanged")
+
+    if jobs and not formats:
+        logging.error("Pillow with WebP support is required to render derivatives: pip install pillow")
+        return manifest
+
+    if jobs:
+        os.makedirs(os.path.join(public_dir, DERIVED_DIR), exist_ok=True)
+        logging.info(f"Rendering {', '.join(formats)} at widths {', '.join(map(str, widths))} with {workers} worker(s).")
+        with timer("stage_seconds", stage="render"), ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(render_derivatives, path, source_hash, public_dir, widths, formats): url
+                       for url, (path, source_hash) in jobs.items()}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    logging.error(f"Failed to render {url}: {e}")
+                    count("images", outcome="failed")
+                    if url in previous:
+                        images[url] = previous[url] # Keep serving the previous derivatives
+                    continue
+                entry["settings"] = settings
+                images[url] = entry
+                count("images", outcome="rendered")
+                count("image_bytes", entry["source_bytes"], kind="source")
+                count("image_bytes", sum(v["bytes"] for items in entry["variants"].values() for v in items), kind="derived")
+                smallest = min((v["bytes"] for items in entry["variants"].values() for v in items), default=0)
+                logging.info(f"Rendered {url}: {entry['source_bytes']} bytes -> smallest variant {smallest} bytes.")
+
+    manifest = {"format": MANIFEST_FORMAT, "images": dict(sorted(images.items()))}
+    if jobs or set(previous) != set(images):
+        save_manifest(manifest_file, manifest)
+        logging.info(f"Manifest written to {manifest_file}.")
+    removed = remove_unreferenced(public_dir, manifest)
+    if removed:
+        logging.info(f"Removed {removed} unreferenced derivative file(s).")
+    return manifest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render responsive WebP/AVIF variants of the site images and write their srcset manifest.")
+    parser.add_argument("--public-dir", default=PUBLIC_DIR,
+                        help=f"Web root containing images/ (default: {PUBLIC_DIR}).")
+    parser.add_argument("--widths", type=lambda value: tuple(sorted(int(w) for w in value.split(','))), default=WIDTHS,
+                        help=f"Comma-separated target widths (default: {','.join(map(str, WIDTHS))}).")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Worker processes (default: {DEFAULT_WORKERS}).")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-render every image even if its source hash is unchanged.")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    build_derivatives(public_dir=args.public_dir, widths=args.widths, workers=args.workers, force=args.force)
+    report_metrics(args)
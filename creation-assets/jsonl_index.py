@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import mmap
+import bisect
+import logging
+import argparse
+from catalog import DOCUMENT_FILES_GLOB, PRODUCT_FILES_GLOB, catalog_files
+
+try:
+    import orjson
+    _loads = orjson.loads # Parses bytes directly, several times faster than json.loads
+except ImportError:
+    orjson = None
+    _loads = json.loads
+
+INDEX_SUFFIX = ".idx.json" # Sidecar next to each JSONL file: documents.jsonl -> documents.jsonl.idx.json
+INDEX_FORMAT = 1
+
+def index_path(path: str) -> str:
+    return f"{path}{INDEX_SUFFIX}"
+
+def file_signature(path: str) -> tuple[int, int]:
+    """(size, mtime_ns): a sidecar is only trusted while both still match its JSONL file."""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+def scan_offsets(data, id_field: str = "_id") -> dict:
+    """Maps each record's ID to [byte offset, length] of its line (without the newline) in `data`. First occurrence wins."""
+    records = {}
+    offset = 0
+    size = len(data)
+    while offset < size:
+        end = data.find(b"\n", offset)
+        if end == -1:
+            end = size
+        line = data[offset:end]
+        if line.strip():
+            try:
+                record_id = _loads(line).get(id_field)
+            except (ValueError, AttributeError) as e:
+                logging.warning(f"Not indexing invalid JSONL record at byte {offset}: {e}")
+                record_id = None
+            if record_id is not None:
+                if record_id in records:
+                    logging.warning(f"Duplicate {id_field} '{record_id}' at byte {offset}. Keeping first.")
+                else:
+                    records[record_id] = [offset, len(line.rstrip(b"\r"))]
+        offset = end + 1
+    return records
+
+def _map_file(path: str):
+    """Read-only mmap of a file (empty files can't be mapped; they read as b'')."""
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+def save_index(path: str, id_field: str, records: dict, signature: tuple[int, int]):
+    """Atomically writes the sidecar (temp file + os.replace)."""
+    sidecar = index_path(path)
+    tmp_path = f"{sidecar}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"format": INDEX_FORMAT, "id_field": id_field, "size": signature[0], "mtime_ns": signature[1],
+                   "records": records}, f, separators=(',', ':'))
+    os.replace(tmp_path, sidecar)
+
+def load_index(path: str, id_field: str = "_id") -> dict | None:
+    """Returns the sidecar's records if it exists and still matches the JSONL file, otherwise None."""
+    try:
+        with open(index_path(path), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        logging.warning(f"Ignoring unreadable index {index_path(path)}: {e}")
+        return None
+    if (index.get("format") != INDEX_FORMAT or index.get("id_field") != id_field
+            or (index.get("size"), index.get("mtime_ns")) != file_signature(path)):
+        return None
+    return index["records"]
+
+class JsonlIndex:
+    """
+    Random access to the records of one JSONL file by ID. The byte offset and length of every
+    record live in a sidecar file, rebuilt with one scan whenever the JSONL file's size or mtime
+    changes. The file is mmapped and only the requested lines are decoded.
+    """
+
+    def __init__(self, path: str, id_field: str = "_id"):
+        self.path = path
+        self.id_field = id_field
+        self._map = b""
+        self._open()
+
+    def _open(self):
+        self.close()
+        self.signature = file_signature(self.path)
+        self._map = _map_file(self.path)
+        records = load_index(self.path, self.id_field)
+        self.rebuilt = records is None
+        if records is None:
+            records = scan_offsets(self._map, self.id_field)
+            save_index(self.path, self.id_field, records, self.signature)
+        self.records = records
+
+    def refresh(self) -> bool:
+        """Re-opens the file (rebuilding the sidecar) if it changed since it was opened. Returns True if it did."""
+        if file_signature(self.path) == self.signature:
+            return False
+        self._open()
+        return True
+
+    def __contains__(self, record_id) -> bool:
+        return record_id in self.records
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def ids(self) -> list:
+        """Record IDs in file order."""
+        return sorted(self.records, key=lambda record_id: self.records[record_id][0])
+
+    def raw(self, record_id) -> bytes | None:
+        """The record's JSON line (without the newline), or None if the ID isn't in the file."""
+        location = self.records.get(record_id)
+        if location is None:
+            return None
+        offset, length = location
+        return self._map[offset:offset + length]
+
+    def get(self, record_id) -> dict | None:
+        line = self.raw(record_id)
+        return _loads(line) if line is not None else None
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._map = b""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def update_records(path: str, replacements: dict, id_field: str = "_id") -> int:
+    """
+    Replaces the lines of the given records ({ID: JSON line or dict}) without parsing the rest of
+    the file: untouched byte ranges are copied as-is and the sidecar is shifted rather than
+    rebuilt. The file is swapped in atomically. Returns the number of records replaced.
+    """
+    with JsonlIndex(path, id_field) as index:
+        edits = []
+        for record_id, replacement in replacements.items():
+            if record_id not in index:
+                logging.warning(f"'{record_id}' is not in {path}; not updated.")
+                continue
+            if isinstance(replacement, dict):
+                replacement = json.dumps(replacement, ensure_ascii=False)
+            if isinstance(replacement, str):
+                replacement = replacement.encode('utf-8')
+            edits.append((*index.records[record_id], record_id, replacement.rstrip(b"\r\n")))
+        if not edits:
+            return 0
+        edits.sort()
+
+        records = {}
+        edit_offsets = [] # Old offsets of the edited lines, ascending
+        shifts = [] # Size change of the file up to and including each edit
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            position = shift = 0
+            for offset, length, record_id, line in edits:
+                f.write(index._map[position:offset])
+                f.write(line)
+                records[record_id] = [offset + shift, len(line)]
+                position = offset + length
+                shift += len(line) - length
+                edit_offsets.append(offset)
+                shifts.append(shift)
+            f.write(index._map[position:])
+            f.flush()
+            os.fsync(f.fileno())
+
+        for record_id, (offset, length) in index.records.items():
+            if record_id not in records:
+                preceding = bisect.bisect_left(edit_offsets, offset)
+                records[record_id] = [offset + (shifts[preceding - 1] if preceding else 0), length]
+    os.replace(tmp_path, path)
+    save_index(path, id_field, records, file_signature(path))
+    return len(edits)
+
+class CatalogRecords:
+    """Looks up products and documents by `_id` across every catalog file under `root`, through their sidecars."""
+
+    def __init__(self, root: str = "."):
+        self.indexes = [JsonlIndex(path) for pattern in (PRODUCT_FILES_GLOB, DOCUMENT_FILES_GLOB)
+                        for path in catalog_files(pattern, root)]
+
+    def find(self, record_id) -> tuple[str, dict] | None:
+        """(file path, record) for the ID, or None."""
+        for index in self.indexes:
+            record = index.get(record_id)
+            if record is not None:
+                return index.path, record
+        return None
+
+    def close(self):
+        for index in self.indexes:
+            index.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build byte-offset sidecar indexes for the catalog JSONL files, or fetch records by _id.")
+    parser.add_argument("ids", nargs="*", help="Record _ids to print as JSON lines (default: just build/refresh the indexes).")
+    parser.add_argument("--root", default=".", help="Catalog root holding products/*/ (default: .).")
+    args = parser.parse_args()
+
+    records = CatalogRecords(args.root)
+    if not args.ids:
+        for index in records.indexes:
+            print(f"{index.path}: {len(index)} records ({'rebuilt' if index.rebuilt else 'up to date'})")
+    missing = 0
+    for record_id in args.ids:
+        found = records.find(record_id)
+        if found is None:
+            print(f"Not found: {record_id}", file=sys.stderr)
+            missing += 1
+        else:
+            print(json.dumps(found[1], ensure_ascii=False))
+    records.close()
+    sys.exit(1 if missing else 0)
@@ -0,0 +1,172 @@
+import re
+from collections import deque
+
+# Spans whose IDs must stay verbatim: Markdown links, fenced and inline code, autolinks and bare URLs
+PROTECTED_SPAN_REGEX = re.compile(
+    r'^(`{3,}|~{3,}).*?(?:^\1|\Z)'   # Fenced code block (to the closing fence or the end of the text)
+    r'|(`+)(?:(?!\2).)+?\2'          # Inline code span
+    r'|\[[^\]]*\]\([^)]*\)'          # Markdown link
+    r'|<[a-z][a-z0-9+.-]*:[^\s<>]*>'  # Autolink
+    r'|\b(?:https?|ftp)://[^\s<>]+|\bwww\.[^\s<>]+', # Bare URL
+    re.MULTILINE | re.DOTALL | re.IGNORECASE)
+VERSION_SUFFIX_REGEX = re.compile(r'_v[0-9.]+$', re.IGNORECASE)
+ID_CHAR_REGEX = re.compile(r'[A-Za-z0-9_]')
+# Potential product/document ID references in text - slightly broader than the real ID formats
+CANDIDATE_REGEX = re.compile(r'\b([A-Z]{2,}-[A-Z0-9]{3,}-[0-9]{3}(?:_[A-Z]+(?:_[vV][0-9.]+)?)?)\b', re.IGNORECASE)
+
+class AhoCorasick:
+    """
+    Minimal Aho-Corasick automaton over lowercase keys. `find_all` returns
+    non-overlapping, leftmost-longest matches that sit on ID boundaries.
+    """
+
+    def __init__(self, keys):
+        self.goto = [{}]
+        self.fail = [0]
+        self.terminal = [None] # Key ending exactly at each state
+        for key in keys:
+            self._add(key.lower())
+        self._build()
+
+    def _add(self, key: str):
+        state = 0
+        for char in key:
+            if char not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.terminal.append(None)
+                self.goto[state][char] = len(self.goto) - 1
+            state = self.goto[state][char]
+        self.terminal[state] = key
+
+    def _build(self):
+        # Breadth-first so every failure link points at an already-finished, shallower state
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+
+    def _iter_raw(self, text: str):
+        """Yields (start, end, key) for every key occurrence, including overlapping ones."""
+        state = 0
+        for index, char in enumerate(text.lower()):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            probe = state
+            while probe:
+                key = self.terminal[probe]
+                if key is not None:
+                    yield index + 1 - len(key), index + 1, key
+                probe = self.fail[probe]
+
+    def find_all(self, text: str) -> list[tuple[int, int, str]]:
+        matches = []
+        for start, end, key in self._iter_raw(text):
+            if start > 0 and ID_CHAR_REGEX.match(text[start - 1]):
+                continue
+            if end < len(text) and ID_CHAR_REGEX.match(text[end]):
+                continue
+            matches.append((start, end, key))
+        # Leftmost-longest, non-overlapping
+        matches.sort(key=lambda match: (match[0], -(match[1] - match[0])))
+        selected = []
+        last_end = -1
+        for start, end, key in matches:
+            if start >= last_end:
+                selected.append((start, end, key))
+                last_end = end
+        return selected
+
+def protected_spans(text: str) -> list[tuple[int, int]]:
+    """(start, end) of every span in which IDs are left alone (see PROTECTED_SPAN_REGEX)."""
+    return [match.span() for match in PROTECTED_SPAN_REGEX.finditer(text)]
+
+def _in_path(text: str, start: int) -> bool:
+    """An ID right after a slash is part of a path such as /product/CB-TRK-001, not prose."""
+    return start > 0 and text[start - 1] == '/'
+
+class LinkResolver:
+    """
+    Rewrites unambiguous document and product ID references as Markdown links without an LLM.
+    Exact IDs are matched case-insensitively, and document IDs also match without their
+    version suffix (`CB-TRK-001_TMG` -> `CB-TRK-001_TMG_v1.0`) when only one version exists.
+    """
+
+    def __init__(self, doc_id_to_title: dict, product_id_to_name: dict):
+        self.targets = {} # lowercase key -> (kind, canonical id, label)
+        for prod_id, name in product_id_to_name.items():
+            self.targets[prod_id.lower()] = ('product', prod_id, name)
+        for doc_id, title in doc_id_to_title.items():
+            self.targets[doc_id.lower()] = ('document', doc_id, title)
+
+        versionless = {}
+        for doc_id in doc_id_to_title:
+            stripped = VERSION_SUFFIX_REGEX.sub('', doc_id).lower()
+            if stripped != doc_id.lower():
+                versionless.setdefault(stripped, []).append(doc_id)
+        for stripped, doc_ids in versionless.items():
+            if len(doc_ids) == 1 and stripped not in self.targets:
+                self.targets[stripped] = ('document', doc_ids[0], doc_id_to_title[doc_ids[0]])
+
+        self.automaton = AhoCorasick(self.targets)
+
+    @staticmethod
+    def _link(kind: str, target_id: str, label: str) -> str:
+        return f"[{label}](/{kind}/{target_id})"
+
+    def resolve(self, text: str, current_doc_id: str | None = None) -> tuple[str, int]:
+        """
+        Returns (new_text, replacement_count). References to the current document stay plain text,
+        and IDs inside Markdown links, code, URLs or paths are left alone. `Name (ID)` is replaced as a whole
+        when the text before the parenthesis is exactly the target's title or name; any other
+        parenthesized reference is left unresolved.
+        """
+        link_spans = protected_spans(text)
+        current_id = current_doc_id.lower() if current_doc_id else None
+
+        pieces = []
+        cursor = 0
+        replacements = 0
+        for start, end, key in self.automaton.find_all(text):
+            if _in_path(text, start) or any(span_start <= start < span_end for span_start, span_end in link_spans):
+                continue
+            kind, target_id, label = self.targets[key]
+            if current_id and target_id.lower() == current_id:
+                continue
+
+            replace_start, replace_end = start, end
+            if start > 0 and text[start - 1] == '(' and end < len(text) and text[end] == ')':
+                prefix = text[cursor:start - 1].rstrip()
+                label_start = cursor + len(prefix) - len(label)
+                if not prefix.lower().endswith(label.lower()) or (label_start > 0 and text[label_start - 1].isalnum()):
+                    continue # `Some Name (ID)`: where the phrase starts is a judgement call, left for the LLM
+                replace_start = label_start
+                replace_end = end + 1
+            pieces.append(text[cursor:replace_start])
+            pieces.append(self._link(kind, target_id, label))
+            cursor = replace_end
+            replacements += 1
+        pieces.append(text[cursor:])
+        return "".join(pieces), replacements
+
+def unresolved_lines(text: str, candidate_regex: re.Pattern, current_doc_id: str | None = None) -> list[int]:
+    """
+    Returns the indexes of the lines that still contain an ID-like candidate outside the
+    protected spans resolve() skips (other than the current document's own ID). These are
+    the ambiguous spans left for the LLM.
+    """
+    current_id = current_doc_id.lower() if current_doc_id else None
+    # Blank out protected spans, keeping their newlines so line indexes still line up
+    unprotected = PROTECTED_SPAN_REGEX.sub(lambda match: re.sub(r'[^\n]', ' ', match.group(0)), text)
+    indexes = []
+    for index, line in enumerate(unprotected.split('\n')):
+        if any(match.group(1).lower() != current_id and not _in_path(line, match.start())
+               for match in candidate_regex.finditer(line)):
+            indexes.append(index)
+    return indexes
@@ -1,21 +1,43 @@
 import os
 import json
-import glob
-import re
 import sys
 import time
-from openai import OpenAI, APIError
+import argparse
+import difflib
+import hashlib
+import threading
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+from openai import OpenAI, APIError, RateLimitError
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import logging
+from link_resolver import CANDIDATE_REGEX, LinkResolver, unresolved_lines
+from jsonl_index import JsonlIndex, update_records
+from metrics import add_metrics_arguments, count, family_of, observe, report_metrics, timer
+from profiling import add_profile_arguments, profiled
+from batch_jobs import (
+    LOCAL_BATCH_DIR,
+    TERMINAL_STATUSES,
+    LocalBatchBackend,
+    OpenAIBatchBackend,
+    batch_request,
+    parse_batch_output,
+    write_batch_files,
+)
+from catalog import DOCUMENT_FILES_GLOB, PRODUCT_FILES_GLOB, catalog_files, iter_documents, iter_jsonl, iter_products
 
 # --- Configuration ---
 load_dotenv()
 API_KEY = os.getenv("OPENAI_API_KEY")
 MODEL = "gpt-4o-mini"
-REQUEST_DELAY_SECONDS = 0.15 # Adjust as needed for rate limits
-DOCS_JSONL_PATH_PATTERN = "products/*/documents.jsonl"
-PRODUCTS_JSONL_PATH_PATTERN = "products/*/products.jsonl"
+REQUEST_DELAY_SECONDS = 0.15 # Initial interval between request starts; adapts to rate limits
+MAX_WORKERS = 8 # Concurrent LLM calls
+MAX_RETRIES = 5 # Retries per document after a rate-limit error
+JOURNAL_PATH = ".link-journal.jsonl" # Relative to this script's directory
+BATCH_DIR = ".link-batches" # Batch input files; relative to this script's directory
+BATCH_STATE_PATH = ".link-batches/submitted.json" # Batches awaiting results, so a rerun resumes instead of resubmitting
+BATCH_POLL_SECONDS = 30
 
 # Setup basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -24,40 +46,35 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 class ModifiedTextResponse(BaseModel):
     modified_text: str
 
-# Define the regex to find potential candidates - slightly broader
-CANDIDATE_REGEX = re.compile(r'\b([A-Z]{2,}-[A-Z0-9]{3,}-[0-9]{3}(?:_[A-Z]+(?:_[vV][0-9.]+)?)?)\b', re.IGNORECASE)
+# The same structured output, spelled out for batch request bodies
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "ModifiedTextResponse",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"modified_text": {"type": "string"}},
+            "required": ["modified_text"],
+            "additionalProperties": False,
+        },
+    },
+}
 
 # --- Helper Functions ---
 
-def load_jsonl(file_path):
-    """Loads a JSONL file line by line, yielding parsed dictionaries."""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line_num, line in enumerate(f, 1):
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    yield line_num, json.loads(line)
-                except json.JSONDecodeError as e:
-                    logging.warning(f"Skipping invalid JSON in {file_path} line {line_num}: {e}")
-    except FileNotFoundError:
-        logging.error(f"File not found: {file_path}")
-    except Exception as e:
-        logging.error(f"Error reading file {file_path}: {e}")
-
 def build_maps(script_dir):
     """Builds maps for document IDs/titles and product IDs/names."""
     doc_id_to_title = {}
     product_id_to_name = {}
-    doc_files = glob.glob(os.path.join(script_dir, DOCS_JSONL_PATH_PATTERN), recursive=True)
-    prod_files = glob.glob(os.path.join(script_dir, PRODUCTS_JSONL_PATH_PATTERN), recursive=True)
+    doc_files = catalog_files(DOCUMENT_FILES_GLOB, script_dir)
+    prod_files = catalog_files(PRODUCT_FILES_GLOB, script_dir)
 
     logging.info("Building document ID -> title map...")
     for file_path in doc_files:
-        for _, doc_data in load_jsonl(file_path):
-            doc_id = doc_data.get('_id')
-            doc_title = doc_data.get('title')
+        for _, document in iter_documents(file_path, fields=('_id', 'title')):
+            doc_id = document.id
+            doc_title = document.title
             if doc_id and doc_title:
                 if doc_id in doc_id_to_title and doc_id_to_title[doc_id] != doc_title:
                      logging.warning(f"Duplicate doc _id '{doc_id}' found with different titles. Keeping first.")
@@ -69,13 +86,10 @@ def build_maps(script_dir):
 
     logging.info("Building product ID -> name map...")
     for file_path in prod_files:
-        for _, prod_data in load_jsonl(file_path):
+        for _, product in iter_products(file_path, fields=('_id', 'sku', 'name')):
             # Try to get _id first, then fall back to sku
-            prod_id = prod_data.get('_id')
-            if not prod_id:
-                prod_id = prod_data.get('sku')
-
-            prod_name = prod_data.get('name')
+            prod_id = product.id or product.sku
+            prod_name = product.name
             if prod_id and prod_name:
                 if prod_id in product_id_to_name and product_id_to_name[prod_id] != prod_name:
                     logging.warning(f"Duplicate product id '{prod_id}' found with different names. Keeping first.")
@@ -91,14 +105,7 @@ def build_maps(script_dir):
 
     return doc_id_to_title, product_id_to_name, doc_list_str, product_list_str
 
-def process_files(client, doc_files, doc_id_to_title, product_id_to_name, doc_list_str, product_list_str, script_dir):
-    """Processes each document file, updates links using LLM, and overwrites files."""
-    total_files = len(doc_files)
-    total_updates_overall = 0
-
-    # Construct Prompt Messages (once)
-    system_message = "You are an expert technical writer assistant. Your task is to analyze text and replace references to specific document and product IDs with Markdown links, using the provided lists for accuracy. Respond with the fully modified text."
-    user_message_template = f"""Analyze the following text and replace references to document or product IDs with Markdown links.
+SYSTEM_INSTRUCTIONS = """You are an expert technical writer assistant. Your task is to analyze text and replace references to specific document and product IDs with Markdown links, using the provided lists for accuracy. Respond with the fully modified text.
 
 Instructions:
 1. Use the provided lists (`Known Documents`, `Known Products`) to find the correct title/name for each ID referenced in the `Original Text`.
@@ -107,150 +114,526 @@ Instructions:
 4. If a reference in the text is ambiguous (e.g., missing version like 'LL-MCU-002 FAQ' when the list has 'LL-MCU-002_FAQ_v1.0'), use the most likely match from the list if confidence is high.
 5. **Crucially**: When you identify a reference like `Some Name (ID)` or `(ID) Some Name` or just `ID` that corresponds to an entry in the lists, replace the *entire reference phrase* (e.g., `Some Name (ID)`) with the *single* Markdown link. Do not leave parts of the original reference text around the link. For example, replace `KinetiCore ESP (LL-MCU-002)` entirely with `[IoT Explorer Kit (KinetiCore ESP)](/product/LL-MCU-002)`.
 6. Preserve all surrounding text, whitespace, and existing Markdown formatting accurately.
-7. **Important**: Do NOT create a link for the title or ID of the specific document being processed right now (Current Document ID: `{{current_doc_id}}`, Title: `{{current_doc_title}}`). Leave references to this specific document as plain text.
+7. **Important**: Do NOT create a link for the title or ID of the specific document being processed (given as `Current Document` in the user message). Leave references to this specific document as plain text.
+8. Output the full modified text containing the replacements.
 
 Known Documents:
 ---
-{{doc_list_str}}
+{doc_list_str}
 ---
 
 Known Products:
 ---
-{{product_list_str}}
+{product_list_str}
 ---
+"""
+
+USER_MESSAGE_TEMPLATE = """Current Document ID: `{current_doc_id}`, Title: `{current_doc_title}`
 
 Original Text:
 ---
-{{original_text}}
+{original_text}
 ---
-
-Output the full modified text containing the replacements.
 """
 
-    for file_index, file_path in enumerate(doc_files):
-        rel_path = os.path.relpath(file_path, script_dir)
-        logging.info(f"Processing file {file_index + 1}/{total_files}: {rel_path}")
-        updated_lines = []
-        updates_in_file = 0
-        lines_to_process = []
-
-        # Read all lines first
+class AdaptiveRateLimiter:
+    """
+    Thread-safe pacing of request starts. The interval between requests doubles on a
+    rate-limit error and shrinks gradually after successes (AIMD), so the pool settles
+    just under the provider's real limit.
+    """
+
+    def __init__(self, initial_interval: float = REQUEST_DELAY_SECONDS, min_interval: float = 0.0, max_interval: float = 30.0):
+        self.interval = initial_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.next_start = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        time.sleep(max(0.0, start - now))
+
+    def on_success(self):
+        with self.lock:
+            self.interval = max(self.min_interval, self.interval * 0.9 - 0.005)
+
+    def on_rate_limit(self, retry_after: float | None = None):
+        with self.lock:
+            self.interval = min(self.max_interval, max(self.interval * 2, 0.25))
+            if retry_after:
+                self.next_start = max(self.next_start, time.monotonic() + retry_after)
+
+class UsageStats:
+    """Accumulates per-call token usage and latency across worker threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        self.latencies = []
+
+    def record(self, usage, latency: float) -> tuple[int, int, int]:
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached_tokens = (getattr(details, 'cached_tokens', 0) or 0) if details else 0
+        observe("request_seconds", latency, op="chat.completions", model=MODEL)
+        count("llm_tokens", prompt_tokens - cached_tokens, kind="prompt_uncached")
+        count("llm_tokens", cached_tokens, kind="prompt_cached")
+        count("llm_tokens", completion_tokens, kind="completion")
+        with self.lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+            self.completion_tokens += completion_tokens
+            self.latencies.append(latency)
+        return prompt_tokens, cached_tokens, completion_tokens
+
+    def summary(self) -> str:
+        if not self.calls:
+            return "No LLM calls made."
+        latencies = sorted(self.latencies)
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        cached_pct = 100.0 * self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+        return (f"LLM calls: {self.calls}, prompt tokens: {self.prompt_tokens} ({self.cached_tokens} cached, {cached_pct:.1f}%), "
+                f"completion tokens: {self.completion_tokens}, latency p50: {p50:.2f}s, p95: {p95:.2f}s, max: {latencies[-1]:.2f}s")
+
+class CompletionJournal:
+    """
+    Append-only JSONL journal of completed LLM rewrites keyed by (file, _id, input hash).
+    Every completion is flushed to disk as soon as it arrives, so an interrupted run can be
+    restarted without paying for the same calls again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            for _, entry in iter_jsonl(path):
+                self.entries[(entry['file'], entry['_id'], entry['input_hash'])] = entry['output']
+            logging.info(f"Loaded {len(self.entries)} completed rewrite(s) from journal {path}")
+        self.handle = open(path, 'a', encoding='utf-8')
+        self.reused = 0
+
+    @staticmethod
+    def input_hash(messages: list[dict]) -> str:
+        payload = json.dumps({"model": MODEL, "messages": messages}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, file: str, doc_id: str, input_hash: str) -> str | None:
+        with self.lock:
+            output = self.entries.get((file, doc_id, input_hash))
+            if output is not None:
+                self.reused += 1
+            return output
+
+    def record(self, file: str, doc_id: str, input_hash: str, output: str):
+        entry = {"file": file, "_id": doc_id, "input_hash": input_hash, "output": output}
+        with self.lock:
+            self.entries[(file, doc_id, input_hash)] = output
+            self.handle.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self.handle.flush()
+            os.fsync(self.handle.fileno())
+
+    def close(self):
+        self.handle.close()
+
+class BatchCollector:
+    """Gathers the LLM requests a run would make (those not already journaled) for submission as a batch."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {} # custom_id -> request body
+
+    @staticmethod
+    def custom_id(file: str, doc_id: str, input_hash: str) -> str:
+        return f"{input_hash}:{doc_id}:{file}"
+
+    @staticmethod
+    def parse_custom_id(custom_id: str) -> tuple[str, str, str]:
+        """Returns (file, doc_id, input_hash)."""
+        input_hash, doc_id, file = custom_id.split(':', 2)
+        return file, doc_id, input_hash
+
+    def add(self, file: str, doc_id: str, input_hash: str, messages: list[dict], label: str) -> None:
+        body = {"model": MODEL, "messages": messages, "response_format": RESPONSE_FORMAT}
+        with self.lock:
+            self.requests[self.custom_id(file, doc_id, input_hash)] = body
+        return None # Nothing to apply until the batch completes
+
+class RewriteContext:
+    """
+    Shared, thread-safe state for one rewriting run. `complete(file, doc_id, input_hash, messages, label)`
+    returns the rewritten snippet or None: an interactive LLM call, a BatchCollector that only records
+    the request, or nothing at all when `complete` is None (--no-llm).
+    """
+
+    def __init__(self, complete: Callable | None, system_message: str, resolver: LinkResolver, doc_id_to_title: dict,
+                 journal: CompletionJournal | None):
+        self.complete = complete
+        self.system_message = system_message
+        self.resolver = resolver
+        self.doc_id_to_title = doc_id_to_title
+        self.journal = journal
+
+def build_messages(system_message: str, current_doc_id: str, current_doc_title: str, original_text: str) -> list[dict]:
+    """
+    Builds the chat messages for one document. The large, static catalog lives in the system
+    message so every call shares an identical prompt prefix that provider-side prompt caching can reuse;
+    only the short per-document part at the end varies.
+    """
+    user_message = USER_MESSAGE_TEMPLATE.format(
+        current_doc_id=current_doc_id,
+        current_doc_title=current_doc_title,
+        original_text=original_text,
+    )
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message},
+    ]
+
+def call_llm(client, messages: list[dict], limiter: AdaptiveRateLimiter, stats: UsageStats, label: str) -> str | None:
+    """Calls the model with adaptive pacing and retries on rate limits. Returns the modified text or None."""
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.wait()
+        started = time.monotonic()
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                lines_to_process = f.readlines()
-        except Exception as e:
-            logging.error(f"Could not read file {rel_path}: {e}. Skipping.")
+            completion = client.beta.chat.completions.parse(
+                model=MODEL,
+                messages=messages,
+                response_format=ModifiedTextResponse,
+            )
+        except RateLimitError as e:
+            retry_after = None
+            if getattr(e, 'response', None) is not None:
+                try:
+                    retry_after = float(e.response.headers.get('retry-after'))
+                except (TypeError, ValueError):
+                    pass
+            limiter.on_rate_limit(retry_after)
+            count("retries", op="chat.completions")
+            logging.warning(f"    Rate limited on {label} (attempt {attempt + 1}/{MAX_RETRIES + 1}); request interval now {limiter.interval:.2f}s.")
             continue
+        except APIError as e:
+            logging.error(f"    OpenAI API Error for {label}: {e}. Keeping original.")
+            return None
+        except Exception as e:
+            logging.error(f"    Error during API call/parsing for {label}: {e}. Keeping original.")
+            return None
+
+        latency = time.monotonic() - started
+        limiter.on_success()
+        prompt_tokens, cached_tokens, completion_tokens = stats.record(completion.usage, latency)
+        logging.info(f"    {label}: {latency:.2f}s, prompt tokens {prompt_tokens} ({cached_tokens} cached), completion tokens {completion_tokens}")
+        return completion.choices[0].message.parsed.modified_text
+    logging.error(f"    Giving up on {label} after {MAX_RETRIES + 1} rate-limited attempts. Keeping original.")
+    return None
+
+def rewrite_snippet(ctx: RewriteContext, rel_path: str, current_doc_id: str, current_doc_title: str,
+                    snippet: str, label: str) -> str | None:
+    """Rewrites one ambiguous snippet with the LLM, reusing a journaled completion when the input is unchanged."""
+    messages = build_messages(ctx.system_message, current_doc_id, current_doc_title, snippet)
+    input_hash = CompletionJournal.input_hash(messages)
+    if ctx.journal:
+        output = ctx.journal.get(rel_path, current_doc_id, input_hash)
+        if output is not None:
+            logging.info(f"    {label}: reusing journaled completion.")
+            count("snippets", family=family_of(rel_path), source="journal")
+            return output
+
+    with timer("stage_seconds", stage="llm_rewrite", family=family_of(rel_path)):
+        output = ctx.complete(rel_path, current_doc_id, input_hash, messages, label)
+    if output is not None:
+        count("snippets", family=family_of(rel_path), source="llm")
+    if output is not None and ctx.journal:
+        ctx.journal.record(rel_path, current_doc_id, input_hash, output)
+    return output
+
+def rewrite_line(ctx: RewriteContext, rel_path: str, original_line_content: str, label: str):
+    """
+    Rewrites the links in one JSONL line. Unambiguous IDs are linked locally by the resolver;
+    only lines that still hold an unresolved candidate are sent to the LLM, one small snippet
+    per line (skipped entirely with --no-llm). Returns (line, updated) where `line` is
+    the original line unchanged when there is nothing to do.
+    """
+    stripped_line = original_line_content.strip()
+    if not stripped_line:
+        return original_line_content, False # Keep empty lines
 
-        total_lines_in_file = len(lines_to_process)
-        for line_num, original_line_content in enumerate(lines_to_process, 1):
-            stripped_line = original_line_content.strip()
-            if not stripped_line:
-                updated_lines.append(original_line_content) # Keep empty lines
-                continue
-
+    try:
+        doc_data = json.loads(stripped_line)
+    except json.JSONDecodeError as e:
+        logging.warning(f"  Invalid JSON on {label}: {e}. Keeping original line.")
+        return original_line_content, False
+
+    original_text = doc_data.get('text')
+    current_doc_id = doc_data.get('_id') # For logging and prompt context
+    current_doc_title = ctx.doc_id_to_title.get(current_doc_id, "") # Get current title for prompt context
+
+    if not original_text or not isinstance(original_text, str):
+        return original_line_content, False # Keep line if no text
+
+    # Check for candidates first
+    if not CANDIDATE_REGEX.search(original_text):
+        return original_line_content, False # Keep line if no candidates
+
+    with timer("stage_seconds", stage="resolve", family=family_of(rel_path)):
+        modified_text, resolved_count = ctx.resolver.resolve(original_text, current_doc_id)
+    count("references", resolved_count, family=family_of(rel_path), resolved_by="resolver")
+    if resolved_count:
+        logging.info(f"  {label} (ID: {current_doc_id}): Resolved {resolved_count} reference(s) locally.")
+
+    ambiguous_lines = unresolved_lines(modified_text, CANDIDATE_REGEX, current_doc_id)
+    if ambiguous_lines and ctx.complete is not None:
+        text_lines = modified_text.split('\n')
+        for index in ambiguous_lines:
+            snippet = text_lines[index]
+            snippet_label = f"{label} snippet {index + 1}"
+            logging.info(f"  {snippet_label} (ID: {current_doc_id}): Ambiguous candidates {CANDIDATE_REGEX.findall(snippet)}. Calling LLM...")
+            rewritten = rewrite_snippet(ctx, rel_path, current_doc_id, current_doc_title, snippet, snippet_label)
+            if rewritten:
+                text_lines[index] = rewritten.strip('\n')
+        modified_text = '\n'.join(text_lines)
+    elif ambiguous_lines:
+        logging.info(f"  {label} (ID: {current_doc_id}): {len(ambiguous_lines)} ambiguous line(s) left as-is (--no-llm).")
+
+    # Update the line if modification occurred and was successful
+    if modified_text != original_text:
+        doc_data['text'] = modified_text
+        return json.dumps(doc_data, ensure_ascii=False) + '\n', True
+    return original_line_content, False
+
+def write_lines_atomically(file_path: str, lines: list[str]):
+    """Writes to a temp file in the same directory and swaps it in with os.replace, so the source is never left truncated."""
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+
+def text_diff(rel_path: str, original_line: str, updated_line: str) -> str:
+    """Unified diff of the `text` field of one document, for --dry-run output."""
+    original = json.loads(original_line)
+    updated = json.loads(updated_line)
+    label = f"{rel_path}:{original.get('_id')}"
+    diff = difflib.unified_diff(
+        original.get('text', '').splitlines(),
+        updated.get('text', '').splitlines(),
+        fromfile=f"a/{label}", tofile=f"b/{label}", lineterm='',
+    )
+    return "".join(f"{line}\n" for line in diff)
+
+def process_files(client, doc_files, doc_id_to_title, product_id_to_name, doc_list_str, product_list_str, script_dir,
+                  max_workers: int = MAX_WORKERS, journal: CompletionJournal | None = None, dry_run: bool = False,
+                  collector: BatchCollector | None = None, journal_only: bool = False, only_ids: set | None = None):
+    """
+    Processes every document file with one shared worker pool, links unambiguous IDs locally,
+    resolves the remaining ambiguous spans with the LLM (unless `client` is None),
+    and atomically overwrites each file once all of its lines are done.
+    With `dry_run`, prints a diff of every change instead of writing.
+    With a `collector`, only records the LLM requests still missing from the journal and writes nothing;
+    with `journal_only`, ambiguous spans are taken from the journal alone (the apply pass of batch mode).
+    With `only_ids`, just those documents are read (through the files' byte-offset indexes) and rewritten in place.
+    """
+    total_files = len(doc_files)
+    total_updates_overall = 0
+    system_message = SYSTEM_INSTRUCTIONS.format(doc_list_str=doc_list_str, product_list_str=product_list_str)
+    stats = UsageStats()
+    limiter = AdaptiveRateLimiter()
+    if collector is not None:
+        complete = collector.add
+    elif journal_only:
+        complete = lambda file, doc_id, input_hash, messages, label: None
+    elif client is not None:
+        complete = lambda file, doc_id, input_hash, messages, label: call_llm(client, messages, limiter, stats, label)
+    else:
+        complete = None
+    ctx = RewriteContext(complete, system_message, LinkResolver(doc_id_to_title, product_id_to_name),
+                         doc_id_to_title, journal)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Submit the lines of every file up front so the pool stays busy across file boundaries
+        file_futures = []
+        for file_index, file_path in enumerate(doc_files):
+            rel_path = os.path.relpath(file_path, script_dir)
+            selected_ids = None
             try:
-                doc_data = json.loads(stripped_line)
-                original_text = doc_data.get('text')
-                current_doc_id = doc_data.get('_id') # For logging and prompt context
-                current_doc_title = doc_id_to_title.get(current_doc_id, "") # Get current title for prompt context
-
-                if not original_text or not isinstance(original_text, str):
-                    updated_lines.append(original_line_content) # Keep line if no text
-                    continue
-
-                # Check for candidates first
-                candidates = CANDIDATE_REGEX.findall(original_text)
-                if not candidates:
-                    updated_lines.append(original_line_content) # Keep line if no candidates
-                    continue
-
-                # Log progress within the file
-                logging.info(f"  File {rel_path} - Line {line_num}/{total_lines_in_file} (ID: {current_doc_id}): Found candidates {candidates}. Calling LLM...")
-
-                # Format the user message for this specific text
-                user_message = user_message_template.format(
-                    doc_list_str=doc_list_str,
-                    product_list_str=product_list_str,
-                    original_text=original_text,
-                    current_doc_id=current_doc_id,      # Pass current doc info
-                    current_doc_title=current_doc_title # Pass current doc info
-                )
-
-                modified_text = None
-                try:
-                    completion = client.beta.chat.completions.parse(
-                        model=MODEL,
-                        messages=[
-                            {"role": "system", "content": system_message},
-                            {"role": "user", "content": user_message}
-                        ],
-                        response_format=ModifiedTextResponse,
-                    )
-                    parsed_response = completion.choices[0].message.parsed
-                    modified_text = parsed_response.modified_text
-                    logging.debug(f"    LLM call successful for line {line_num} in {rel_path}")
-
-                except APIError as e:
-                    logging.error(f"    OpenAI API Error for line {line_num} in {rel_path}: {e}. Keeping original.")
-                except Exception as e:
-                     logging.error(f"    Error during API call/parsing for line {line_num} in {rel_path}: {e}. Keeping original.")
-
-                # Add a delay regardless of success/failure
-                time.sleep(REQUEST_DELAY_SECONDS)
-
-                # Update the line if modification occurred and was successful
-                if modified_text and modified_text != original_text:
-                    doc_data['text'] = modified_text
-                    updated_json_line = json.dumps(doc_data, ensure_ascii=False) + '\n'
-                    updated_lines.append(updated_json_line)
-                    updates_in_file += 1
-                    total_updates_overall += 1
-                    logging.info(f"    Line {line_num} updated.")
+                if only_ids is not None:
+                    with JsonlIndex(file_path) as index:
+                        selected_ids = [doc_id for doc_id in index.ids() if doc_id in only_ids]
+                        lines_to_process = [index.raw(doc_id).decode('utf-8') + '\n' for doc_id in selected_ids]
+                    if not selected_ids:
+                        continue
                 else:
-                    updated_lines.append(original_line_content) # Keep original if no change or error
-                    if modified_text == original_text:
-                         logging.debug(f"    Line {line_num} returned identical text.")
-
-            except json.JSONDecodeError as e:
-                logging.warning(f"  Invalid JSON on line {line_num} of {rel_path}: {e}. Keeping original line.")
-                updated_lines.append(original_line_content)
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        lines_to_process = f.readlines()
             except Exception as e:
-                logging.error(f"  Unexpected error processing line {line_num} of {rel_path}: {e}. Keeping original line.")
-                updated_lines.append(original_line_content)
-
-        # Overwrite the original file with the updated lines
-        if updates_in_file > 0:
-            logging.info(f"Writing {updates_in_file} updates to {rel_path}...")
-            try:
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.writelines(updated_lines)
-                logging.info(f"Successfully wrote updates to {rel_path}.")
-            except Exception as e:
-                logging.error(f"Failed to write updates to {rel_path}: {e}")
-        else:
-            logging.info(f"No updates made to {rel_path}.")
+                logging.error(f"Could not read file {rel_path}: {e}. Skipping.")
+                continue
+            logging.info(f"Queued file {file_index + 1}/{total_files}: {rel_path} ({len(lines_to_process)} lines)")
+            total_lines_in_file = len(lines_to_process)
+            futures = [
+                executor.submit(rewrite_line, ctx, rel_path, line, f"File {rel_path} - Line {line_num}/{total_lines_in_file}")
+                for line_num, line in enumerate(lines_to_process, 1)
+            ]
+            file_futures.append((file_path, rel_path, lines_to_process, futures, selected_ids))
+
+        for file_path, rel_path, lines_to_process, futures, selected_ids in file_futures:
+            updated_lines = []
+            updates_in_file = 0
+            for original_line_content, future in zip(lines_to_process, futures):
+                try:
+                    line, updated = future.result()
+                except Exception as e:
+                    logging.error(f"  Unexpected error processing a line of {rel_path}: {e}. Keeping original line.")
+                    line, updated = original_line_content, False
+                updated_lines.append(line)
+                updates_in_file += updated
+                if updated and dry_run and collector is None:
+                    print(text_diff(rel_path, original_line_content, line), end='')
+            total_updates_overall += updates_in_file
+            if collector is not None:
+                continue # Written by the apply pass once the batch results are journaled
+
+            # Overwrite the original file with the updated lines
+            if updates_in_file > 0 and dry_run:
+                logging.info(f"Dry run: {updates_in_file} update(s) to {rel_path} not written.")
+            elif updates_in_file > 0:
+                logging.info(f"Writing {updates_in_file} updates to {rel_path}...")
+                try:
+                    if selected_ids is not None:
+                        update_records(file_path, dict(zip(selected_ids, updated_lines)))
+                    else:
+                        write_lines_atomically(file_path, updated_lines)
+                    logging.info(f"Successfully wrote updates to {rel_path}.")
+                except Exception as e:
+                    logging.error(f"Failed to write updates to {rel_path}: {e}")
+            else:
+                logging.info(f"No updates made to {rel_path}.")
 
+    if collector is not None:
+        logging.info(f"Collected {len(collector.requests)} LLM request(s) not yet in the journal.")
+        return
     logging.info(f"\nProcessing complete. Total updates made across all files: {total_updates_overall}")
-
-
-def main():
-    if not API_KEY:
-        logging.error("OPENAI_API_KEY not found in .env file or environment variables.")
+    logging.info(stats.summary())
+    if journal:
+        logging.info(f"Reused {journal.reused} journaled completion(s) from {journal.path}.")
+
+# --- Batch Mode ---
+
+def echo_original_text(body: dict) -> str:
+    """Local batch stand-in answer: the snippet from the user message, unchanged, as the structured response."""
+    user_message = body["messages"][-1]["content"]
+    original_text = user_message.split("Original Text:\n---\n", 1)[1].rsplit("\n---", 1)[0]
+    return json.dumps({"modified_text": original_text}, ensure_ascii=False)
+
+def load_batch_state(state_path: str) -> dict | None:
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_batch_state(state_path: str, state: dict):
+    """Atomically records the submitted batches (temp file + os.replace)."""
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp_path, state_path)
+
+def journal_batch_results(lines: list[str], journal: CompletionJournal) -> tuple[int, int, int, int]:
+    """Records every successful batch result in the journal. Returns (succeeded, failed, prompt tokens, completion tokens)."""
+    succeeded = failed = prompt_tokens = completion_tokens = 0
+    for custom_id, (content, usage, error) in parse_batch_output(lines).items():
+        file, doc_id, input_hash = BatchCollector.parse_custom_id(custom_id)
+        if error is None:
+            try:
+                output = json.loads(content)["modified_text"]
+            except (ValueError, KeyError, TypeError) as e:
+                error = f"unparseable response: {e}"
+        if error is not None:
+            logging.warning(f"  Batch request for {file} (ID: {doc_id}) failed: {error}")
+            failed += 1
+            continue
+        journal.record(file, doc_id, input_hash, output)
+        count("snippets", family=family_of(file), source="batch")
+        succeeded += 1
+        prompt_tokens += usage.get("prompt_tokens", 0)
+        completion_tokens += usage.get("completion_tokens", 0)
+    return succeeded, failed, prompt_tokens, completion_tokens
+
+def run_batch(backend, collector: BatchCollector, journal: CompletionJournal, script_dir: str, poll_seconds: float = BATCH_POLL_SECONDS):
+    """
+    Submits the collected requests as batch jobs (or resumes batches submitted by an interrupted run),
+    polls until each one finishes, and journals the results. The journal makes applying them
+    idempotent: the apply pass picks completions up by input hash, however often it runs.
+    """
+    state_path = os.path.join(script_dir, BATCH_STATE_PATH)
+    state = load_batch_state(state_path)
+    if state and state.get("backend") == backend.name:
+        logging.info(f"Resuming {len(state['batch_ids'])} batch(es) submitted earlier ({state_path}).")
+    else:
+        if not collector.requests:
+            logging.info("Every LLM request is already journaled; nothing to submit.")
+            return
+        requests = [batch_request(custom_id, body) for custom_id, body in collector.requests.items()]
+        paths = write_batch_files(requests, os.path.join(script_dir, BATCH_DIR), f"links-{time.strftime('%Y%m%d-%H%M%S')}")
+        state = {"backend": backend.name, "batch_ids": [], "requests": len(requests)}
+        for path in paths:
+            state["batch_ids"].append(backend.submit(path))
+            save_batch_state(state_path, state)
+            logging.info(f"Submitted {path} as batch {state['batch_ids'][-1]}.")
+
+    for batch_id in state["batch_ids"]:
+        status = backend.status(batch_id)
+        while status not in TERMINAL_STATUSES:
+            logging.info(f"Batch {batch_id} is {status}; checking again in {poll_seconds:g}s.")
+            time.sleep(poll_seconds)
+            status = backend.status(batch_id)
+        if status != "completed":
+            logging.error(f"Batch {batch_id} ended as {status}; its requests stay pending for the next run.")
+            continue
+        succeeded, failed, prompt_tokens, completion_tokens = journal_batch_results(backend.results(batch_id), journal)
+        logging.info(f"Batch {batch_id}: {succeeded} completion(s) journaled, {failed} failed, "
+                     f"prompt tokens: {prompt_tokens}, completion tokens: {completion_tokens}.")
+    os.remove(state_path)
+
+def main(max_workers: int = MAX_WORKERS, use_llm: bool = True, journal_path: str | None = JOURNAL_PATH, dry_run: bool = False,
+         batch: str | None = None, poll_seconds: float = BATCH_POLL_SECONDS, catalog_root: str | None = None,
+         only_ids: list[str] | None = None):
+    if batch and not journal_path:
+        logging.error("Batch mode needs the journal: it is where batch results are stored before they are applied.")
         sys.exit(1)
 
-    try:
-        client = OpenAI(api_key=API_KEY)
-        client.models.list() # Test connection
-        logging.info("OpenAI client initialized and connection tested.")
-    except APIError as e:
-         logging.error(f"Failed to initialize or connect OpenAI client: {e}")
-         sys.exit(1)
-    except Exception as e:
-        logging.error(f"An unexpected error occurred during OpenAI client setup: {e}")
-        sys.exit(1)
+    client = None
+    if use_llm and batch != "local":
+        if not API_KEY:
+            logging.error("OPENAI_API_KEY not found in .env file or environment variables.")
+            sys.exit(1)
 
-    script_dir = os.path.dirname(os.path.abspath(__file__))
+        try:
+            client = OpenAI(api_key=API_KEY)
+            client.models.list() # Test connection
+            logging.info("OpenAI client initialized and connection tested.")
+        except APIError as e:
+             logging.error(f"Failed to initialize or connect OpenAI client: {e}")
+             sys.exit(1)
+        except Exception as e:
+            logging.error(f"An unexpected error occurred during OpenAI client setup: {e}")
+            sys.exit(1)
+    elif not batch:
+        logging.info("Running without the LLM: only unambiguous references will be linked.")
+
+    script_dir = os.path.abspath(catalog_root) if catalog_root else os.path.dirname(os.path.abspath(__file__))
     doc_id_to_title, product_id_to_name, doc_list_str, product_list_str = build_maps(script_dir)
 
     if not doc_id_to_title and not product_id_to_name:
@@ -261,16 +644,63 @@ def main():
     elif not product_id_to_name:
         logging.warning("Failed to build product map. Document links might be correct, but product links likely won't be.")
 
-    doc_files = sorted(glob.glob(os.path.join(script_dir, DOCS_JSONL_PATH_PATTERN), recursive=True))
+    doc_files = catalog_files(DOCUMENT_FILES_GLOB, script_dir)
     if not doc_files:
-        logging.error(f"No document JSONL files found matching pattern: {DOCS_JSONL_PATH_PATTERN}")
+        logging.error(f"No document JSONL files found matching pattern: {DOCUMENT_FILES_GLOB}")
         sys.exit(1)
 
     logging.info(f"Found {len(doc_files)} document files to process.")
 
     # --- Process all files ---
-    process_files(client, doc_files, doc_id_to_title, product_id_to_name, doc_list_str, product_list_str, script_dir)
+    journal = CompletionJournal(os.path.join(script_dir, journal_path)) if journal_path else None
+    maps = (doc_id_to_title, product_id_to_name, doc_list_str, product_list_str, script_dir)
+    selection = {"only_ids": set(only_ids)} if only_ids else {}
+    try:
+        if batch:
+            if batch == "local":
+                backend = LocalBatchBackend(echo_original_text, os.path.join(script_dir, LOCAL_BATCH_DIR))
+            else:
+                backend = OpenAIBatchBackend(client)
+            collector = BatchCollector()
+            process_files(None, doc_files, *maps, max_workers=max_workers, journal=journal, collector=collector, **selection)
+            run_batch(backend, collector, journal, script_dir, poll_seconds)
+            process_files(None, doc_files, *maps, max_workers=max_workers, journal=journal, dry_run=dry_run, journal_only=True, **selection)
+        else:
+            process_files(client, doc_files, *maps, max_workers=max_workers, journal=journal, dry_run=dry_run, **selection)
+    finally:
+        if journal:
+            journal.close()
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Rewrite document/product ID references in products/*/documents.jsonl as Markdown links.")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS,
+                        help=f"Concurrent LLM calls (default: {MAX_WORKERS}).")
+    parser.add_argument("--no-llm", action="store_true",
+                        help="Only apply the deterministic resolver; leave ambiguous references untouched.")
+    parser.add_argument("--journal", default=JOURNAL_PATH,
+                        help=f"Journal of completed LLM rewrites used to resume interrupted runs (default: {JOURNAL_PATH}).")
+    parser.add_argument("--no-journal", action="store_true",
+                        help="Neither read nor write the journal.")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Print a diff of the changes instead of writing the files (completions are still journaled).")
+    parser.add_argument("--batch", choices=["openai", "local"],
+                        help="Send the LLM requests as a batch job and apply the results when it completes. "
+                             "'local' is an offline stand-in that answers every request with its input unchanged.")
+    parser.add_argument("--batch-poll-seconds", type=float, default=BATCH_POLL_SECONDS,
+                        help=f"Interval between batch status checks (default: {BATCH_POLL_SECONDS}).")
+    parser.add_argument("--catalog-root",
+                        help="Directory holding products/*/ to rewrite, e.g. a synthetic catalog (default: this script's directory).")
+    parser.add_argument("--ids", type=lambda value: [item.strip() for item in value.split(',') if item.strip()],
+                        help="Comma-separated document _ids to reprocess; only those lines are read and rewritten in place.")
+    add_metrics_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    if args.batch and args.no_llm:
+        parser.error("--batch and --no-llm are mutually exclusive.")
+    with profiled(args):
+        main(max_workers=args.workers, use_llm=not args.no_llm,
+             journal_path=None if args.no_journal else args.journal, dry_run=args.dry_run,
+             batch=args.batch, poll_seconds=args.batch_poll_seconds, catalog_root=args.catalog_root,
+             only_ids=args.ids)
+    report_metrics(args) 
\ No newline at end of file
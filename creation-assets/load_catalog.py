@@ -0,0 +1,123 @@
+import os
+import argparse
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from astrapy import DataAPIClient
+from create_astra_collection import CollectionMetadataCache
+from bulk_insert import DEFAULT_CHUNK_SIZE, DEFAULT_CONCURRENCY, add_bulk_insert_arguments
+from delta_sync import add_sync_arguments
+from embedding_cache import ClientEmbedder, add_embedding_arguments, embedder_from_args
+from chunk_documents import DEFAULT_MAX_TOKENS, DEFAULT_OVERLAP_TOKENS
+from catalog_loader import DEFAULT_PARALLEL_FILES, add_parallel_arguments, load_files
+from catalog_index import update_catalog_index
+from catalog import DOCUMENT_FILES_GLOB, PRODUCT_FILES_GLOB, catalog_files
+from metrics import add_metrics_arguments, report_metrics
+from profiling import add_profile_arguments, profiled
+from load_products_astra import ASTRA_DB_COLLECTION as PRODUCTS_COLLECTION, read_products
+from load_documents_astra import (
+    ASTRA_DB_API_ENDPOINT,
+    ASTRA_DB_APPLICATION_TOKEN,
+    ASTRA_DB_CHUNK_COLLECTION,
+    ASTRA_DB_COLLECTION as DOCUMENTS_COLLECTION,
+    read_document_chunks,
+    read_documents,
+)
+
+# Loadable collections: name -> (JSONL files glob, reader)
+COLLECTIONS = {
+    PRODUCTS_COLLECTION: (PRODUCT_FILES_GLOB, read_products),
+    DOCUMENTS_COLLECTION: (DOCUMENT_FILES_GLOB, read_documents),
+    ASTRA_DB_CHUNK_COLLECTION: (DOCUMENT_FILES_GLOB, read_document_chunks),
+}
+DEFAULT_COLLECTIONS = [PRODUCTS_COLLECTION, DOCUMENTS_COLLECTION]
+
+def family_files(pattern: str, families: list[str] | None) -> list[str]:
+    """Returns the catalog files matching `pattern`, limited to the given family directories (case-insensitive)."""
+    file_paths = catalog_files(pattern)
+    if not families:
+        return file_paths
+    wanted = {family.lower() for family in families}
+    return [f for f in file_paths if os.path.basename(os.path.dirname(f)).lower() in wanted]
+
+def load_catalog(collections: list[str] | None = None, families: list[str] | None = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, concurrency: int = DEFAULT_CONCURRENCY, ordered: bool = False,
+                 sync: bool = False, delete_missing: bool = False, embedder: ClientEmbedder | None = None,
+                 parallel_files: int = DEFAULT_PARALLEL_FILES,
+                 max_chunk_tokens: int = DEFAULT_MAX_TOKENS, chunk_overlap_tokens: int = DEFAULT_OVERLAP_TOKENS) -> dict:
+    """
+    Loads several collections in one run over a single Data API client. Each astrapy
+    Collection keeps its own keep-alive connection pool, which every file and insert
+    thread for that collection shares. Collection metadata (the collection list,
+    lexical support) is looked up once, and all collections load at the same time with
+    at most `parallel_files` files in flight across the whole run.
+    Returns {collection name: (documents written, documents failed)}.
+    """
+    collections = collections or DEFAULT_COLLECTIONS
+    if delete_missing and families:
+        print("Ignoring --delete-missing because --families loads only part of the catalog.")
+        delete_missing = False
+
+    print(f"Connecting to AstraDB: {ASTRA_DB_API_ENDPOINT}")
+    client = DataAPIClient(ASTRA_DB_APPLICATION_TOKEN)
+    db = client.get_database(ASTRA_DB_API_ENDPOINT)
+    metadata = CollectionMetadataCache(db)
+
+    def load_collection(name: str) -> tuple[int, int]:
+        pattern, read_file = COLLECTIONS[name]
+        if name == ASTRA_DB_CHUNK_COLLECTION:
+            read_file = partial(read_file, max_tokens=max_chunk_tokens, overlap_tokens=chunk_overlap_tokens)
+        file_paths = family_files(pattern, families)
+        if not file_paths:
+            print(f"No files to load into '{name}'.")
+            return 0, 0
+
+        is_lexical, collection_name = metadata.ensure(name)
+        collection = db.get_collection(collection_name)
+        print(f"Loading {len(file_paths)} file(s) into '{collection_name}'.")
+        return load_files(collection, ASTRA_DB_API_ENDPOINT, file_paths, read_file,
+                          '$hybrid' if is_lexical else '$vectorize',
+                          chunk_size=chunk_size, concurrency=concurrency, ordered=ordered,
+                          sync=sync, delete_missing=delete_missing, embedder=embedder,
+                          executor=file_executor)
+
+    with ThreadPoolExecutor(max_workers=max(1, parallel_files)) as file_executor, \
+         ThreadPoolExecutor(max_workers=len(collections)) as collection_executor:
+        futures = {name: collection_executor.submit(load_collection, name) for name in collections}
+        results = {name: future.result() for name, future in futures.items()}
+
+    update_catalog_index()
+    print("\nSummary:")
+    for name, (written, failed) in results.items():
+        print(f"  {name}: {written} written, {failed} failed")
+    return results
+
+def comma_list(value: str) -> list[str]:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load products and documents into Astra DB in one run, in parallel.")
+    parser.add_argument("--collections", type=comma_list, default=DEFAULT_COLLECTIONS,
+                        help=f"Comma-separated collections to load, from {', '.join(COLLECTIONS)} (default: {','.join(DEFAULT_COLLECTIONS)}).")
+    parser.add_argument("--families", type=comma_list,
+                        help="Comma-separated family directories under products/ to load (default: all).")
+    add_bulk_insert_arguments(parser)
+    add_parallel_arguments(parser)
+    add_sync_arguments(parser)
+    add_embedding_arguments(parser)
+    parser.add_argument("--max-chunk-tokens", type=int, default=DEFAULT_MAX_TOKENS,
+                        help=f"Token budget per chunk for '{ASTRA_DB_CHUNK_COLLECTION}' (default: {DEFAULT_MAX_TOKENS}).")
+    parser.add_argument("--chunk-overlap-tokens", type=int, default=DEFAULT_OVERLAP_TOKENS,
+                        help=f"Tokens of the previous chunk repeated at the start of the next (default: {DEFAULT_OVERLAP_TOKENS}).")
+    add_metrics_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    unknown = [name for name in args.collections if name not in COLLECTIONS]
+    if unknown:
+        parser.error(f"Unknown collection(s): {', '.join(unknown)}. Choose from: {', '.join(COLLECTIONS)}")
+    with profiled(args):
+        load_catalog(collections=args.collections, families=args.families,
+                     chunk_size=args.chunk_size, concurrency=args.concurrency, ordered=args.ordered,
+                     sync=args.sync, delete_missing=args.delete_missing, embedder=embedder_from_args(args),
+                     parallel_files=args.parallel_files,
+                     max_chunk_tokens=args.max_chunk_tokens, chunk_overlap_tokens=args.chunk_overlap_tokens)
+    report_metrics(args)
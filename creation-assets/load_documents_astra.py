@@ -1,9 +1,19 @@
 import os
-import json
-import glob
+import argparse
+from functools import partial
 from dotenv import load_dotenv
 from astrapy import DataAPIClient
 from create_astra_collection import create_collection_if_not_exists
+from bulk_insert import DEFAULT_CHUNK_SIZE, DEFAULT_CONCURRENCY, add_bulk_insert_arguments
+from delta_sync import add_sync_arguments
+from embedding_cache import ClientEmbedder, add_embedding_arguments, embedder_from_args
+from chunk_documents import DEFAULT_MAX_TOKENS, DEFAULT_OVERLAP_TOKENS, iter_chunk_records
+from near_duplicates import add_dedup_arguments, deduplicated
+from catalog_loader import DEFAULT_PARALLEL_FILES, add_parallel_arguments, load_files
+from catalog_index import update_catalog_index
+from catalog import DOCUMENT_FILES_GLOB, catalog_files, iter_documents
+from metrics import add_metrics_arguments, family_of, report_metrics, timer
+from profiling import add_profile_arguments, profiled
 
 load_dotenv()
 
@@ -11,62 +21,110 @@ ASTRA_DB_APPLICATION_TOKEN = os.getenv("ASTRA_DB_APPLICATION_TOKEN")
 ASTRA_DB_API_ENDPOINT = os.getenv("ASTRA_DB_API_ENDPOINT")
 
 ASTRA_DB_COLLECTION = "documents"
+ASTRA_DB_CHUNK_COLLECTION = "document_chunks" # Used with --chunk-documents
 
 if not ASTRA_DB_APPLICATION_TOKEN or not ASTRA_DB_API_ENDPOINT:
     print("Error: ASTRA_DB_APPLICATION_TOKEN and ASTRA_DB_API_ENDPOINT must be set in the .env file.")
     exit(1)
 
-def load_documents():
-    """Finds document JSONL files, connects to AstraDB, and loads the data."""
+def prepare_document(doc_data: dict, text_field_name: str, file_path: str, line_num: int) -> dict:
+    """Copies a document row and adds its `text` to be embedded under `text_field_name`."""
+    doc_to_insert = doc_data.copy()
+    if 'text' in doc_to_insert and doc_to_insert['text']:
+        doc_to_insert[text_field_name] = doc_to_insert['text']
+    else:
+        print(f"  Warning: 'text' field missing or empty in document from {file_path} (line {line_num}), '{text_field_name}' field will not be generated for this doc.")
+    return doc_to_insert
+
+def iter_document_rows(file_path: str):
+    """Yields (line_num, doc_data) for each valid JSON line of a documents.jsonl file."""
+    for line_num, document in iter_documents(file_path):
+        yield line_num, document.to_dict()
+
+def read_documents(file_path: str, text_field_name: str) -> list[dict]:
+    """Reads a documents.jsonl file and returns the documents ready for insertion."""
+    with timer("stage_seconds", stage="parse", family=family_of(file_path)):
+        rows = list(iter_document_rows(file_path))
+    return [prepare_document(doc_data, text_field_name, file_path, line_num) for line_num, doc_data in rows]
+
+def read_document_chunks(file_path: str, text_field_name: str,
+                         max_tokens: int = DEFAULT_MAX_TOKENS, overlap_tokens: int = DEFAULT_OVERLAP_TOKENS) -> list[dict]:
+    """Reads a documents.jsonl file and returns one chunk record per token-budgeted section of each document."""
+    family = family_of(file_path)
+    with timer("stage_seconds", stage="parse", family=family):
+        rows = list(iter_document_rows(file_path))
+    chunks = []
+    with timer("stage_seconds", stage="chunk", family=family):
+        for line_num, doc_data in rows:
+            for chunk in iter_chunk_records(doc_data, max_tokens, overlap_tokens):
+                chunks.append(prepare_document(chunk, text_field_name, file_path, line_num))
+    return chunks
+
+def load_documents(chunk_size: int = DEFAULT_CHUNK_SIZE, concurrency: int = DEFAULT_CONCURRENCY, ordered: bool = False,
+                   sync: bool = False, delete_missing: bool = False,
+                   embedder: ClientEmbedder | None = None, chunk_documents: bool = False,
+                   max_chunk_tokens: int = DEFAULT_MAX_TOKENS, chunk_overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+                   parallel_files: int = DEFAULT_PARALLEL_FILES,
+                   dedup: str | None = None, dedup_threshold: float | None = None):
+    """
+    Finds document JSONL files, connects to AstraDB, and bulk loads the data.
+    With `chunk_documents`, each document is split into token-budgeted chunks that are
+    loaded as child records into the chunk collection instead.
+    With `dedup` ("reuse" or "skip"), near-duplicate texts within each file share one
+    embedding or are left out (see near_duplicates.apply_dedup).
+    """
 
     print(f"Connecting to AstraDB: {ASTRA_DB_API_ENDPOINT}")
     client = DataAPIClient(ASTRA_DB_APPLICATION_TOKEN)
     db = client.get_database(ASTRA_DB_API_ENDPOINT)
 
-    is_lexical, collection_name = create_collection_if_not_exists(db, ASTRA_DB_COLLECTION)
+    target_collection = ASTRA_DB_CHUNK_COLLECTION if chunk_documents else ASTRA_DB_COLLECTION
+    is_lexical, collection_name = create_collection_if_not_exists(db, target_collection)
     text_field_name = '$hybrid' if is_lexical else '$vectorize'
     
     collection = db.get_collection(collection_name)
     print(f"Connected to collection: '{collection_name}'")
 
-    document_files = glob.glob("products/*/documents.jsonl") 
+    document_files = catalog_files(DOCUMENT_FILES_GLOB)
     print(f"Found {len(document_files)} document file(s):")
     for f in document_files:
         print(f"- {f}")
 
-    total_inserted = 0
-    for file_path in document_files:
-        print(f"Processing {file_path}...")
-        inserted_in_file = 0
-        try:
-            with open(file_path, 'r') as f:
-                for line_num, line in enumerate(f, 1):
-                    try:
-                        doc_data = json.loads(line.strip())
-                        
-                        doc_to_insert = doc_data.copy()                       
-                        if 'text' in doc_to_insert and doc_to_insert['text']:
-                            doc_to_insert[text_field_name] = doc_to_insert['text']
-                        else:
-                            print(f"  Warning: 'text' field missing or empty in document from {file_path} (line {line_num}), '{text_field_name}' field will not be generated for this doc.")
-
-                        response = collection.insert_one(doc_to_insert)
-                        
-                        inserted_in_file += 1
-                    except json.JSONDecodeError as e:
-                        print(f"  Warning: Skipping invalid JSON line in {file_path} (line {line_num}): {e}")
-                    except Exception as e:
-                        print(f"  Error inserting document from {file_path} (line {line_num}): {e}")
-                        print(f"  Problematic data: {line.strip()}")
-
-            print(f"  Successfully inserted {inserted_in_file} documents from {file_path}.")
-            total_inserted += inserted_in_file
-        except FileNotFoundError:
-            print(f"  Error: File not found {file_path}")
-        except Exception as e:
-            print(f"  Error processing file {file_path}: {e}")
+    read_file = read_documents
+    if chunk_documents:
+        read_file = partial(read_document_chunks, max_tokens=max_chunk_tokens, overlap_tokens=chunk_overlap_tokens)
+    if dedup:
+        read_file = deduplicated(read_file, dedup, dedup_threshold)
 
-    print(f"\nFinished loading data. Total documents inserted: {total_inserted}")
+    load_files(collection, ASTRA_DB_API_ENDPOINT, document_files, read_file, text_field_name,
+               chunk_size=chunk_size, concurrency=concurrency, ordered=ordered,
+               sync=sync, delete_missing=delete_missing, embedder=embedder, parallel_files=parallel_files)
+    update_catalog_index()
 
 if __name__ == "__main__":
-    load_documents() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Load products/*/documents.jsonl into the Astra DB documents collection.")
+    add_bulk_insert_arguments(parser)
+    add_parallel_arguments(parser)
+    add_sync_arguments(parser)
+    add_embedding_arguments(parser)
+    parser.add_argument("--chunk-documents", action="store_true",
+                        help=f"Split documents into chunks and load them into the '{ASTRA_DB_CHUNK_COLLECTION}' collection.")
+    parser.add_argument("--max-chunk-tokens", type=int, default=DEFAULT_MAX_TOKENS,
+                        help=f"Token budget per chunk (default: {DEFAULT_MAX_TOKENS}).")
+    parser.add_argument("--chunk-overlap-tokens", type=int, default=DEFAULT_OVERLAP_TOKENS,
+                        help=f"Tokens of the previous chunk repeated at the start of the next (default: {DEFAULT_OVERLAP_TOKENS}).")
+    add_dedup_arguments(parser)
+    add_metrics_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    if args.dedup == "skip" and not args.chunk_documents:
+        parser.error("--dedup skip only applies to --chunk-documents; whole documents are referenced by documentation_ids, use --dedup reuse.")
+    if args.dedup == "reuse" and not args.client_embeddings:
+        parser.error("--dedup reuse needs --client-embeddings; with server-side vectorize every document is still embedded.")
+    with profiled(args):
+        load_documents(chunk_size=args.chunk_size, concurrency=args.concurrency, ordered=args.ordered,
+                       sync=args.sync, delete_missing=args.delete_missing,
+                       embedder=embedder_from_args(args), chunk_documents=args.chunk_documents,
+                       max_chunk_tokens=args.max_chunk_tokens, chunk_overlap_tokens=args.chunk_overlap_tokens,
+                       parallel_files=args.parallel_files, dedup=args.dedup, dedup_threshold=args.dedup_threshold)
+    report_metrics(args)
@@ -0,0 +1,157 @@
+import os
+import argparse
+from astrapy import DataAPIClient
+from create_astra_collection import CollectionMetadataCache
+from bulk_insert import DEFAULT_CHUNK_SIZE, DEFAULT_CONCURRENCY, InsertReport, add_bulk_insert_arguments, insert_documents, print_insert_report
+from embedding_cache import FAKE_MODEL, ClientEmbedder, add_embedding_arguments, embedder_from_args
+from catalog_parquet import DEFAULT_BATCH_SIZE, DOCUMENTS_PARQUET, PARQUET_DIR, PRODUCTS_PARQUET, iter_parquet_rows, stored_embedding_model
+from catalog_index import update_catalog_index
+from metrics import add_metrics_arguments, report_metrics, timer
+from profiling import add_profile_arguments, profiled
+from load_products_astra import ASTRA_DB_COLLECTION as PRODUCTS_COLLECTION, prepare_product
+from load_documents_astra import (
+    ASTRA_DB_API_ENDPOINT,
+    ASTRA_DB_APPLICATION_TOKEN,
+    ASTRA_DB_COLLECTION as DOCUMENTS_COLLECTION,
+    prepare_document,
+)
+
+# Loadable collections: name -> (Parquet file in the export directory, row preparer)
+COLLECTIONS = {
+    PRODUCTS_COLLECTION: (PRODUCTS_PARQUET, lambda row, text_field_name, path, row_num: prepare_product(row, text_field_name, path)),
+    DOCUMENTS_COLLECTION: (DOCUMENTS_PARQUET, prepare_document),
+}
+
+def check_stored_vectors(path: str, embedder: ClientEmbedder | None = None, allow_fake_vectors: bool = False):
+    """
+    Raises ValueError unless the export's stored vectors (if any) can go into the collection:
+    their model must be recorded, match the --client-embeddings model that embeds the other
+    rows, and fake vectors need `allow_fake_vectors` (or --client-embeddings fake).
+    """
+    if not os.path.exists(path):
+        return
+    model = stored_embedding_model(path)
+    if model is None:
+        return
+    if model == "unknown":
+        raise ValueError(f"{path} has vectors from an unrecorded embedding model; re-export it with catalog_parquet.py.")
+    if embedder and model != embedder.provider.model:
+        raise ValueError(f"{path} has '{model}' vectors but --client-embeddings uses '{embedder.provider.model}'; "
+                         "re-export with the same provider.")
+    if model == FAKE_MODEL and not (allow_fake_vectors or embedder):
+        raise ValueError(f"{path} has fake vectors with no semantic meaning; pass --allow-fake-vectors to load them anyway.")
+
+def prepare_batch(rows: list[dict], prepare, text_field_name: str, path: str, first_row: int,
+                  embedder: ClientEmbedder | None = None) -> list[dict]:
+    """
+    Prepares one record batch for insert_many. Rows exported with a vector column are written
+    with that `$vector` (plus `$lexical` for hybrid collections); the others get the server-side
+    vectorize text, or a client-computed vector with `embedder`.
+    """
+    documents = []
+    pending = []
+    for row_num, row in enumerate(rows, first_row):
+        vector = row.pop('$vector', None)
+        document = prepare(row, text_field_name, path, row_num)
+        if vector is None:
+            pending.append(document)
+            continue
+        text = document.pop(text_field_name, None)
+        document['$vector'] = vector
+        if text and text_field_name == '$hybrid':
+            document['$lexical'] = text
+        documents.append(document)
+    if pending and embedder:
+        pending = embedder(pending, text_field_name)
+    return documents + pending
+
+def load_parquet_file(collection, path: str, prepare, text_field_name: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE, concurrency: int = DEFAULT_CONCURRENCY, ordered: bool = False,
+                      embedder: ClientEmbedder | None = None) -> InsertReport:
+    """Streams a Parquet export into the collection one record batch at a time. Returns the combined InsertReport."""
+    report = InsertReport(file_path=path)
+    row_num = 1
+    for rows in iter_parquet_rows(path, batch_size=batch_size):
+        with timer("stage_seconds", stage="prepare", collection=collection.name):
+            documents = prepare_batch(rows, prepare, text_field_name, path, row_num, embedder)
+        row_num += len(rows)
+        batch_report = insert_documents(collection, documents, path, chunk_size=chunk_size,
+                                        concurrency=concurrency, ordered=ordered)
+        report.inserted_ids.extend(batch_report.inserted_ids)
+        report.failed_ids.extend(batch_report.failed_ids)
+        report.errors.extend(batch_report.errors)
+        if ordered and batch_report.failed_ids:
+            break
+    return report
+
+def load_parquet(input_dir: str = PARQUET_DIR, collections: list[str] | None = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, concurrency: int = DEFAULT_CONCURRENCY, ordered: bool = False,
+                 embedder: ClientEmbedder | None = None, allow_fake_vectors: bool = False) -> dict:
+    """
+    Bulk loads a catalog_parquet.py export into Astra DB, skipping JSONL parsing and, when the
+    export carries embeddings, every embedding call (see check_stored_vectors).
+    The catalog index is still rebuilt from the JSONL files under the working directory, so
+    load an export of that same catalog.
+    Returns {collection name: (documents written, documents failed)}.
+    """
+    collections = collections or list(COLLECTIONS)
+    for name in collections:
+        check_stored_vectors(os.path.join(input_dir, COLLECTIONS[name][0]), embedder, allow_fake_vectors)
+    print(f"Connecting to AstraDB: {ASTRA_DB_API_ENDPOINT}")
+    client = DataAPIClient(ASTRA_DB_APPLICATION_TOKEN)
+    db = client.get_database(ASTRA_DB_API_ENDPOINT)
+    metadata = CollectionMetadataCache(db)
+
+    results = {}
+    for name in collections:
+        file_name, prepare = COLLECTIONS[name]
+        path = os.path.join(input_dir, file_name)
+        if not os.path.exists(path):
+            print(f"No {path}; skipping '{name}'.")
+            continue
+        is_lexical, collection_name = metadata.ensure(name)
+        collection = db.get_collection(collection_name)
+        print(f"Processing {path} into '{collection_name}'...")
+        report = load_parquet_file(collection, path, prepare, '$hybrid' if is_lexical else '$vectorize',
+                                   batch_size=batch_size, chunk_size=chunk_size, concurrency=concurrency,
+                                   ordered=ordered, embedder=embedder)
+        print_insert_report(report)
+        results[name] = (report.inserted_count, report.failed_count)
+
+    if embedder:
+        print(f"Embedding cache: {embedder.cache.hits} hits, {embedder.cache.misses} misses ({embedder.provider.model}).")
+    update_catalog_index()
+    print("\nSummary:")
+    for name, (written, failed) in results.items():
+        print(f"  {name}: {written} written, {failed} failed")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load a Parquet export of the catalog (see catalog_parquet.py) into Astra DB.")
+    parser.add_argument("--input-dir", default=PARQUET_DIR, help=f"Directory holding the Parquet files (default: {PARQUET_DIR}).")
+    parser.add_argument("--collections", type=lambda value: [item.strip() for item in value.split(',') if item.strip()],
+                        default=list(COLLECTIONS),
+                        help=f"Comma-separated collections to load, from {', '.join(COLLECTIONS)} (default: both).")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Rows read and prepared at a time (default: {DEFAULT_BATCH_SIZE}).")
+    parser.add_argument("--allow-fake-vectors", action="store_true",
+                        help="Load vectors exported with the fake provider (they carry no semantics).")
+    add_bulk_insert_arguments(parser)
+    add_embedding_arguments(parser)
+    add_metrics_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    unknown = [name for name in args.collections if name not in COLLECTIONS]
+    if unknown:
+        parser.error(f"Unknown collection(s): {', '.join(unknown)}. Choose from: {', '.join(COLLECTIONS)}")
+    embedder = embedder_from_args(args)
+    try:
+        for name in args.collections:
+            check_stored_vectors(os.path.join(args.input_dir, COLLECTIONS[name][0]), embedder, args.allow_fake_vectors)
+    except ValueError as e:
+        parser.error(str(e))
+    with profiled(args):
+        load_parquet(args.input_dir, collections=args.collections, batch_size=args.batch_size,
+                     chunk_size=args.chunk_size, concurrency=args.concurrency, ordered=args.ordered,
+                     embedder=embedder, allow_fake_vectors=args.allow_fake_vectors)
+    report_metrics(args)
@@ -0,0 +1,561 @@
+import re
+import math
+import time
+import argparse
+import unicodedata
+from dataclasses import dataclass, field
+import numpy as np
+from catalog import DOCUMENT_FILES_GLOB, PRODUCT_FILES_GLOB, as_markdown, catalog_files, iter_documents, iter_products
+from embedding_cache import EmbeddingCache, embed_texts, get_provider, PROVIDERS
+
+try:
+    from astrapy.exceptions import CollectionInsertManyException
+except ImportError: # The local engine runs without astrapy; mirror the fields bulk_insert reads
+    @dataclass
+    class CollectionInsertManyException(Exception):
+        inserted_ids: list = field(default_factory=list)
+        exceptions: list = field(default_factory=list)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60 # Reciprocal rank fusion constant
+DEFAULT_HYBRID_LIMIT = 50 # Candidates taken from each of the lexical and vector rankings before fusion
+DEFAULT_PROJECTION_EXCLUDES = ('$vector', '$vectorize', '$lexical') # Not returned unless projected explicitly
+
+# Analyzer roughly matching the collections' lexical config: standard tokenizer, lowercase, stop, stem, asciifolding
+TOKEN_REGEX = re.compile(r"[a-z0-9]+(?:['_][a-z0-9]+)*")
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for if in into is it no not of on or such that the their then there these they this to was will with".split()
+)
+
+# --- Analysis ---
+
+def _stem(token: str) -> str:
+    """Light suffix stripper standing in for the Porter stemmer (plurals, -ing, -ed, -ly)."""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith('sses'):
+        return token[:-2]
+    if token.endswith('ies'):
+        return token[:-3] + 'y'
+    if token.endswith('s') and not token.endswith('ss') and not token.endswith('us'):
+        token = token[:-1]
+    for suffix in ('ing', 'ed', 'ly'):
+        stem = token[:-len(suffix)]
+        if token.endswith(suffix) and len(stem) >= 3 and re.search(r'[aeiouy]', stem):
+            return stem[:-1] if len(stem) > 3 and stem[-1] == stem[-2] and stem[-1] not in 'lsz' else stem
+    return token
+
+def analyze(text: str) -> list[str]:
+    """Splits text into folded, lowercased, stop-word-free, stemmed terms."""
+    folded = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii').lower()
+    return [_stem(token) for token in TOKEN_REGEX.findall(folded) if token not in STOP_WORDS]
+
+# --- Filters, projection and field sort ---
+
+_MISSING = object()
+
+def _get_path(document: dict, path: str):
+    value = document
+    for part in path.split('.'):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return _MISSING
+    return value
+
+def _equals(value, expected) -> bool:
+    """Data API equality: an array field matches when it contains the value (or equals it as a whole)."""
+    if isinstance(value, list) and not isinstance(expected, list):
+        return expected in value
+    return value == expected
+
+def _compare(value, operator: str, operand) -> bool:
+    if value is _MISSING or value is None:
+        return False
+    try:
+        if operator == '$gt':
+            return value > operand
+        if operator == '$gte':
+            return value >= operand
+        if operator == '$lt':
+            return value < operand
+        return value <= operand
+    except TypeError:
+        return False
+
+def _match_condition(value, condition) -> bool:
+    if not isinstance(condition, dict) or not any(key.startswith('$') for key in condition):
+        return value is not _MISSING and _equals(value, condition)
+    for operator, operand in condition.items():
+        if operator == '$eq':
+            matched = value is not _MISSING and _equals(value, operand)
+        elif operator == '$ne':
+            matched = value is _MISSING or not _equals(value, operand)
+        elif operator == '$in':
+            matched = value is not _MISSING and any(_equals(value, item) for item in operand)
+        elif operator == '$nin':
+            matched = value is _MISSING or not any(_equals(value, item) for item in operand)
+        elif operator == '$all':
+            matched = isinstance(value, list) and all(item in value for item in operand)
+        elif operator == '$size':
+            matched = isinstance(value, list) and len(value) == operand
+        elif operator == '$exists':
+            matched = (value is not _MISSING) == bool(operand)
+        elif operator in ('$gt', '$gte', '$lt', '$lte'):
+            matched = _compare(value, operator, operand)
+        else:
+            raise ValueError(f"Unsupported filter operator '{operator}'")
+        if not matched:
+            return False
+    return True
+
+def matches(document: dict, filter: dict | None) -> bool:
+    """Evaluates a Data API style filter ($and/$or/$not, $eq/$ne/$in/$nin/$all/$size/$exists, ranges) on a document."""
+    if not filter:
+        return True
+    for key, condition in filter.items():
+        if key == '$and':
+            if not all(matches(document, sub_filter) for sub_filter in condition):
+                return False
+        elif key == '$or':
+            if not any(matches(document, sub_filter) for sub_filter in condition):
+                return False
+        elif key == '$not':
+            if matches(document, condition):
+                return False
+        elif not _match_condition(_get_path(document, key), condition):
+            return False
+    return True
+
+def project(document: dict, projection: dict | None) -> dict:
+    """Applies an inclusive ({field: 1}) or exclusive ({field: 0}) projection; `_id` is kept unless excluded."""
+    if not projection:
+        return {k: v for k, v in document.items() if k not in DEFAULT_PROJECTION_EXCLUDES}
+    included = [k for k, v in projection.items() if v]
+    if included and any(k != '_id' for k in included):
+        result = {'_id': document['_id']} if projection.get('_id', True) else {}
+        for path in included:
+            value = _get_path(document, path)
+            if value is not _MISSING:
+                target = result
+                parts = path.split('.')
+                for part in parts[:-1]:
+                    target = target.setdefault(part, {})
+                target[parts[-1]] = value
+        return result
+    excluded = {k for k, v in projection.items() if not v}
+    return {k: v for k, v in document.items()
+            if k not in excluded and (k not in DEFAULT_PROJECTION_EXCLUDES or projection.get(k))}
+
+def _field_sort_key(value):
+    # Missing values sort first ascending, like the Data API; mixed types are ordered by type name
+    if value is _MISSING or value is None:
+        return (0, '', 0)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (1, 'number', value)
+    return (1, type(value).__name__, value if isinstance(value, str) else str(value))
+
+# --- Results ---
+
+class LocalCursor(list):
+    """The materialized results of a find; iterable like an astrapy cursor and offering to_list()."""
+
+    def to_list(self) -> list:
+        return list(self)
+
+@dataclass
+class RerankedResult:
+    """One find_and_rerank hit: the document plus its `$rerank` (RRF), `$lexical` and `$vector` scores."""
+    document: dict
+    scores: dict
+
+@dataclass
+class InsertManyResult:
+    inserted_ids: list
+
+@dataclass
+class UpdateResult:
+    """Mirrors astrapy's CollectionUpdateResult.update_info ("n" matched, "nModified", "upserted")."""
+    update_info: dict
+
+# --- Collection ---
+
+class LocalCollection:
+    """
+    In-memory stand-in for an astrapy Collection. It supports the calls the loaders and the app
+    make (insert_many, find_one_and_replace, update_one, delete_many, find, find_one,
+    count_documents, distinct). It also supports the vector, lexical and hybrid sorts:
+    `{"$vector": [...]}`, `{"$vectorize": "query"}`, `{"$lexical": "query"}` and
+    `{"$hybrid": "query"}` via find_and_rerank.
+    Lexical ranking is BM25 over an inverted index. Vector ranking is a dot product against
+    a float32 matrix. Hybrid search fuses the two with reciprocal rank fusion.
+    """
+
+    def __init__(self, name: str, provider=None, cache: EmbeddingCache | None = None):
+        self.name = name
+        self.provider = provider
+        self.cache = cache if cache is not None else EmbeddingCache(":memory:")
+        self._documents = [] # row -> stored document (None once deleted)
+        self._rows = {} # _id -> row
+        self._vectors = [] # row -> np.float32 vector or None
+        self._postings = {} # term -> {row: term frequency}
+        self._lengths = [] # row -> number of terms
+        self._live_length_total = 0
+        self._matrix = None # Lazily stacked from _vectors
+
+    # --- Indexing ---
+
+    def _prepare(self, document: dict) -> tuple[dict, str | None, str | None, list | None]:
+        """Splits a document into (stored fields, text to embed, lexical text, supplied vector)."""
+        stored = dict(document)
+        vector = stored.pop('$vector', None)
+        hybrid = stored.pop('$hybrid', None)
+        vectorize = stored.get('$vectorize')
+        lexical = stored.get('$lexical')
+        if isinstance(hybrid, dict):
+            vectorize = hybrid.get('$vectorize', vectorize)
+            lexical = hybrid.get('$lexical', lexical)
+        elif isinstance(hybrid, str):
+            vectorize = vectorize or hybrid
+            lexical = lexical or hybrid
+        if vectorize:
+            stored['$vectorize'] = vectorize
+        if lexical:
+            stored['$lexical'] = lexical
+        return stored, vectorize, lexical or vectorize, vector
+
+    def _index_many(self, documents: list[dict]):
+        prepared = [self._prepare(document) for document in documents]
+        to_embed = [vectorize for _, vectorize, _, vector in prepared if vector is None and vectorize]
+        embedded = iter(embed_texts(to_embed, self.provider, self.cache) if to_embed and self.provider else [])
+        for stored, vectorize, lexical, vector in prepared:
+            if vector is None and vectorize and self.provider:
+                vector = next(embedded)
+            row = len(self._documents)
+            self._documents.append(stored)
+            self._rows[stored['_id']] = row
+            self._vectors.append(np.asarray(vector, dtype=np.float32) if vector is not None else None)
+            terms = analyze(lexical) if lexical else []
+            for term in terms:
+                postings = self._postings.setdefault(term, {})
+                postings[row] = postings.get(row, 0) + 1
+            self._lengths.append(len(terms))
+            self._live_length_total += len(terms)
+        self._matrix = None
+
+    def _unindex(self, doc_id):
+        row = self._rows.pop(doc_id)
+        stored = self._documents[row]
+        lexical = stored.get('$lexical') or stored.get('$vectorize')
+        for term in set(analyze(lexical)) if lexical else ():
+            postings = self._postings[term]
+            postings.pop(row, None)
+            if not postings:
+                del self._postings[term]
+        self._live_length_total -= self._lengths[row]
+        self._lengths[row] = 0
+        self._documents[row] = None
+        self._vectors[row] = None
+        self._matrix = None
+
+    def _vector_matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            dimension = next((len(v) for v in self._vectors if v is not None), 0)
+            self._matrix = np.zeros((len(self._vectors), dimension), dtype=np.float32)
+            for row, vector in enumerate(self._vectors):
+                if vector is not None:
+                    self._matrix[row] = vector
+        return self._matrix
+
+    # --- Writes ---
+
+    def insert_one(self, document: dict):
+        self.insert_many([document])
+
+    def insert_many(self, documents: list[dict], *, ordered: bool = False, chunk_size: int | None = None,
+                    concurrency: int | None = None, **kwargs) -> InsertManyResult:
+        """Inserts documents; duplicates fail like the Data API (ordered mode stops at the first one)."""
+        accepted = []
+        errors = []
+        seen = set()
+        for document in documents:
+            doc_id = document.get('_id')
+            if doc_id is None or doc_id in self._rows or doc_id in seen:
+                errors.append(ValueError(f"Document already exists with the given _id: {doc_id!r}" if doc_id is not None
+                                         else "Documents need an _id in the local engine"))
+                if ordered:
+                    break
+                continue
+            seen.add(doc_id)
+            accepted.append(document)
+        self._index_many(accepted)
+        inserted_ids = [document['_id'] for document in accepted]
+        if errors:
+            raise CollectionInsertManyException(inserted_ids=inserted_ids, exceptions=errors)
+        return InsertManyResult(inserted_ids=inserted_ids)
+
+    def find_one_and_replace(self, filter: dict, replacement: dict, *, upsert: bool = False, **kwargs):
+        row = next(iter(self._matching_rows(filter)), None)
+        if row is None and not upsert:
+            return None
+        current = project(self._documents[row], None) if row is not None else None
+        doc_id = current['_id'] if current else filter.get('_id', replacement.get('_id'))
+        if current:
+            self._unindex(doc_id)
+        self._index_many([{**replacement, '_id': doc_id}])
+        return current
+
+    def update_one(self, filter: dict, update: dict, *, upsert: bool = False, **kwargs):
+        """Applies `$set` / `$unset` to the first matching document."""
+        row = next(iter(self._matching_rows(filter)), None)
+        if row is None:
+            if not upsert:
+                return UpdateResult(update_info={"n": 0, "updatedExisting": False, "ok": 1.0, "nModified": 0})
+            document = {k: v for k, v in filter.items() if not k.startswith('$')}
+        else:
+            document = dict(self._documents[row])
+            vector = self._vectors[row]
+            # The stored document doesn't carry its vector; keep it unless the update replaces the embedded text
+            if vector is not None and not {'$vector', '$vectorize', '$hybrid'} & set(update.get('$set', {})):
+                document['$vector'] = vector.tolist()
+            self._unindex(document['_id'])
+        document.update(update.get('$set', {}))
+        for key in update.get('$unset', {}):
+            document.pop(key, None)
+        self._index_many([document])
+        if row is None:
+            return UpdateResult(update_info={"n": 1, "updatedExisting": False, "ok": 1.0, "nModified": 0,
+                                             "upserted": document['_id']})
+        return UpdateResult(update_info={"n": 1, "updatedExisting": True, "ok": 1.0, "nModified": 1})
+
+    def delete_one(self, filter: dict, **kwargs):
+        row = next(iter(self._matching_rows(filter)), None)
+        if row is not None:
+            self._unindex(self._documents[row]['_id'])
+
+    def delete_many(self, filter: dict, **kwargs):
+        for row in self._matching_rows(filter):
+            self._unindex(self._documents[row]['_id'])
+
+    # --- Reads ---
+
+    def _matching_rows(self, filter: dict | None) -> list[int]:
+        if filter and set(filter) == {'_id'} and not isinstance(filter['_id'], dict):
+            row = self._rows.get(filter['_id'])
+            return [row] if row is not None else []
+        return [row for row, document in enumerate(self._documents)
+                if document is not None and matches(document, filter)]
+
+    def _bm25(self, query: str, rows: list[int]) -> dict[int, float]:
+        """BM25 scores of the candidate rows that contain at least one query term."""
+        live_count = len(self._rows)
+        if not live_count:
+            return {}
+        average_length = self._live_length_total / live_count or 1.0
+        candidates = set(rows)
+        scores = {}
+        for term in set(analyze(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (live_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for row, frequency in postings.items():
+                if row in candidates:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[row] / average_length)
+                    scores[row] = scores.get(row, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return scores
+
+    def _query_vector(self, sort_value) -> np.ndarray:
+        if isinstance(sort_value, str):
+            if not self.provider:
+                raise ValueError(f"Collection '{self.name}' has no embedding provider for $vectorize sorts")
+            sort_value = embed_texts([sort_value], self.provider, self.cache)[0]
+        return np.asarray(sort_value, dtype=np.float32)
+
+    def _vector_scores(self, query_vector: np.ndarray, rows: list[int]) -> dict[int, float]:
+        """Similarity ((1 + dot) / 2, as reported for dot_product collections) of the candidate rows that have a vector."""
+        rows = [row for row in rows if self._vectors[row] is not None]
+        if not rows:
+            return {}
+        dots = self._vector_matrix()[rows] @ query_vector
+        return dict(zip(rows, ((dots + 1) / 2).tolist()))
+
+    @staticmethod
+    def _top(scores: dict[int, float], limit: int | None) -> list[tuple[int, float]]:
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        return ranked[:limit] if limit is not None else ranked
+
+    def _field_sorted(self, rows: list[int], sort: dict) -> list[int]:
+        for path, direction in reversed(list(sort.items())):
+            rows = sorted(rows, key=lambda row: _field_sort_key(_get_path(self._documents[row], path)),
+                          reverse=direction < 0)
+        return rows
+
+    def find(self, filter: dict | None = None, *, projection: dict | None = None, sort: dict | None = None,
+             skip: int | None = None, limit: int | None = None, include_similarity: bool | None = None,
+             **kwargs) -> LocalCursor:
+        """Filters, then ranks by `$vector`/`$vectorize` similarity, `$lexical` BM25 or regular fields."""
+        rows = self._matching_rows(filter)
+        similarity = {}
+        sort = sort or {}
+        if '$vector' in sort or '$vectorize' in sort:
+            query_vector = self._query_vector(sort.get('$vector', sort.get('$vectorize')))
+            ranked = self._top(self._vector_scores(query_vector, rows), None)
+            rows = [row for row, _ in ranked]
+            similarity = dict(ranked)
+        elif '$lexical' in sort:
+            ranked = self._top(self._bm25(sort['$lexical'], rows), None)
+            rows = [row for row, _ in ranked]
+        elif sort:
+            rows = self._field_sorted(rows, sort)
+
+        rows = rows[skip or 0:]
+        if limit:
+            rows = rows[:limit]
+        results = LocalCursor()
+        for row in rows:
+            document = project(self._documents[row], projection)
+            if include_similarity and row in similarity:
+                document['$similarity'] = similarity[row]
+            results.append(document)
+        return results
+
+    def find_one(self, filter: dict | None = None, *, projection: dict | None = None, sort: dict | None = None,
+                 include_similarity: bool | None = None, **kwargs) -> dict | None:
+        results = self.find(filter, projection=projection, sort=sort, limit=1, include_similarity=include_similarity)
+        return results[0] if results else None
+
+    def find_and_rerank(self, filter: dict | None = None, *, sort: dict, projection: dict | None = None,
+                        limit: int | None = None, hybrid_limits: int | dict | None = None,
+                        include_scores: bool | None = None, **kwargs) -> LocalCursor:
+        """
+        Hybrid search: takes the top `hybrid_limits` rows of the BM25 and vector rankings
+        and fuses them with reciprocal rank fusion. Returns RerankedResult items.
+        """
+        query = sort.get('$hybrid')
+        if isinstance(query, dict):
+            lexical_query = query.get('$lexical')
+            vector_query = query.get('$vector', query.get('$vectorize'))
+        else:
+            lexical_query = vector_query = query
+        if isinstance(hybrid_limits, dict):
+            lexical_limit = hybrid_limits.get('$lexical', DEFAULT_HYBRID_LIMIT)
+            vector_limit = hybrid_limits.get('$vector', DEFAULT_HYBRID_LIMIT)
+        else:
+            lexical_limit = vector_limit = hybrid_limits or DEFAULT_HYBRID_LIMIT
+
+        rows = self._matching_rows(filter)
+        lexical_ranked = self._top(self._bm25(lexical_query, rows), lexical_limit) if lexical_query else []
+        vector_ranked = []
+        if vector_query is not None and (self.provider or not isinstance(vector_query, str)):
+            vector_ranked = self._top(self._vector_scores(self._query_vector(vector_query), rows), vector_limit)
+
+        fused = {}
+        for ranking in (lexical_ranked, vector_ranked):
+            for rank, (row, _) in enumerate(ranking, 1):
+                fused[row] = fused.get(row, 0.0) + 1.0 / (RRF_K + rank)
+        lexical_scores = dict(lexical_ranked)
+        vector_scores = dict(vector_ranked)
+
+        results = LocalCursor()
+        for row, score in self._top(fused, limit or 10):
+            scores = {'$rerank': score, '$lexical': lexical_scores.get(row), '$vector': vector_scores.get(row)} if include_scores else {}
+            results.append(RerankedResult(document=project(self._documents[row], projection), scores=scores))
+        return results
+
+    def count_documents(self, filter: dict | None = None, upper_bound: int | None = None, **kwargs) -> int:
+        return len(self._matching_rows(filter))
+
+    def distinct(self, key: str, filter: dict | None = None, **kwargs) -> list:
+        values = []
+        for row in self._matching_rows(filter):
+            value = _get_path(self._documents[row], key)
+            for item in value if isinstance(value, list) else [value]:
+                if item is not _MISSING and item not in values:
+                    values.append(item)
+        return values
+
+# --- Catalog loading ---
+
+def load_catalog_collections(root: str = ".", provider=None, cache: EmbeddingCache | None = None) -> dict[str, LocalCollection]:
+    """
+    Builds the local `products` and `documents` collections from the JSONL catalog, indexing
+    the same text the loaders send to Astra (as_markdown() for products, `text` for documents).
+    """
+    products = LocalCollection("products", provider, cache)
+    for file_path in catalog_files(PRODUCT_FILES_GLOB, root):
+        rows = []
+        for _, product in iter_products(file_path):
+            row = product.to_dict()
+            markdown = as_markdown(row)
+            if markdown:
+                row['$hybrid'] = markdown
+            rows.append(row)
+        products.insert_many(rows)
+
+    documents = LocalCollection("documents", provider, cache)
+    for file_path in catalog_files(DOCUMENT_FILES_GLOB, root):
+        rows = []
+        for _, document in iter_documents(file_path):
+            row = document.to_dict()
+            if row.get('text'):
+                row['$hybrid'] = row['text']
+            rows.append(row)
+        documents.insert_many(rows)
+    return {"products": products, "documents": documents}
+
+def build_filter(family: str | None = None, product_type: str | None = None, tags: list[str] | None = None) -> dict:
+    """Builds the same family/type/tag filter as the app's /search page."""
+    conditions = []
+    if family:
+        conditions.append({'family': family, 'product_type': product_type} if product_type else {'family': family})
+    elif product_type:
+        conditions.append({'product_type': product_type})
+    if tags:
+        conditions.append({'tags': {'$all': tags}})
+    if len(conditions) > 1:
+        return {'$and': conditions}
+    return conditions[0] if conditions else {}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search the catalog locally with BM25, vectors or both (RRF).")
+    parser.add_argument("query", help="Search text.")
+    parser.add_argument("--collection", choices=["products", "documents"], default="products")
+    parser.add_argument("--mode", choices=["hybrid", "lexical", "vector"], default="hybrid")
+    parser.add_argument("--family", help="Only products/documents of this family.")
+    parser.add_argument("--type", dest="product_type", help="Only this product_type.")
+    parser.add_argument("--tag", action="append", dest="tags", help="Required tag (repeatable).")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--embeddings", choices=sorted(PROVIDERS),
+                        help="Embedding provider for the vector side ('fake' gives deterministic offline vectors with no "
+                             "semantics). Without one, hybrid ranks with BM25 alone.")
+    args = parser.parse_args()
+    if args.mode == "vector" and not args.embeddings:
+        parser.error("--mode vector needs --embeddings.")
+
+    started = time.perf_counter()
+    collections = load_catalog_collections(provider=get_provider(args.embeddings) if args.embeddings else None)
+    print(f"Indexed {len(collections['products']._rows)} products and {len(collections['documents']._rows)} documents "
+          f"in {time.perf_counter() - started:.2f}s")
+
+    collection = collections[args.collection]
+    search_filter = build_filter(args.family, args.product_type, args.tags)
+    label_field = 'name' if args.collection == 'products' else 'title'
+    started = time.perf_counter()
+    if args.mode == "hybrid":
+        hits = [(hit.scores['$rerank'], hit.document)
+                for hit in collection.find_and_rerank(search_filter, sort={'$hybrid': args.query}, limit=args.limit, include_scores=True)]
+    elif args.mode == "lexical":
+        hits = [(None, document) for document in collection.find(search_filter, sort={'$lexical': args.query}, limit=args.limit)]
+    else:
+        hits = [(document.pop('$similarity'), document)
+                for document in collection.find(search_filter, sort={'$vectorize': args.query}, limit=args.limit, include_similarity=True)]
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    for rank, (score, document) in enumerate(hits, 1):
+        score_text = f"{score:.4f}" if score is not None else "-"
+        print(f"{rank:2d}. [{score_text}] {document['_id']}: {document.get(label_field)}")
+    print(f"{len(hits)} result(s) in {elapsed_ms:.1f} ms")
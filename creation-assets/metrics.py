@@ -0,0 +1,232 @@
+import os
+import sys
+import json
+import time
+import uuid
+import bisect
+import random
+import argparse
+import threading
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the Prometheus histogram buckets used for timers
+TIMER_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+METRIC_PREFIX = "catalog_" # Prometheus metric name prefix
+RESERVOIR_SIZE = 4096 # Observations sampled per series for percentiles (exact up to this many)
+
+def family_of(file_path: str) -> str:
+    """Family label for a catalog file: products/<family>/documents.jsonl -> <family>."""
+    return os.path.basename(os.path.dirname(file_path)) or "unknown"
+
+class Histogram:
+    """
+    One series in constant memory: count, sum, min, max and TIMER_BUCKETS counts are exact, and
+    percentiles come from a uniform reservoir sample of RESERVOIR_SIZE observations, so they are
+    exact for short runs and estimates for series with millions of observations.
+    """
+
+    def __init__(self, reservoir_size: int = RESERVOIR_SIZE):
+        self.reservoir_size = reservoir_size
+        self.sample = []
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.bucket_counts = [0] * (len(TIMER_BUCKETS) + 1) # Per bucket, not cumulative; the last one is +Inf
+        self._rng = random.Random(0)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self.bucket_counts[bisect.bisect_left(TIMER_BUCKETS, value)] += 1
+        if len(self.sample) < self.reservoir_size:
+            self.sample.append(value)
+        else:
+            # Algorithm R: every observation so far stays in the sample with equal probability
+            slot = int(self._rng.random() * self.count)
+            if slot < self.reservoir_size:
+                self.sample[slot] = value
+
+    def percentile(self, pct: float) -> float:
+        ordered = sorted(self.sample)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+    def cumulative_buckets(self) -> list[tuple[float, int]]:
+        """(upper bound, observations <= bound) for each of TIMER_BUCKETS."""
+        running = 0
+        buckets = []
+        for bound, in_bucket in zip(TIMER_BUCKETS, self.bucket_counts):
+            running += in_bucket
+            buckets.append((bound, running))
+        return buckets
+
+    def snapshot(self) -> dict:
+        return {"count": self.count, "sum": self.total, "min": self.min or 0.0, "max": self.max or 0.0,
+                "p50": self.percentile(50), "p95": self.percentile(95)}
+
+class Metrics:
+    """
+    Thread-safe registry of counters, histograms and timers (histograms of seconds).
+    Each series is identified by a name and labels such as stage and family.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {} # (name, labels) -> value
+        self.histograms = {} # (name, labels) -> Histogram
+        self.timer_names = set()
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started_at = time.time()
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+    def count(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.histograms.setdefault(key, Histogram()).observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Times the enclosed block (wall clock, also across awaits) into the `name` timer."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+            with self.lock:
+                self.timer_names.add(name)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.timer_names.clear()
+
+    # --- Exporters ---
+
+    def records(self, script: str) -> list[dict]:
+        """One JSON-serializable record per series, tagged with the run."""
+        base = {"run_id": self.run_id, "script": script, "timestamp": time.time(), "run_seconds": time.time() - self.started_at}
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, histogram.snapshot()) for key, histogram in self.histograms.items())
+            timer_names = set(self.timer_names)
+        records = [{**base, "name": name, "labels": dict(labels), "type": "counter", "value": value}
+                   for (name, labels), value in counters]
+        records += [{**base, "name": name, "labels": dict(labels), "type": "timer" if name in timer_names else "histogram", **snapshot}
+                    for (name, labels), snapshot in histograms]
+        return records
+
+    def write_jsonl(self, path: str, script: str):
+        """Appends this run's series to a JSON-lines file, so runs can be compared over time."""
+        with open(path, 'a', encoding='utf-8') as f:
+            for record in self.records(script):
+                f.write(json.dumps(record) + '\n')
+
+    def prometheus_text(self, script: str) -> str:
+        """Renders the series in the Prometheus text exposition format (for node_exporter's textfile collector)."""
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items())
+            timer_names = set(self.timer_names)
+
+        def label_text(labels, extra=()):
+            pairs = [("script", script), *labels, *extra]
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+        declared = set()
+        for (name, labels), value in counters:
+            metric = f"{METRIC_PREFIX}{name}_total"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} counter")
+                declared.add(metric)
+            lines.append(f"{metric}{label_text(labels)} {value}")
+        for (name, labels), histogram in histograms:
+            metric = f"{METRIC_PREFIX}{name}"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} {'histogram' if name in timer_names else 'summary'}")
+                declared.add(metric)
+            if name in timer_names:
+                for bound, in_bucket in histogram.cumulative_buckets():
+                    lines.append(f"{metric}_bucket{label_text(labels, [('le', bound)])} {in_bucket}")
+                lines.append(f"{metric}_bucket{label_text(labels, [('le', '+Inf')])} {histogram.count}")
+            lines.append(f"{metric}_sum{label_text(labels)} {histogram.total}")
+            lines.append(f"{metric}_count{label_text(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str, script: str):
+        """Atomically writes the textfile (temp file + os.replace), so the collector never reads a partial file."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text(script))
+        os.replace(tmp_path, path)
+
+    def summary_table(self) -> str:
+        """End-of-run table of every timer/histogram (count, total, mean, p50, p95, max) and counter."""
+        with self.lock:
+            histograms = sorted((key, histogram.snapshot()) for key, histogram in self.histograms.items())
+            counters = sorted(self.counters.items())
+        if not histograms and not counters:
+            return "No metrics recorded."
+
+        def series(name, labels):
+            return name + (" " + ",".join(f"{k}={v}" for k, v in labels) if labels else "")
+
+        rows = [("series", "count", "total", "mean", "p50", "p95", "max")]
+        for (name, labels), s in histograms:
+            mean = s["sum"] / s["count"] if s["count"] else 0.0
+            rows.append((series(name, labels), str(s["count"]), f"{s['sum']:.3f}", f"{mean:.4f}",
+                         f"{s['p50']:.4f}", f"{s['p95']:.4f}", f"{s['max']:.4f}"))
+        for (name, labels), value in counters:
+            rows.append((series(name, labels), f"{value:g}", "", "", "", "", ""))
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        lines = []
+        for index, row in enumerate(rows):
+            lines.append("  ".join(cell.ljust(widths[i]) if i == 0 else cell.rjust(widths[i]) for i, cell in enumerate(row)).rstrip())
+            if index == 0:
+                lines.append("  ".join("-" * width for width in widths))
+        return "\n".join(lines)
+
+METRICS = Metrics() # Process-wide registry used by the creation-assets scripts
+
+count = METRICS.count
+observe = METRICS.observe
+timer = METRICS.timer
+
+def add_metrics_arguments(parser: argparse.ArgumentParser):
+    """Adds the shared --metrics-jsonl / --metrics-prom / --no-metrics-summary options to a script CLI."""
+    parser.add_argument("--metrics-jsonl", default=os.getenv("METRICS_JSONL"),
+                        help="Append this run's metrics to a JSON-lines file (default: $METRICS_JSONL).")
+    parser.add_argument("--metrics-prom", default=os.getenv("METRICS_PROM"),
+                        help="Write this run's metrics as a Prometheus textfile (default: $METRICS_PROM).")
+    parser.add_argument("--no-metrics-summary", action="store_true",
+                        help="Don't print the metrics summary table at the end of the run.")
+
+def report_metrics(args: argparse.Namespace, script: str | None = None, stream=None):
+    """
+    Prints the summary table and writes the exporters requested on the command line.
+    Scripts whose stdout is machine-readable pass `stream=sys.stderr`.
+    """
+    script = script or os.path.splitext(os.path.basename(sys.argv[0]))[0]
+    stream = stream or sys.stdout
+    if not args.no_metrics_summary:
+        print(f"\nMetrics ({script}, run {METRICS.run_id}):", file=stream)
+        print(METRICS.summary_table(), file=stream)
+    if args.metrics_jsonl:
+        METRICS.write_jsonl(args.metrics_jsonl, script)
+        print(f"Metrics appended to {args.metrics_jsonl}", file=stream)
+    if args.metrics_prom:
+        METRICS.write_prometheus(args.metrics_prom, script)
+        print(f"Metrics written to {args.metrics_prom}", file=stream)
@@ -0,0 +1,183 @@
+import re
+import zlib
+import argparse
+import unicodedata
+from functools import wraps
+import numpy as np
+from catalog import DOCUMENT_FILES_GLOB, catalog_files, iter_documents
+from chunk_documents import DEFAULT_MAX_TOKENS, DEFAULT_OVERLAP_TOKENS, count_tokens, iter_chunk_records
+from metrics import add_metrics_arguments, count, family_of, report_metrics, timer
+
+DEFAULT_THRESHOLD = 0.85 # Estimated Jaccard similarity of word shingles at which texts count as near-duplicates
+DEFAULT_NUM_PERM = 128 # MinHash permutations per signature
+DEFAULT_BANDS = 16 # LSH bands (of NUM_PERM / BANDS rows); candidates from ~0.7 similarity up, then verified
+SHINGLE_SIZE = 5 # Words per shingle
+HASH_PRIME = 4294967291 # Largest prime below 2^32
+DEDUP_MODES = ("reuse", "skip")
+# Loader thresholds per --dedup mode. "reuse" gives a document the vector of another document's
+# text, so it only applies to texts that are all but identical; "skip" only drops repeated chunks.
+DEDUP_THRESHOLDS = {"reuse": 0.95, "skip": DEFAULT_THRESHOLD}
+WORD_REGEX = re.compile(r'\w+')
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """crc32 hashes of the distinct word `size`-grams of the normalized text (the whole text if it is shorter)."""
+    words = WORD_REGEX.findall(unicodedata.normalize('NFKC', text or "").casefold())
+    grams = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+    return np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in grams), dtype=np.uint64, count=len(grams))
+
+class MinHasher:
+    """MinHash signatures from `num_perm` seeded universal hash functions (a*x + b) mod HASH_PRIME."""
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        # a, b < HASH_PRIME and x < 2^32 keep a*x + b below 2^64, so uint64 arithmetic never wraps
+        self.a = rng.integers(1, HASH_PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self.b = rng.integers(0, HASH_PRIME, size=(num_perm, 1), dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingles(text)
+        return ((self.a * hashes[np.newaxis, :] + self.b) % np.uint64(HASH_PRIME)).min(axis=1)
+
+def similarity(signature: np.ndarray, other: np.ndarray) -> float:
+    """Estimated Jaccard similarity: the share of matching signature slots."""
+    return float(np.mean(signature == other))
+
+class NearDuplicateIndex:
+    """
+    LSH over MinHash signatures. Each signature is cut into `bands` bands and a key lands in one
+    bucket per band; keys sharing any bucket are candidates, kept if their estimated similarity
+    reaches `threshold`.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = DEFAULT_NUM_PERM, bands: int = DEFAULT_BANDS):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.rows = num_perm // bands
+        self.buckets = [{} for _ in range(bands)] # band -> band bytes -> [key, ...]
+        self.signatures = {}
+
+    def _bands(self, signature: np.ndarray):
+        for band, buckets in enumerate(self.buckets):
+            yield buckets, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, key, signature: np.ndarray):
+        self.signatures[key] = signature
+        for buckets, band_key in self._bands(signature):
+            buckets.setdefault(band_key, []).append(key)
+
+    def query(self, signature: np.ndarray) -> tuple | None:
+        """(key, similarity) of the most similar indexed signature at or above the threshold, or None."""
+        candidates = {key for buckets, band_key in self._bands(signature) for key in buckets.get(band_key, ())}
+        best = None
+        for key in candidates:
+            score = similarity(signature, self.signatures[key])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
+
+def find_near_duplicates(records: list[dict], text_field: str = 'text', threshold: float = DEFAULT_THRESHOLD,
+                         hasher: MinHasher | None = None) -> dict:
+    """
+    Maps the `_id` of every near-duplicate record to (representative `_id`, estimated similarity).
+    Records are taken in order and the first of each group is its representative; only
+    representatives are indexed, so a group never drifts away from its representative by chaining.
+    """
+    hasher = hasher or MinHasher()
+    index = NearDuplicateIndex(threshold)
+    duplicates = {}
+    for record in records:
+        text = record.get(text_field)
+        if not text or not isinstance(text, str):
+            continue
+        signature = hasher.signature(text)
+        match = index.query(signature)
+        if match:
+            duplicates[record['_id']] = match
+        else:
+            index.add(record['_id'], signature)
+    return duplicates
+
+def apply_dedup(documents: list[dict], text_field_name: str, mode: str = "reuse", threshold: float | None = None,
+                file_path: str = "") -> list[dict]:
+    """
+    Deduplicates prepared documents on the text they are embedded from (`text_field_name`).
+    "reuse" keeps every document, tags near-duplicates with `duplicate_of` and embeds them from
+    their representative's text, so they share its vector (with client-side embeddings, a single
+    embedding call); hybrid collections keep each document's own `$lexical` text.
+    "skip" drops near-duplicates entirely, e.g. repeated boilerplate chunks.
+    `threshold` defaults to the mode's entry in DEDUP_THRESHOLDS.
+    """
+    if mode not in DEDUP_MODES:
+        raise ValueError(f"Unknown dedup mode '{mode}'. Choose from: {', '.join(DEDUP_MODES)}")
+    threshold = DEDUP_THRESHOLDS[mode] if threshold is None else threshold
+    with timer("stage_seconds", stage="dedup", family=family_of(file_path)):
+        duplicates = find_near_duplicates(documents, text_field_name, threshold)
+    count("near_duplicates", len(duplicates), mode=mode, family=family_of(file_path))
+    if mode == "skip":
+        return [doc for doc in documents if doc.get('_id') not in duplicates]
+
+    texts = {doc.get('_id'): doc.get(text_field_name) for doc in documents}
+    deduplicated = []
+    for doc in documents:
+        match = duplicates.get(doc.get('_id'))
+        if match:
+            doc = doc.copy()
+            representative_text = texts[match[0]]
+            doc['duplicate_of'] = match[0]
+            if text_field_name == '$hybrid':
+                doc['$hybrid'] = {"$vectorize": representative_text, "$lexical": doc['$hybrid']}
+            else:
+                doc[text_field_name] = representative_text
+        deduplicated.append(doc)
+    return deduplicated
+
+def deduplicated(read_file, mode: str = "reuse", threshold: float | None = None):
+    """Wraps a loader's `read_file(file_path, text_field_name)` so each file's documents go through apply_dedup."""
+    @wraps(read_file)
+    def read_deduplicated(file_path: str, text_field_name: str, **kwargs) -> list[dict]:
+        documents = read_file(file_path, text_field_name, **kwargs)
+        return apply_dedup(documents, text_field_name, mode, threshold, file_path)
+    return read_deduplicated
+
+def add_dedup_arguments(parser: argparse.ArgumentParser):
+    """Adds the shared --dedup / --dedup-threshold options to a loader CLI."""
+    parser.add_argument("--dedup", choices=DEDUP_MODES,
+                        help="Detect near-duplicate texts within each file (MinHash/LSH). 'reuse' (needs --client-embeddings) "
+                             "embeds them from one representative text and tags them with duplicate_of; 'skip' "
+                             "(needs --chunk-documents) leaves them out.")
+    parser.add_argument("--dedup-threshold", type=float,
+                        help="Estimated Jaccard similarity of 5-word shingles for --dedup (default: "
+                             + ", ".join(f"{threshold} for {mode}" for mode, threshold in DEDUP_THRESHOLDS.items()) + ").")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report near-duplicate documents (or chunks) per documents.jsonl file and the embedding work --dedup would save.")
+    parser.add_argument("--chunks", action="store_true", help="Compare chunks instead of whole documents.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Estimated Jaccard similarity (default: {DEFAULT_THRESHOLD}).")
+    parser.add_argument("--max-chunk-tokens", type=int, default=DEFAULT_MAX_TOKENS)
+    parser.add_argument("--chunk-overlap-tokens", type=int, default=DEFAULT_OVERLAP_TOKENS)
+    parser.add_argument("--show", type=int, default=5, help="Duplicates listed per file (default: 5).")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    total_records = total_duplicates = total_tokens = saved_tokens = 0
+    for file_path in catalog_files(DOCUMENT_FILES_GLOB):
+        records = [document.to_dict() for _, document in iter_documents(file_path)]
+        if args.chunks:
+            records = [chunk for row in records
+                       for chunk in iter_chunk_records(row, args.max_chunk_tokens, args.chunk_overlap_tokens)]
+        with timer("stage_seconds", stage="dedup", family=family_of(file_path)):
+            duplicates = find_near_duplicates(records, threshold=args.threshold)
+        tokens = {record['_id']: count_tokens(record.get('text') or "") for record in records}
+        total_records += len(records)
+        total_duplicates += len(duplicates)
+        total_tokens += sum(tokens.values())
+        saved_tokens += sum(tokens[record_id] for record_id in duplicates)
+        print(f"{file_path}: {len(duplicates)}/{len(records)} near-duplicate {'chunks' if args.chunks else 'documents'}")
+        for record_id, (representative, score) in list(duplicates.items())[:args.show]:
+            print(f"    {record_id} ~ {representative} ({score:.2f})")
+    share = saved_tokens / total_tokens if total_tokens else 0.0
+    print(f"\nTotal: {total_duplicates}/{total_records} near-duplicates; {saved_tokens}/{total_tokens} "
+          f"embedding tokens ({share:.1%}) would not need embedding.")
+    report_metrics(args)
@@ -0,0 +1,153 @@
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import argparse
+import threading
+import tracemalloc
+from datetime import datetime
+from contextlib import contextmanager
+from metrics import observe
+
+PROFILE_DIR = ".profiles" # Where --profile writes its reports; relative to the working directory
+DEFAULT_PROFILE_TOP = 25 # Functions / allocation sites listed in each report
+TRACEMALLOC_FRAMES = 10 # Stack depth kept per allocation (deeper is slower)
+
+# Python 3.12+ runs cProfile on sys.monitoring: one profiler sees every thread, and a second one
+# can't be enabled while it is active
+PROFILER_COVERS_ALL_THREADS = sys.version_info >= (3, 12)
+
+class ThreadProfilers:
+    """
+    On 3.11, cProfile only sees the thread that enabled it, so this hooks threading.setprofile to
+    give every thread started during the run (file, insert and LLM worker pools) its own profiler.
+    Their stats are merged with the main thread's at the end. On 3.12+ the main profiler already
+    covers all threads and no hook is installed.
+    Times are summed over threads, so they can exceed wall time, and idle pool workers show up
+    as time in lock acquire / queue get.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.profilers = []
+
+    def _start_thread(self, frame, event, arg):
+        # Called once, on the first event of a new thread; enabling the profiler replaces this hook
+        profiler = cProfile.Profile()
+        with self.lock:
+            self.profilers.append(profiler)
+        profiler.enable()
+
+    def start(self) -> cProfile.Profile:
+        if not PROFILER_COVERS_ALL_THREADS:
+            threading.setprofile(self._start_thread)
+        main_profiler = cProfile.Profile()
+        self.profilers.append(main_profiler)
+        main_profiler.enable()
+        return main_profiler
+
+    def stop(self) -> pstats.Stats:
+        if not PROFILER_COVERS_ALL_THREADS:
+            threading.setprofile(None)
+        self.profilers[0].disable()
+        with self.lock:
+            profilers = list(self.profilers)
+        stats = pstats.Stats(profilers[0])
+        for profiler in profilers[1:]:
+            profiler.disable()
+            try:
+                stats.add(profiler)
+            except TypeError: # A thread that never made a profiled call
+                pass
+        return stats
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    """Adds the shared --profile / --profile-top options to a script CLI."""
+    parser.add_argument("--profile", nargs="?", const=PROFILE_DIR, metavar="DIR",
+                        help=f"Profile the run: write cProfile stats, tracemalloc top allocations and a "
+                             f"wall-vs-CPU breakdown to DIR (default: {PROFILE_DIR}).")
+    parser.add_argument("--profile-top", type=int, default=DEFAULT_PROFILE_TOP,
+                        help=f"Functions and allocation sites listed in the profile reports (default: {DEFAULT_PROFILE_TOP}).")
+
+def stats_text(stats: pstats.Stats, sort: str, top: int) -> str:
+    """pstats report of the top functions by `sort`."""
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.sort_stats(sort).print_stats(top)
+    return stream.getvalue()
+
+def time_breakdown(wall: float, cpu_start: os.times_result, cpu_end: os.times_result) -> tuple[str, float]:
+    """Summarizes wall vs CPU time. CPU covers all threads, so it can exceed wall time when threads compute in parallel."""
+    user = cpu_end.user - cpu_start.user
+    system = cpu_end.system - cpu_start.system
+    cpu = user + system
+    waiting = max(0.0, wall - cpu)
+    share = waiting / wall * 100 if wall else 0.0
+    return (f"wall {wall:.2f}s, CPU {cpu:.2f}s (user {user:.2f}s, system {system:.2f}s), "
+            f"off-CPU {waiting:.2f}s ({share:.0f}% blocked on I/O, network or locks)"), cpu
+
+@contextmanager
+def profiled(args: argparse.Namespace, script: str | None = None, stream=None):
+    """
+    Profiles the enclosed block when --profile was given, otherwise does nothing.
+    Writes <script>-<time>.prof (cProfile, for pstats or snakeviz), .cpu.txt (top functions by
+    own and cumulative time) and .alloc.txt (tracemalloc top allocation sites and peak memory)
+    to the profile directory, and prints the wall-vs-CPU breakdown and the hottest functions.
+    """
+    if not getattr(args, "profile", None):
+        yield
+        return
+    script = script or os.path.splitext(os.path.basename(sys.argv[0]))[0]
+    stream = stream or sys.stdout
+    top = args.profile_top
+    os.makedirs(args.profile, exist_ok=True)
+    base = os.path.join(args.profile, f"{script}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+    profilers = ThreadProfilers()
+    cpu_start = os.times()
+    started = time.perf_counter()
+    profilers.start()
+    try:
+        yield
+    finally:
+        stats = profilers.stop()
+        wall = time.perf_counter() - started
+        cpu_end = os.times()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        breakdown, cpu = time_breakdown(wall, cpu_start, cpu_end)
+        observe("profile_seconds", wall, clock="wall")
+        observe("profile_seconds", cpu, clock="cpu")
+
+        stats.dump_stats(f"{base}.prof")
+        with open(f"{base}.cpu.txt", 'w', encoding='utf-8') as f:
+            f.write(f"{script}: {breakdown}\n\n")
+            f.write(f"Top {top} functions by own time:\n{stats_text(stats, 'tottime', top)}\n")
+            f.write(f"Top {top} functions by cumulative time:\n{stats_text(stats, 'cumulative', top)}")
+
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ])
+        with open(f"{base}.alloc.txt", 'w', encoding='utf-8') as f:
+            f.write(f"{script}: traced memory {current / 2**20:.1f} MiB at exit, peak {peak / 2**20:.1f} MiB\n\n")
+            f.write(f"Top {top} allocation sites by size:\n")
+            for statistic in snapshot.statistics('lineno')[:top]:
+                f.write(f"{statistic}\n")
+            f.write(f"\nTop {top} allocation tracebacks:\n")
+            for statistic in snapshot.statistics('traceback')[:top]:
+                f.write(f"{statistic.size / 1024:.1f} KiB in {statistic.count} block(s)\n")
+                f.write("\n".join(f"    {line}" for line in statistic.traceback.format()) + "\n")
+
+        print(f"\nProfile ({script}): {breakdown}", file=stream)
+        print(f"Peak traced memory {peak / 2**20:.1f} MiB. Hottest functions by own time:", file=stream)
+        for (file_name, line, function), (_, calls, own, cumulative, _) in sorted(
+                stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:10]:
+            location = f"{os.path.basename(file_name)}:{line}({function})" if line else function
+            print(f"  {own:8.3f}s own {cumulative:8.3f}s cum {calls:>9} calls  {location}", file=stream)
+        print(f"Profile written to {base}.prof, {base}.cpu.txt and {base}.alloc.txt", file=stream)
@@ -0,0 +1,53 @@
+import os
+import json
+import hashlib
+
+PROMPT_MANIFEST_PATH = "image-prompt-hashes.json" # Sidecar of generated images; relative to creation-assets
+
+def prompt_hash(prompt: str) -> str:
+    """sha256 of the prompt text that produces an image."""
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+class PromptManifest:
+    """
+    Records, for every generated image, the hash of the prompt that produced it
+    ({image path: {"id", "prompt_hash"}}), so an image is regenerated only when its prompt changes.
+    """
+
+    def __init__(self, path: str = PROMPT_MANIFEST_PATH):
+        self.path = path
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+
+    @staticmethod
+    def key(image_path: str) -> str:
+        return os.path.normpath(image_path).replace(os.sep, '/')
+
+    def get(self, image_path: str) -> dict | None:
+        return self.entries.get(self.key(image_path))
+
+    def is_current(self, image_path: str, prompt_digest: str) -> bool:
+        """True if the image exists and was produced by the prompt with this hash."""
+        entry = self.get(image_path)
+        return bool(entry) and entry.get("prompt_hash") == prompt_digest and os.path.exists(image_path)
+
+    def find_image(self, prompt_digest: str) -> str | None:
+        """Returns an existing image produced by this prompt, e.g. one left under a product's old ID."""
+        for image_path, entry in self.entries.items():
+            if entry.get("prompt_hash") == prompt_digest and os.path.exists(image_path):
+                return image_path
+        return None
+
+    def record(self, image_path: str, product_id: str, prompt_digest: str):
+        self.entries[self.key(image_path)] = {"id": product_id, "prompt_hash": prompt_digest}
+
+    def save(self):
+        """Atomically writes the manifest (temp file + os.replace)."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(sorted(self.entries.items())), f, indent=1)
+            f.write('\n')
+        os.replace(tmp_path, self.path)
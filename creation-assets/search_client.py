@@ -0,0 +1,216 @@
+import os
+import time
+import argparse
+import threading
+import unicodedata
+from collections import OrderedDict
+from embedding_cache import DEFAULT_CACHE_PATH, EmbeddingCache, embed_texts, get_provider, PROVIDERS
+from local_search import build_filter
+from metrics import add_metrics_arguments, count, report_metrics, timer
+
+DEFAULT_RESULT_CACHE_SIZE = 1024 # Cached result lists (LRU beyond this)
+DEFAULT_RESULT_TTL = 300 # Seconds before a cached result list is fetched again
+DEFAULT_QUERY_VECTOR_CACHE_SIZE = 4096 # Query embeddings kept in memory, in front of the SQLite cache
+DEFAULT_LIMIT = 20
+MODES = ("hybrid", "vector", "lexical")
+RESULT_PROJECTION = {"$vector": 0} # Never ship vectors back to the client
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire `ttl` seconds after they were stored (ttl=None: never)."""
+
+    def __init__(self, max_size: int, ttl: float | None = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict() # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+def normalize_query(query: str | None) -> str:
+    """Case, width and whitespace variants of a query share one cache entry."""
+    return " ".join(unicodedata.normalize('NFKC', query or "").casefold().split())
+
+def result_key(collection: str, query: str, mode: str, family: str | None, product_type: str | None,
+               tags: list[str] | None, limit: int) -> tuple:
+    """Result cache key over the normalized query and filters (tag order and duplicates don't matter)."""
+    return (collection, normalize_query(query), mode, family or None, product_type or None,
+            tuple(sorted(set(tags or ()))), limit)
+
+class SearchClient:
+    """
+    Catalog search over the `products` and `documents` collections with the filters of the
+    app's /search page (family, product_type, tags) and hybrid, vector or lexical ranking.
+    Works with astrapy collections or local_search.LocalCollection stand-ins.
+
+    Result lists are cached (LRU + TTL) per normalized query and filters; cached results are
+    shared between callers and must not be modified. With an embedding `provider`, query
+    vectors are computed client-side through an in-memory LRU in front of the persistent
+    EmbeddingCache, so a repeated query never pays for an embedding; otherwise the server
+    vectorizes the query text on every uncached search.
+    """
+
+    def __init__(self, collections: dict, provider=None, embedding_cache: EmbeddingCache | None = None,
+                 result_cache_size: int = DEFAULT_RESULT_CACHE_SIZE, result_ttl: float | None = DEFAULT_RESULT_TTL,
+                 query_vector_cache_size: int = DEFAULT_QUERY_VECTOR_CACHE_SIZE):
+        self.collections = collections
+        self.provider = provider
+        self.embedding_cache = embedding_cache if embedding_cache is not None else EmbeddingCache(":memory:")
+        self.results = TTLCache(result_cache_size, result_ttl)
+        self.query_vectors = TTLCache(query_vector_cache_size) # Embeddings don't go stale for a fixed model
+
+    def query_vector(self, query: str) -> list[float]:
+        """Embedding of the normalized query, from memory, the SQLite cache or the provider."""
+        query = normalize_query(query)
+        vector = self.query_vectors.get(query)
+        count("query_vector_cache", result="hit" if vector is not None else "miss")
+        if vector is None:
+            vector = embed_texts([query], self.provider, self.embedding_cache)[0]
+            self.query_vectors.put(query, vector)
+        return vector
+
+    def _vector_sort(self, query: str) -> dict:
+        return {"$vector": self.query_vector(query)} if self.provider else {"$vectorize": query}
+
+    def _fetch(self, collection, query: str, mode: str, search_filter: dict, limit: int) -> list[dict]:
+        """Runs the search against the collection. Each hit is the document plus a `$score` (None for filter-only)."""
+        if not normalize_query(query):
+            return [{**document, "$score": None} for document in collection.find(search_filter, projection=RESULT_PROJECTION, limit=limit)]
+        if mode == "hybrid":
+            sort = {"$hybrid": {**self._vector_sort(query), "$lexical": query}} if self.provider else {"$hybrid": query}
+            hits = collection.find_and_rerank(search_filter, sort=sort, projection=RESULT_PROJECTION,
+                                              limit=limit, include_scores=True)
+            return [{**hit.document, "$score": hit.scores.get("$rerank")} for hit in hits]
+        if mode == "vector":
+            hits = collection.find(search_filter, sort=self._vector_sort(query), projection=RESULT_PROJECTION,
+                                   limit=limit, include_similarity=True)
+            return [{**document, "$score": document.pop("$similarity", None)} for document in hits]
+        hits = collection.find(search_filter, sort={"$lexical": query}, projection=RESULT_PROJECTION, limit=limit)
+        return [{**document, "$score": None} for document in hits]
+
+    def search(self, query: str | None = None, collection: str = "products", mode: str = "hybrid",
+               family: str | None = None, product_type: str | None = None, tags: list[str] | None = None,
+               limit: int = DEFAULT_LIMIT) -> list[dict]:
+        """
+        Returns up to `limit` matching documents, best first. Without a query this is the
+        filter-only listing of /search; with one it is ranked by `mode`.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown search mode '{mode}'. Choose from: {', '.join(MODES)}")
+        key = result_key(collection, query, mode, family, product_type, tags, limit)
+        cached = self.results.get(key)
+        count("search_cache", result="hit" if cached is not None else "miss", collection=collection)
+        if cached is not None:
+            return cached
+
+        with timer("request_seconds", op="search", collection=collection, mode=mode):
+            results = self._fetch(self.collections[collection], query, mode, build_filter(family, product_type, tags), limit)
+        self.results.put(key, results)
+        return results
+
+    def invalidate(self):
+        """Drops cached results, e.g. after the catalog was reloaded. Query embeddings stay valid."""
+        self.results.clear()
+
+def astra_collections(names=("products", "documents")) -> dict:
+    """Connects to the Astra DB collections named in `names` using the ASTRA_DB_* settings from .env."""
+    from dotenv import load_dotenv
+    from astrapy import DataAPIClient
+    load_dotenv()
+    client = DataAPIClient(os.getenv("ASTRA_DB_APPLICATION_TOKEN"))
+    db = client.get_database(os.getenv("ASTRA_DB_API_ENDPOINT"))
+    return {name: db.get_collection(name) for name in names}
+
+def add_search_cache_arguments(parser: argparse.ArgumentParser):
+    """Adds the shared result / query-embedding cache options to a search CLI."""
+    parser.add_argument("--result-cache-size", type=int, default=DEFAULT_RESULT_CACHE_SIZE,
+                        help=f"Result lists kept in the LRU cache (default: {DEFAULT_RESULT_CACHE_SIZE}; 0 disables it).")
+    parser.add_argument("--result-ttl", type=float, default=DEFAULT_RESULT_TTL,
+                        help=f"Seconds a cached result list stays valid (default: {DEFAULT_RESULT_TTL}).")
+    parser.add_argument("--embeddings", choices=sorted(PROVIDERS),
+                        help="Embed queries client-side with this provider, cached in memory and in --embedding-cache "
+                             "(default: server-side vectorize for Astra; none for --backend local, where hybrid then "
+                             "ranks with BM25 alone).")
+    parser.add_argument("--embedding-cache", default=DEFAULT_CACHE_PATH,
+                        help=f"SQLite query embedding cache (default: {DEFAULT_CACHE_PATH}).")
+
+def client_from_args(args: argparse.Namespace) -> SearchClient:
+    """Builds the SearchClient requested on the command line."""
+    provider = get_provider(args.embeddings) if args.embeddings else None
+    if args.backend == "local":
+        from local_search import load_catalog_collections
+        collections = load_catalog_collections(provider=provider)
+    else:
+        collections = astra_collections()
+    return SearchClient(collections, provider=provider,
+                        embedding_cache=EmbeddingCache(args.embedding_cache) if provider else None,
+                        result_cache_size=args.result_cache_size, result_ttl=args.result_ttl)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search the catalog with the /search filters and hybrid ranking, with result caching.")
+    parser.add_argument("queries", nargs="*", help="Search text(s). Without any, lists the filtered products like /search.")
+    parser.add_argument("--queries-file", help="File with one query per line, searched after the positional queries.")
+    parser.add_argument("--collection", choices=["products", "documents"], default="products")
+    parser.add_argument("--mode", choices=MODES, default="hybrid")
+    parser.add_argument("--family", help="Only products/documents of this family.")
+    parser.add_argument("--type", dest="product_type", help="Only this product_type.")
+    parser.add_argument("--tag", action="append", dest="tags", help="Required tag (repeatable).")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    parser.add_argument("--backend", choices=["astra", "local"], default="astra",
+                        help="Search Astra DB, or an in-memory index of the JSONL files (default: astra).")
+    parser.add_argument("--repeat", type=int, default=1, help="Run every query this many times (shows the cache at work).")
+    add_search_cache_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1.")
+    if args.backend == "local" and args.mode == "vector" and not args.embeddings:
+        parser.error("--mode vector with --backend local needs --embeddings.")
+
+    queries = list(args.queries)
+    if args.queries_file:
+        with open(args.queries_file, 'r', encoding='utf-8') as f:
+            queries.extend(line.strip() for line in f if line.strip())
+    client = client_from_args(args)
+    label_field = 'name' if args.collection == 'products' else 'title'
+    for query in queries or [None]:
+        for attempt in range(args.repeat):
+            started = time.perf_counter()
+            results = client.search(query, collection=args.collection, mode=args.mode, family=args.family,
+                                    product_type=args.product_type, tags=args.tags, limit=args.limit)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"\n{query or '(no query)'}: {len(results)} result(s), last run {elapsed_ms:.3f} ms")
+        for rank, document in enumerate(results, 1):
+            score = f"{document['$score']:.4f}" if document['$score'] is not None else "-"
+            print(f"{rank:2d}. [{score}] {document['_id']}: {document.get(label_field)}")
+    print(f"\nResult cache: {client.results.hits} hit(s), {client.results.misses} miss(es); "
+          f"query embeddings cached: {len(client.query_vectors)}")
+    report_metrics(args)
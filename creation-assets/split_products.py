@@ -1,26 +1,64 @@
 import json
 import os
+import re
+import argparse
 from pathlib import Path
+from catalog import iter_jsonl
+from metrics import add_metrics_arguments, count, report_metrics, timer
+from profiling import add_profile_arguments, profiled
 
-def create_family_directories():
-    """Create directories for each product family if they don't exist."""
-    families = {
-        "ConstructoBots": "constructobots",
-        "LogicLeaps": "logicleaps",
-        "ImagiWorlds": "imagiworlds",
-        "KinetiKits": "kinetikits",
-        "CreatiSpark": "creatispark"
-    }
-    
-    # Create products parent directory
-    products_dir = Path("products")
-    products_dir.mkdir(exist_ok=True)
-    
-    # Create family subdirectories
-    for family in families.values():
-        (products_dir / family).mkdir(exist_ok=True)
-    
-    return families
+PRODUCTS_FILE = "products.jsonl"
+PRODUCTS_DIR = Path("products")
+MAX_REPORTED_SKIPS = 20 # Skipped rows listed individually; the rest are only counted
+
+def family_directory_name(family):
+    """Directory name for a family, e.g. "ConstructoBots" -> "constructobots"."""
+    return re.sub(r'[^a-z0-9_-]', '', family.lower())
+
+class SkippedRows:
+    """Counts unusable rows, keeping (line number, reason) for only the first MAX_REPORTED_SKIPS of them."""
+
+    def __init__(self):
+        self.count = 0
+        self.samples = [] # (line number, reason), at most MAX_REPORTED_SKIPS
+
+    def append(self, item):
+        self.count += 1
+        if len(self.samples) < MAX_REPORTED_SKIPS:
+            self.samples.append(item)
+
+class FamilyWriters:
+    """
+    Opens one output file per family the first time a record of that family is seen.
+    Each family is written to a temp file and swapped in on close, so a failed run
+    never leaves a half-written products.jsonl (or `file_name`) behind.
+    """
+
+    def __init__(self, products_dir=PRODUCTS_DIR, file_name="products.jsonl"):
+        self.products_dir = products_dir
+        self.file_name = file_name
+        self.files = {} # directory name -> (output path, open temp file)
+        self.counts = {} # family -> records written
+
+    def write(self, family, product):
+        directory = family_directory_name(family)
+        if directory not in self.files:
+            family_dir = self.products_dir / directory
+            family_dir.mkdir(parents=True, exist_ok=True)
+            output_file = family_dir / self.file_name
+            self.files[directory] = (output_file, open(f"{output_file}.tmp", 'w'))
+        self.files[directory][1].write(json.dumps(product) + '\n')
+        self.counts[family] = self.counts.get(family, 0) + 1
+
+    def close(self, commit=True):
+        """Closes every file; with `commit` the temp files replace the outputs, otherwise they are discarded."""
+        for output_file, f in self.files.values():
+            f.close()
+            if commit:
+                os.replace(f"{output_file}.tmp", output_file)
+            else:
+                os.remove(f"{output_file}.tmp")
+        return [output_file for output_file, _ in self.files.values()]
 
 def process_product(product):
     """Process a product dictionary to rename category_path to product_type, adjust image_url, and rename id to _id."""
@@ -57,40 +95,59 @@ def process_product(product):
 
     return product
 
-def split_products_by_family():
-    """Split products.jsonl into separate files by family."""
-    families = create_family_directories()
-    
-    # Read all products
-    products = []
-    with open('products.jsonl', 'r') as f:
-        for line in f:
-            product = json.loads(line)
-            product = process_product(product)
-            products.append(product)
-    
-    # Group products by family
-    family_products = {family: [] for family in families.values()}
-    
-    for product in products:
+def iter_products(file_path, skipped):
+    """Streams processed products from a JSONL file, appending (line number, reason) for each unusable row to `skipped` (a SkippedRows)."""
+    def on_error(file_path, line_num, error):
+        skipped.append((line_num, f"invalid JSON: {error}"))
+
+    for line_num, product in iter_jsonl(file_path, on_error):
+        if not isinstance(product, dict):
+            skipped.append((line_num, "not a JSON object"))
+            continue
         family = product.get('family')
-        if family in families:
-            family_products[families[family]].append(product)
-    
-    # Write products to family-specific files
-    for family, products in family_products.items():
-        if products:
-            output_file = Path("products") / family / "products.jsonl"
-            with open(output_file, 'w') as f:
-                for product in products:
-                    # Ensure the product is processed before writing
-                    processed_product = process_product(product)
-                    f.write(json.dumps(processed_product) + '\n')
-            print(f"Created {output_file} with {len(products)} products")
+        if not isinstance(family, str) or not family_directory_name(family):
+            skipped.append((line_num, f"missing or invalid family: {family!r}"))
+            continue
+        yield process_product(product)
 
-if __name__ == "__main__":
+def split_products_by_family(file_path=PRODUCTS_FILE, products_dir=PRODUCTS_DIR):
+    """
+    Splits products.jsonl into products/<family>/products.jsonl in a single streaming pass.
+    Families are discovered from the data, so memory use doesn't grow with the catalog.
+    Returns ({family: count}, SkippedRows).
+    """
+    skipped = SkippedRows()
+    writers = FamilyWriters(products_dir)
     try:
-        split_products_by_family()
-        print("Successfully split products by family!")
-    except Exception as e:
-        print(f"An error occurred: {str(e)}") 
\ No newline at end of file
+        with timer("stage_seconds", stage="split"):
+            for product in iter_products(file_path, skipped):
+                writers.write(product['family'], product)
+    except BaseException:
+        writers.close(commit=False)
+        raise
+    for output_file in writers.close():
+        print(f"Created {output_file}")
+
+    for family, product_count in sorted(writers.counts.items()):
+        print(f"  {family}: {product_count} products")
+        count("products", product_count, family=family)
+    count("skipped_rows", skipped.count)
+    print(f"Total: {sum(writers.counts.values())} products in {len(writers.counts)} families, {skipped.count} rows skipped")
+    for line_num, reason in skipped.samples:
+        print(f"  Skipped line {line_num}: {reason}")
+    if skipped.count > len(skipped.samples):
+        print(f"  ... and {skipped.count - len(skipped.samples)} more skipped rows")
+    return writers.counts, skipped
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split products.jsonl into products/<family>/products.jsonl.")
+    add_metrics_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    with profiled(args):
+        try:
+            split_products_by_family()
+            print("Successfully split products by family!")
+        except Exception as e:
+            print(f"An error occurred: {str(e)}") 
+    report_metrics(args)
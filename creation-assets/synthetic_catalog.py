@@ -0,0 +1,201 @@
+import os
+import json
+import random
+import string
+import logging
+import argparse
+from pathlib import Path
+from catalog import DOCUMENT_FILES_GLOB, catalog_files, iter_documents, iter_jsonl
+from link_resolver import CANDIDATE_REGEX
+from split_products import PRODUCTS_FILE, FamilyWriters, split_products_by_family
+from metrics import add_metrics_arguments, count, report_metrics, timer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_OUTPUT_DIR = "synthetic-catalog" # A catalog root of its own: products.jsonl + products/<family>/
+DEFAULT_SEED = 42
+PROGRESS_EVERY = 10000 # Products between progress log lines
+NAME_QUALIFIERS = ("Turbo", "Mini", "Ultra", "Classic", "Deluxe", "Pocket", "Mega", "Junior", "Pro", "Studio",
+                   "Explorer", "Fusion", "Nova", "Quantum", "Titan", "Spark", "Orbit", "Vector", "Pulse", "Summit")
+BASE36 = string.digits + string.ascii_uppercase
+NAME = object() # Placeholder for the product name in pre-split template text
+
+def base36(number: int) -> str:
+    digits = ""
+    while True:
+        number, remainder = divmod(number, 36)
+        digits = BASE36[remainder] + digits
+        if not number:
+            return digits
+
+class Template:
+    """A real product and its documents, which synthetic products are modelled on."""
+
+    def __init__(self, product: dict, documents: list[dict]):
+        self.product = product
+        self.documents = documents
+        self.prefix, self.type_code = product['id'].split('-')[:2]
+        # Doc ID suffixes such as "_AM_v1.0", in documentation_ids order
+        self.doc_suffixes = [doc['_id'][len(product['id']):] for doc in documents]
+        # Each text pre-split into literal strings and references, so rewriting it is a join instead of a regex pass
+        self.doc_segments = [self._segments(doc['text']) for doc in documents]
+
+    def _segments(self, text: str) -> list:
+        """Splits text into literals, NAME (the product name) and (is own product, ID suffix) references."""
+        segments = []
+        for position, piece in enumerate(text.split(self.product['name'])):
+            if position:
+                segments.append(NAME)
+            start = 0
+            for match in CANDIDATE_REGEX.finditer(piece):
+                reference = match.group(1)
+                base = reference.split('_', 1)[0]
+                segments.append(piece[start:match.start()])
+                segments.append((base.upper() == self.product['id'].upper(), reference[len(base):]))
+                start = match.end()
+            segments.append(piece[start:])
+        return segments
+
+def load_templates(root: str = ".") -> list[Template]:
+    """Reads the real catalog (products.jsonl and products/*/documents.jsonl) under `root`."""
+    documents = {}
+    for file_path in catalog_files(DOCUMENT_FILES_GLOB, root):
+        for _, document in iter_documents(file_path):
+            row = document.to_dict()
+            documents[row['_id']] = row
+    templates = []
+    for _, product in iter_jsonl(os.path.join(root, PRODUCTS_FILE)):
+        if not isinstance(product, dict) or not product.get('id') or product['id'].count('-') < 2:
+            continue
+        docs = [documents[doc_id] for doc_id in product.get('documentation_ids', [])
+                if doc_id in documents and doc_id.startswith(product['id'] + '_')]
+        templates.append(Template(product, docs))
+    if not templates:
+        raise ValueError(f"No template products found in {os.path.join(root, PRODUCTS_FILE)}")
+    return templates
+
+class SyntheticCatalog:
+    """
+    Deterministic generator of products and documents modelled on the real catalog.
+    Product i's template and ID depend only on (seed, i), so references to any other
+    product can be computed without keeping earlier products in memory.
+    """
+
+    def __init__(self, templates: list[Template], size: int, seed: int = DEFAULT_SEED):
+        self.templates = templates
+        self.size = size
+        self.seed = seed
+
+    def _rng(self, index: int) -> random.Random:
+        return random.Random(f"{self.seed}:{index}")
+
+    def plan(self, index: int) -> tuple[random.Random, Template, str]:
+        """(generator positioned after the template draw, template, product ID) of product `index`."""
+        rng = self._rng(index)
+        template = self.templates[rng.randrange(len(self.templates))]
+        block, sequence = divmod(index, 999)
+        # The middle segment carries the block, so IDs stay unique and still match CANDIDATE_REGEX
+        return rng, template, f"{template.prefix}-{template.type_code}{base36(block)}-{sequence + 1:03d}"
+
+    def other_reference(self, rng: random.Random, suffix: str) -> str:
+        """A reference to a random product, or to its document with the same doc type code when it has one."""
+        _, template, product_id = self.plan(rng.randrange(self.size))
+        code = suffix.split('_')[1] if suffix.count('_') else None
+        for doc_suffix in template.doc_suffixes:
+            if code and doc_suffix.split('_')[1] == code:
+                return product_id + doc_suffix
+        return product_id
+
+    def rewrite_text(self, segments: list, rng: random.Random, product_id: str, name: str) -> str:
+        """Moves a template text over to the synthetic product, remapping every ID reference."""
+        parts = []
+        for segment in segments:
+            if segment is NAME:
+                parts.append(name)
+            elif isinstance(segment, tuple):
+                own, suffix = segment
+                parts.append(product_id + suffix if own else self.other_reference(rng, suffix))
+            else:
+                parts.append(segment)
+        return "".join(parts)
+
+    def product(self, index: int) -> tuple[dict, list[dict]]:
+        """Product `index` in products.jsonl (pre-split) format and its documents."""
+        rng, template, product_id = self.plan(index)
+        source = template.product
+        name = f"{rng.choice(NAME_QUALIFIERS)} {source['name']} {index + 1}"
+        tags = list(source.get('tags', []))
+        rng.shuffle(tags)
+        price = dict(source['price']) if isinstance(source.get('price'), dict) else None
+        if price and isinstance(price.get('amount'), (int, float)):
+            price['amount'] = round(max(4.99, int(price['amount'] * rng.uniform(0.6, 1.6)) + 0.99), 2)
+
+        documents = []
+        for doc, suffix, segments in zip(template.documents, template.doc_suffixes, template.doc_segments):
+            text = self.rewrite_text(segments, rng, product_id, name)
+            related = self.other_reference(rng, suffix)
+            text += f"\n\n## See Also\n\nRelated documentation: {related}."
+            documents.append({**doc, "_id": product_id + suffix, "product_id": product_id, "product_name": name,
+                              "title": doc['title'].replace(source['name'], name), "text": text})
+
+        product = {**source, "id": product_id, "sku": f"KCON-{template.prefix}{template.type_code[0]}-{index + 1:07d}",
+                   "name": name, "tags": tags[:max(1, len(tags) - rng.randrange(3))],
+                   "documentation_ids": [doc['_id'] for doc in documents]}
+        if price:
+            product['price'] = price
+        return product, documents
+
+def generate_catalog(size: int, output_dir: str = DEFAULT_OUTPUT_DIR, seed: int = DEFAULT_SEED,
+                     template_root: str = ".", split: bool = False) -> tuple[int, int]:
+    """
+    Streams `size` synthetic products to <output_dir>/products.jsonl and their documents to
+    <output_dir>/products/<family>/documents.jsonl. Memory use doesn't grow with `size`.
+    With `split`, products.jsonl is also split into the family directories.
+    Returns (products written, documents written).
+    """
+    generator = SyntheticCatalog(load_templates(template_root), size, seed)
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    products_path = output / PRODUCTS_FILE
+    document_writers = FamilyWriters(output / "products", file_name="documents.jsonl")
+    document_count = 0
+    try:
+        with timer("stage_seconds", stage="generate"), open(f"{products_path}.tmp", 'w', encoding='utf-8') as products_file:
+            for index in range(size):
+                product, documents = generator.product(index)
+                products_file.write(json.dumps(product) + '\n')
+                for document in documents:
+                    document_writers.write(product['family'], document)
+                document_count += len(documents)
+                if (index + 1) % PROGRESS_EVERY == 0:
+                    logging.info(f"Generated {index + 1}/{size} products, {document_count} documents")
+    except BaseException:
+        document_writers.close(commit=False)
+        if os.path.exists(f"{products_path}.tmp"):
+            os.remove(f"{products_path}.tmp")
+        raise
+    os.replace(f"{products_path}.tmp", products_path)
+    document_writers.close()
+    count("products", size)
+    count("documents", document_count)
+    logging.info(f"Wrote {size} products to {products_path} and {document_count} documents under {output / 'products'}")
+
+    if split:
+        split_products_by_family(products_path, output / "products")
+    return size, document_count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic catalog modelled on the real one, for scale and load testing.")
+    parser.add_argument("size", type=int, help="Number of products to generate (e.g. 10000 to 1000000).")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR,
+                        help=f"Catalog root to write (default: {DEFAULT_OUTPUT_DIR}). Run the other scripts from there.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help=f"Generator seed (default: {DEFAULT_SEED}).")
+    parser.add_argument("--templates", default=".",
+                        help="Catalog root whose products.jsonl and documents are used as templates (default: .).")
+    parser.add_argument("--split", action="store_true",
+                        help="Also split products.jsonl into products/<family>/products.jsonl, like split_products.py.")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    generate_catalog(args.size, output_dir=args.output_dir, seed=args.seed, template_root=args.templates, split=args.split)
+    report_metrics(args)
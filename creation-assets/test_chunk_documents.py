@@ -0,0 +1,13 @@
+from chunk_documents import chunk_markdown, count_tokens
+
+def test_heading_only_input_stays_within_budget():
+    markdown = "\n\n".join(f"## Section {i}" for i in range(200))
+    chunks = list(chunk_markdown(markdown, max_tokens=50, overlap_tokens=8))
+    assert max(count_tokens(chunk) for chunk in chunks) <= 50
+    assert sum(chunk.count("## Section") for chunk in chunks) == 200
+
+def test_body_after_many_headings_is_not_shredded():
+    markdown = "\n\n".join(f"## Section {i}" for i in range(30)) + "\n\nSome body text that explains the last section."
+    chunks = list(chunk_markdown(markdown, max_tokens=50, overlap_tokens=8))
+    assert max(count_tokens(chunk) for chunk in chunks) <= 50
+    assert chunks[-1].endswith("Some body text that explains the last section.")
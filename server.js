@@ -7,6 +7,7 @@ console.log('ASTRA_DB_API_ENDPOINT:', process.env.ASTRA_DB_API_ENDPOINT);
 console.log('ASTRA_DB_APPLICATION_TOKEN:', process.env.ASTRA_DB_APPLICATION_TOKEN ? 'Token loaded (masked)' : 'Token NOT loaded');
 
 const express = require('express');
+const fs = require('fs');
 const path = require('path');
 const { DataAPIClient } = require("@datastax/astra-db-ts");
 const { marked } = require('marked');
@@ -34,87 +35,196 @@ let documentCollection;
 let productHierarchy = {};
 let tagsByFrequency = [];
 let docTitleMap = new Map(); // Maps document IDs to their titles for quick lookup
+let productDocsMap = new Map(); // Maps product IDs to their documentation IDs (from the catalog index)
+
+// Prebuilt catalog index written by the Python load step (creation-assets/catalog_index.py)
+const CATALOG_INDEX_PATH = process.env.CATALOG_INDEX_PATH || path.join(__dirname, 'creation-assets', 'catalog-index.json');
+const CATALOG_INDEX_FORMAT = 1;
+const CATALOG_INDEX_REFRESH_MS = parseInt(process.env.CATALOG_INDEX_REFRESH_MS || '60000', 10);
+let catalogIndexVersion = null;
+let catalogIndexMtimeMs = 0;
+
+// Loads the catalog index if the file changed and holds a new version. Returns true when it was applied.
+async function loadCatalogIndex() {
+    const stats = await fs.promises.stat(CATALOG_INDEX_PATH);
+    if (stats.mtimeMs === catalogIndexMtimeMs) {
+        return false;
+    }
+    const index = JSON.parse(await fs.promises.readFile(CATALOG_INDEX_PATH, 'utf8'));
+    catalogIndexMtimeMs = stats.mtimeMs;
+    if (index.format !== CATALOG_INDEX_FORMAT) {
+        throw new Error(`Unsupported catalog index format ${index.format} (expected ${CATALOG_INDEX_FORMAT})`);
+    }
+    if (index.version === catalogIndexVersion) {
+        return false;
+    }
 
-// Database initialization and data structure setup
-async function initializeDbAndData() {
-    console.log("Running DB and Data Initialization...");
-    try {
-        const client = new DataAPIClient(ASTRA_DB_APPLICATION_TOKEN);
-        db = client.db(ASTRA_DB_API_ENDPOINT);
+    const hierarchy = {};
+    Object.entries(index.hierarchy).forEach(([family, productTypes]) => {
+        hierarchy[family] = {};
+        productTypes.forEach(productType => {
+            hierarchy[family][productType] = true;
+        });
+    });
+    productHierarchy = hierarchy;
+    tagsByFrequency = index.tags.map(([tag, count]) => ({ tag, count }));
+    docTitleMap = new Map(Object.entries(index.doc_titles));
+    productDocsMap = new Map(Object.entries(index.product_docs));
+    catalogIndexVersion = index.version;
+    console.log(`Loaded catalog index version ${index.version}: ${Object.keys(hierarchy).length} families, ${tagsByFrequency.length} tags, ${docTitleMap.size} document titles.`);
+    return true;
+}
 
-        productCollection = await db.collection(process.env.ASTRA_DB_PRODUCT_COLLECTION || 'products');
-        documentCollection = await db.collection(process.env.ASTRA_DB_DOCUMENT_COLLECTION || 'documents');
-        console.log(`Connected to Astra DB collections: ${productCollection.collectionName}, ${documentCollection.collectionName}`);
+// Picks up a new catalog index (or image manifest) written by a later run without restarting the server
+function watchCatalogIndex() {
+    setInterval(async () => {
+        try {
+            await loadCatalogIndex();
+        } catch (e) {
+            console.debug(`Catalog index refresh skipped: ${e.message}`);
+        }
+        try {
+            await loadImageManifest();
+        } catch (e) {
+            console.debug(`Image manifest refresh skipped: ${e.message}`);
+        }
+    }, CATALOG_INDEX_REFRESH_MS).unref();
+}
 
-        // Fetch and process product data
-        console.log('Fetching data from products collection...');
-        const productCursor = await productCollection.find({}, {
-            projection: { family: 1, product_type: 1, tags: 1 }
-        });
-        const initialProductItems = await productCursor.toArray();
-        console.log(`Fetched ${initialProductItems.length} product items.`);
+// Responsive image variants written by creation-assets/image_derivatives.py (optional)
+const IMAGE_MANIFEST_PATH = process.env.IMAGE_MANIFEST_PATH || path.join(__dirname, 'public', 'images', 'image-manifest.json');
+const IMAGE_MANIFEST_FORMAT = 1;
+let imageManifest = new Map(); // Maps an image_url to its WebP/AVIF srcsets
+let imageManifestMtimeMs = 0;
+
+// Loads the image manifest if the file changed. Images without an entry are served as-is.
+async function loadImageManifest() {
+    const stats = await fs.promises.stat(IMAGE_MANIFEST_PATH);
+    if (stats.mtimeMs === imageManifestMtimeMs) {
+        return false;
+    }
+    const manifest = JSON.parse(await fs.promises.readFile(IMAGE_MANIFEST_PATH, 'utf8'));
+    imageManifestMtimeMs = stats.mtimeMs;
+    if (manifest.format !== IMAGE_MANIFEST_FORMAT) {
+        throw new Error(`Unsupported image manifest format ${manifest.format} (expected ${IMAGE_MANIFEST_FORMAT})`);
+    }
+    imageManifest = new Map(Object.entries(manifest.images));
+    console.log(`Loaded image manifest: ${imageManifest.size} images with responsive variants.`);
+    return true;
+}
 
-        // Build product hierarchy and tag frequency map
-        console.log('Building hierarchy and counting tags from DB data...');
-        const hierarchy = {};
-        const tagCounts = new Map();
+// Returns the <source> list (best format first) and intrinsic size for an image, or null if it has no variants
+function responsiveImage(imageUrl) {
+    const entry = imageUrl && imageManifest.get(imageUrl);
+    if (!entry) {
+        return null;
+    }
+    const sources = ['image/avif', 'image/webp']
+        .filter(type => entry.srcset[type])
+        .map(type => ({ type, srcset: entry.srcset[type] }));
+    return { sources, width: entry.width, height: entry.height };
+}
+app.locals.responsiveImage = responsiveImage;
+
+// Fallback when no catalog index is available: scan the collections to build the same structures
+async function buildCatalogFromCollections() {
+    // Fetch and process product data
+    console.log('Fetching data from products collection...');
+    const productCursor = await productCollection.find({}, {
+        projection: { family: 1, product_type: 1, tags: 1 }
+    });
+    const initialProductItems = await productCursor.toArray();
+    console.log(`Fetched ${initialProductItems.length} product items.`);
 
-        initialProductItems.forEach(item => {
-            const family = item.family;
-            const productType = item.product_type;
+    // Build product hierarchy and tag frequency map
+    console.log('Building hierarchy and counting tags from DB data...');
+    const hierarchy = {};
+    const tagCounts = new Map();
 
-            // Skip non-product items
-            if (!family || !productType || productType === 'Consumables' || productType === 'Accessory') {
-                return;
-            }
+    initialProductItems.forEach(item => {
+        const family = item.family;
+        const productType = item.product_type;
 
-            if (!hierarchy[family]) {
-                hierarchy[family] = {};
-            }
-            hierarchy[family][productType] = true;
+        // Skip non-product items
+        if (!family || !productType || productType === 'Consumables' || productType === 'Accessory') {
+            return;
+        }
 
-            if (item.tags && Array.isArray(item.tags)) {
-                item.tags.forEach(tag => {
-                    tagCounts.set(tag, (tagCounts.get(tag) || 0) + 1);
-                });
-            }
-        });
+        if (!hierarchy[family]) {
+            hierarchy[family] = {};
+        }
+        hierarchy[family][productType] = true;
 
-        // Sort hierarchy alphabetically for consistent display
-        const sortedHierarchy = {};
-        Object.keys(hierarchy).sort().forEach(family => {
-            sortedHierarchy[family] = {};
-            Object.keys(hierarchy[family]).sort().forEach(productType => {
-                sortedHierarchy[family][productType] = true;
-            });
-        });
-        productHierarchy = sortedHierarchy;
-        console.log('Product hierarchy built.');
-
-        // Sort tags by frequency (descending) and alphabetically for ties
-        tagsByFrequency = Array.from(tagCounts.entries())
-            .map(([tag, count]) => ({ tag, count }))
-            .sort((a, b) => {
-                if (b.count !== a.count) {
-                    return b.count - a.count;
-                }
-                return a.tag.localeCompare(b.tag);
+        if (item.tags && Array.isArray(item.tags)) {
+            item.tags.forEach(tag => {
+                tagCounts.set(tag, (tagCounts.get(tag) || 0) + 1);
             });
-        console.log(`Counted and sorted ${tagsByFrequency.length} unique tags by frequency.`);
+        }
+    });
 
-        // Cache document titles for quick lookup
-        console.log('Fetching document titles...');
-        const docCursor = await documentCollection.find({}, {
-            projection: { _id: 1, title: 1 }
+    // Sort hierarchy alphabetically for consistent display
+    const sortedHierarchy = {};
+    Object.keys(hierarchy).sort().forEach(family => {
+        sortedHierarchy[family] = {};
+        Object.keys(hierarchy[family]).sort().forEach(productType => {
+            sortedHierarchy[family][productType] = true;
         });
-        const docTitles = await docCursor.toArray();
-        docTitleMap.clear();
-        docTitles.forEach(doc => {
-            if (doc._id && doc.title) {
-                docTitleMap.set(doc._id, doc.title);
+    });
+    productHierarchy = sortedHierarchy;
+    console.log('Product hierarchy built.');
+
+    // Sort tags by frequency (descending) and alphabetically for ties
+    tagsByFrequency = Array.from(tagCounts.entries())
+        .map(([tag, count]) => ({ tag, count }))
+        .sort((a, b) => {
+            if (b.count !== a.count) {
+                return b.count - a.count;
             }
+            return a.tag.localeCompare(b.tag);
         });
-        console.log(`Mapped ${docTitleMap.size} document titles.`);
+    console.log(`Counted and sorted ${tagsByFrequency.length} unique tags by frequency.`);
+
+    // Cache document titles for quick lookup
+    console.log('Fetching document titles...');
+    const docCursor = await documentCollection.find({}, {
+        projection: { _id: 1, title: 1 }
+    });
+    const docTitles = await docCursor.toArray();
+    docTitleMap.clear();
+    docTitles.forEach(doc => {
+        if (doc._id && doc.title) {
+            docTitleMap.set(doc._id, doc.title);
+        }
+    });
+    console.log(`Mapped ${docTitleMap.size} document titles.`);
+}
+
+// Database initialization and data structure setup
+async function initializeDbAndData() {
+    console.log("Running DB and Data Initialization...");
+    try {
+        const client = new DataAPIClient(ASTRA_DB_APPLICATION_TOKEN);
+        db = client.db(ASTRA_DB_API_ENDPOINT);
+
+        productCollection = await db.collection(process.env.ASTRA_DB_PRODUCT_COLLECTION || 'products');
+        documentCollection = await db.collection(process.env.ASTRA_DB_DOCUMENT_COLLECTION || 'documents');
+        console.log(`Connected to Astra DB collections: ${productCollection.collectionName}, ${documentCollection.collectionName}`);
+
+        let indexLoaded = false;
+        try {
+            indexLoaded = await loadCatalogIndex();
+        } catch (e) {
+            console.warn(`Catalog index not loaded from ${CATALOG_INDEX_PATH} (${e.message}); scanning collections instead.`);
+        }
+        if (!indexLoaded) {
+            await buildCatalogFromCollections();
+        }
+        try {
+            await loadImageManifest();
+        } catch (e) {
+            console.warn(`Image manifest not loaded from ${IMAGE_MANIFEST_PATH} (${e.message}); serving original images.`);
+        }
+        watchCatalogIndex();
 
     } catch (e) {
         console.error("Error during DB connection or initial data build:", e);
@@ -124,6 +234,7 @@ async function initializeDbAndData() {
         productHierarchy = {};
         tagsByFrequency = [];
         docTitleMap.clear();
+        productDocsMap.clear();
     }
     console.log("Initialization complete.");
 }
@@ -137,6 +248,8 @@ app.use('/static/langflow-chatbot-plugin.js', express.static(require.resolve('la
 app.use('/static/langflow-chatbot.css', express.static(require.resolve('langflow-chatbot/styles')));
 
 // General static assets and JSON parser
+// Derived images have content-hashed names, so browsers may cache them indefinitely
+app.use('/images/derived', express.static(path.join(__dirname, 'public/images/derived'), { maxAge: '1y', immutable: true }));
 app.use(express.static(path.join(__dirname, 'public')));
 app.use('/images/products', express.static(path.join(__dirname, 'public/images/products')));
 app.use(express.json());
@@ -263,12 +376,12 @@ app.get('/product/:productId', async (req, res) => {
 
             if (product) {
                 // Attach document metadata to product
-                product.documentation = [];
-                if (product.documentation_ids && Array.isArray(product.documentation_ids)) {
-                    product.documentation = product.documentation_ids
-                        .map(id => ({ id: id, title: docTitleMap.get(id) || id }))
-                        .sort((a, b) => a.title.localeCompare(b.title));
-                }
+                const documentationIds = Array.isArray(product.documentation_ids)
+                    ? product.documentation_ids
+                    : (productDocsMap.get(product._id) || []);
+                product.documentation = documentationIds
+                    .map(id => ({ id: id, title: docTitleMap.get(id) || id }))
+                    .sort((a, b) => a.title.localeCompare(b.title));
 
                 // Load initial document if specified
                 if (requestedDocId && product.documentation.some(doc => doc.id === requestedDocId)) {
@@ -334,12 +447,12 @@ app.get('/product/sku/:sku', async (req, res) => {
 
             if (product) {
                 // Attach document metadata to product
-                product.documentation = [];
-                if (product.documentation_ids && Array.isArray(product.documentation_ids)) {
-                    product.documentation = product.documentation_ids
-                        .map(id => ({ id: id, title: docTitleMap.get(id) || id }))
-                        .sort((a, b) => a.title.localeCompare(b.title));
-                }
+                const documentationIds = Array.isArray(product.documentation_ids)
+                    ? product.documentation_ids
+                    : (productDocsMap.get(product._id) || []);
+                product.documentation = documentationIds
+                    .map(id => ({ id: id, title: docTitleMap.get(id) || id }))
+                    .sort((a, b) => a.title.localeCompare(b.title));
 
                 // Load initial document if specified
                 if (requestedDocId && product.documentation.some(doc => doc.id === requestedDocId)) {